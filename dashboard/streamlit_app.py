@@ -9,16 +9,19 @@ if str(repo_root) not in sys.path:
 # -------------------------------------------------------------------------------
 
 import os
+import threading
 import time
 from typing import List, Optional
 import json
 import requests
 import pandas as pd
 import streamlit as st
-from dotenv import load_dotenv
 
-# Cargar variables de entorno (.env)
-load_dotenv(override=True)
+# Cargar variables de entorno (.env), una vez por proceso
+from src.config import load_env
+load_env()
+
+from src.utils.schema import TICKET_COLUMNS, TicketFrameCache
 
 # Intento de importar cliente LLM (opcional)
 try:
@@ -31,6 +34,7 @@ API_URL = os.getenv("API_URL", "http://localhost:8001")
 OUT_CSV = os.getenv("LOCAL_OUTPUT_CSV", "data/outputs/classified.csv")
 IN_CSV = os.getenv("LOCAL_INPUT_CSV", "data/sample_tickets.csv")
 DLQ_DIR = Path(os.getenv("DLQ_DIR", "dlq"))
+METRICS_REFRESH_SEC = float(os.getenv("METRICS_REFRESH_SEC", "2"))
 
 # Retención visual del DLQ en días (solo afecta a la UI)
 def _parse_int(value: Optional[str], default: int) -> int:
@@ -41,40 +45,46 @@ def _parse_int(value: Optional[str], default: int) -> int:
 
 DLQ_RETENTION_DAYS_UI = _parse_int(os.getenv("DLQ_RETENTION_DAYS", "7"), 7)
 
-EXPECTED_COLS: List[str] = [
-    "id", "created_at", "channel", "subject", "description",
-    "topic", "priority", "sentiment", "owner_suggested"
-]
+EXPECTED_COLS: List[str] = TICKET_COLUMNS
 
 st.set_page_config(page_title="AI Automation – Dashboard", layout="wide")
 st.title("AI Automation – Dashboard")
 
 # ------------------------------- Helpers --------------------------------
-@st.cache_data(show_spinner=False)
+@st.cache_resource(show_spinner=False)
+def warm_llm() -> bool:
+    # Ollama: un warm-up + keep-alive por proceso (compartido entre sesiones)
+    if LLMClient is None or (os.getenv("LLM_PROVIDER", "") or "").strip().lower() != "ollama":
+        return False
+    from src.services.ollama_client import get_scheduler
+    llm = LLMClient()
+    get_scheduler(llm.ollama_host, llm.model).start_keepalive()
+    return True
+
+warm_llm()
+
+@st.cache_resource(show_spinner=False)
+def _frame_cache(path: str) -> TicketFrameCache:
+    # Un cache por archivo y proceso: se revalida por inode/tamaño/mtime en cada rerun
+    return TicketFrameCache(path, EXPECTED_COLS)
+
+@st.cache_resource(show_spinner=False)
+def _search_index():
+    # Índice full-text que mantiene el job; se recarga solo si el manifest cambió
+    from src.services.search_index import SEARCH_INDEX_DIR, SearchIndex
+    return SearchIndex.open(SEARCH_INDEX_DIR)
+
 def load_data() -> pd.DataFrame:
     path_out = Path(OUT_CSV)
     path_in = Path(IN_CSV)
-    df = pd.DataFrame()
+    # Tipos compactos (categorías, datetime, ids str) + columnas faltantes: ver src/utils/schema.py.
+    # Si el job solo agregó filas, se parsean únicamente esos bytes.
     if path_out.exists():
-        df = pd.read_csv(path_out)
-    elif path_in.exists():
-        df = pd.read_csv(path_in)
-    else:
-        st.warning("No data found. Please run the processing job first.")
-        return df
-
-    EXPECTED_COLS = [
-        "id", "created_at", "channel", "subject", "description",
-        "topic", "priority", "sentiment", "owner_suggested"
-    ]
-    for col in EXPECTED_COLS:
-        if col not in df.columns:
-            df[col] = None
-
-    # Normalización
-    if "created_at" in df.columns:
-        df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
-    return df
+        return _frame_cache(str(path_out)).load()
+    if path_in.exists():
+        return _frame_cache(str(path_in)).load()
+    st.warning("No data found. Please run the processing job first.")
+    return pd.DataFrame()
 
 def fetch_metrics() -> dict | None:
     try:
@@ -85,6 +95,108 @@ def fetch_metrics() -> dict | None:
         st.error(f"No se pudo leer /metrics: {e}")
         return None
 
+# Contadores internos (METRICS) -> claves de /metrics
+_TOTAL_KEYS = {"processed": "tickets_processed", "failed": "tickets_failed", "dlq": "dlq_written"}
+
+class MetricsFeed:
+    """
+    Consumidor SSE de /metrics/stream en un thread daemon (uno por proceso).
+    Guarda el último snapshot y los buckets por segundo de los últimos `window` s;
+    se reconecta solo si la API se cae.
+    """
+
+    def __init__(self, base_url: str, window: int = 300):
+        self.base_url = base_url.rstrip("/")
+        self.window = window
+        self.connected = False
+        self.error: str | None = None
+        self._snapshot: dict = {}
+        self._buckets: dict = {}  # ts -> bucket
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, name="metrics-sse", daemon=True).start()
+
+    def _backfill(self) -> None:
+        # Historia reciente para no arrancar con el gráfico vacío
+        now = int(time.time())
+        r = requests.get(f"{self.base_url}/metrics/history",
+                         params={"resolution": "1s", "since": now - self.window, "until": now}, timeout=5)
+        r.raise_for_status()
+        self._add_buckets(r.json().get("buckets", []))
+
+    def _add_buckets(self, buckets: list) -> None:
+        with self._lock:
+            for b in buckets:
+                self._buckets[b["ts"]] = b
+            cutoff = time.time() - self.window
+            for ts in [ts for ts in self._buckets if ts < cutoff]:
+                del self._buckets[ts]
+
+    def _on_event(self, event: str, data: dict) -> None:
+        if event == "snapshot":
+            with self._lock:
+                self._snapshot = data
+        elif event == "delta":
+            self._add_buckets(data.get("buckets", []))
+            with self._lock:
+                for k, v in (data.get("totals") or {}).items():
+                    self._snapshot[_TOTAL_KEYS.get(k, k)] = v
+                processed = self._snapshot.get("tickets_processed", 0)
+                failed = self._snapshot.get("tickets_failed", 0)
+                self._snapshot["success_rate"] = 0.0 if not processed else round((processed - failed) / processed, 4)
+                self._snapshot["error_rate"] = 0.0 if not processed else round(failed / processed, 4)
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                self._backfill()
+                with requests.get(f"{self.base_url}/metrics/stream", stream=True, timeout=(5, 30)) as r:
+                    r.raise_for_status()
+                    self.connected, self.error, backoff = True, None, 1.0
+                    event, data = "message", []
+                    for line in r.iter_lines(decode_unicode=True):
+                        if line:
+                            field, _, value = line.partition(":")
+                            if field == "event":
+                                event = value.strip()
+                            elif field == "data":
+                                data.append(value.lstrip())
+                            continue
+                        if data:
+                            self._on_event(event, json.loads("\n".join(data)))
+                        event, data = "message", []
+            except Exception as e:
+                self.error = str(e)
+            self.connected = False
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._snapshot)
+
+    def rates(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """(counter deltas per second, avg latency ms per stage), indexed by time; gaps = 0."""
+        with self._lock:
+            buckets = sorted(self._buckets.values(), key=lambda b: b["ts"])
+        if not buckets:
+            return pd.DataFrame(), pd.DataFrame()
+        idx = pd.to_datetime(range(buckets[0]["ts"], int(time.time())), unit="s")
+        counters = pd.DataFrame(
+            [b["counters"] for b in buckets], index=pd.to_datetime([b["ts"] for b in buckets], unit="s")
+        )
+        cols = [c for c in ["processed", "failed", "dlq", "retries", "notify_success", "notify_failed"] if c in counters]
+        counters = counters.reindex(idx).reindex(columns=cols).fillna(0)
+        latency = pd.DataFrame(
+            [{k: v["avg_ms"] for k, v in b["latency"].items()} for b in buckets],
+            index=pd.to_datetime([b["ts"] for b in buckets], unit="s"),
+        )
+        return counters, latency
+
+@st.cache_resource(show_spinner=False)
+def metrics_feed() -> MetricsFeed:
+    return MetricsFeed(API_URL)
+
 def list_dlq_files(n: int = 20, max_age_days: Optional[int] = None):
     """
     Lista archivos del DLQ limitados por 'n'.
@@ -215,6 +327,7 @@ with tab_explorer:
                     fdf["topic"]
                     .fillna("other")
                     .value_counts()
+                    .loc[lambda s: s > 0]  # categóricas listan también las categorías sin filas
                     .head(10)
                     .rename_axis("topic")
                     .reset_index(name="count")
@@ -240,6 +353,52 @@ with tab_explorer:
             else:
                 st.info("No priority data available for the selected view.")
 
+        # Clusters de near-duplicates (dup_cluster lo escribe el job)
+        if fdf["dup_cluster"].notna().any():
+            clusters = (
+                fdf.dropna(subset=["dup_cluster"])
+                .assign(dup_cluster=lambda d: d["dup_cluster"].astype(str))
+                .groupby("dup_cluster", observed=True)
+                .agg(
+                    size=("id", "size"),
+                    topic=("topic", "first"),
+                    p1=("priority", lambda s: int((s == "P1").sum())),
+                    subject=("subject", "first"),
+                )
+            )
+            clusters = clusters[clusters["size"] > 1].sort_values("size", ascending=False)
+            st.subheader("🧬 Duplicate Clusters")
+            if clusters.empty:
+                st.info("No near-duplicate clusters in the selected view.")
+            else:
+                k1, k2 = st.columns(2)
+                k1.metric("Clusters (size > 1)", f"{len(clusters)}")
+                k2.metric("Tickets in clusters", f"{int(clusters['size'].sum())}")
+                st.dataframe(clusters.head(20).reset_index(), use_container_width=True, hide_index=True)
+
+        st.divider()
+
+        # Búsqueda full-text: solo la página de resultados viaja al browser
+        st.subheader("🔍 Search tickets")
+        s_col1, s_col2 = st.columns([4, 1])
+        query = s_col1.text_input("Search", placeholder="e.g. contraseña, refund, crash", label_visibility="collapsed")
+        search_page = int(s_col2.number_input("Page", min_value=1, value=1, step=1, label_visibility="collapsed"))
+        if query.strip():
+            from src.services.search_index import SEARCH_PAGE_SIZE
+            res = _search_index().search(query, SEARCH_PAGE_SIZE, (search_page - 1) * SEARCH_PAGE_SIZE)
+            if res["total"] == 0:
+                st.info("No tickets match the search.")
+            else:
+                ids = [r["id"] for r in res["results"]]
+                hits = df[df["id"].isin(ids)].set_index("id").reindex(ids).reset_index()  # orden por score
+                hits.insert(1, "score", [r["score"] for r in res["results"]])
+                pages = -(-res["total"] // SEARCH_PAGE_SIZE)
+                st.caption(f"{res['total']} matches · page {search_page}/{pages}")
+                show_cols = [c for c in [
+                    "id", "score", "created_at", "subject", "topic", "priority", "owner_suggested", "description"
+                ] if c in hits.columns]
+                st.dataframe(hits[show_cols], use_container_width=True, hide_index=True)
+
         st.divider()
 
         # Drill-down
@@ -261,30 +420,56 @@ with tab_explorer:
 # ============================ TAB: SYSTEM HEALTH ============================
 with tab_health:
     st.subheader("System Health")
-    m = fetch_metrics()
-
-    if not m:
-        st.stop()
-
-    # Fila 1: éxito / error
-    c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Processed", m.get("tickets_processed", 0))
-    c2.metric("Failed", m.get("tickets_failed", 0))
-    c3.metric("Success rate", f"{m.get('success_rate', 0.0) * 100:.1f}%")
-    c4.metric("Error rate", f"{m.get('error_rate', 0.0) * 100:.1f}%")
-
-    # Fila 2: notificaciones y reintentos
-    d1, d2, d3, d4 = st.columns(4)
-    d1.metric("Notify OK", m.get("notify_success", 0))
-    d2.metric("Notify failed", m.get("notify_failed", 0))
-    d3.metric("Retries (total)", m.get("retries", 0))
-    d4.metric("Retry failed (cases)", m.get("retry_failed", 0))
-
-    # Nota
-    st.caption(
-        f"DLQ escritos: {m.get('dlq_written', 0)} · "
-        f"API_URL: {API_URL}"
-    )
+
+    # Fragmento que se re-renderiza solo (sin rerun de toda la app) con los datos
+    # que empuja /metrics/stream; si el stream no está conectado, un GET a /metrics
+    @st.fragment(run_every=METRICS_REFRESH_SEC)
+    def render_health():
+        feed = metrics_feed()
+        m = feed.snapshot() if feed.connected else None
+        if not m:
+            m = fetch_metrics()
+        if not m:
+            return
+
+        # Fila 1: éxito / error
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Processed", m.get("tickets_processed", 0))
+        c2.metric("Failed", m.get("tickets_failed", 0))
+        c3.metric("Success rate", f"{m.get('success_rate', 0.0) * 100:.1f}%")
+        c4.metric("Error rate", f"{m.get('error_rate', 0.0) * 100:.1f}%")
+
+        # Fila 2: notificaciones y reintentos
+        d1, d2, d3, d4 = st.columns(4)
+        d1.metric("Notify OK", m.get("notify_success", 0))
+        d2.metric("Notify failed", m.get("notify_failed", 0))
+        d3.metric("Retries (total)", m.get("retries", 0))
+        d4.metric("Retry failed (cases)", m.get("retry_failed", 0))
+
+        # Tasas en vivo (por segundo, últimos 5 min)
+        counters, latency = feed.rates()
+        r1, r2 = st.columns(2)
+        with r1:
+            st.caption("Events / second")
+            if counters.empty:
+                st.info("No activity in the last minutes.")
+            else:
+                st.line_chart(counters)
+        with r2:
+            st.caption("Avg latency per stage (ms)")
+            if latency.empty:
+                st.info("No latency samples yet.")
+            else:
+                st.line_chart(latency)
+
+        # Nota
+        live = "live (SSE)" if feed.connected else f"polling ({feed.error or 'connecting'})"
+        st.caption(
+            f"DLQ escritos: {m.get('dlq_written', 0)} · "
+            f"API_URL: {API_URL} · {live}"
+        )
+
+    render_health()
 
 # ================================ TAB: DLQ =================================
 with tab_dlq:
@@ -0,0 +1,112 @@
+# scripts/bench_startup.py
+"""
+Cold-start budget check (import time + time-to-ready of the API).
+
+Each module is imported in a fresh interpreter with `python -X importtime`;
+the cumulative time of the top-level import is compared against its budget.
+With --serve, uvicorn is started and /health is polled until it answers.
+
+    python scripts/bench_startup.py                # imports only
+    python scripts/bench_startup.py --serve        # + time-to-ready of src.main
+    python scripts/bench_startup.py --top 15       # slowest src.* modules (self time)
+
+Exit code 1 if any measurement goes over budget.
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Presupuestos en ms (import en frío, intérprete nuevo). fastapi + pydantic ya son ~300-400ms.
+BUDGETS_MS = {
+    "src.main": 900,
+    "src.server.app": 700,
+    "src.jobs.process_new_rows": 1500,
+}
+READY_BUDGET_MS = 1000
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(module: str, env: dict) -> list:
+    """[(module, self_us, cumulative_us, depth)] for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3))))
+    return rows
+
+
+def time_to_ready(env: dict, timeout: float = 30.0) -> float:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("API did not become ready")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--serve", action="store_true", help="Also measure uvicorn time-to-ready (/health)")
+    ap.add_argument("--top", type=int, default=0, help="Show the N slowest src.* modules by self time")
+    ap.add_argument("--runs", type=int, default=3, help="Runs per module (best is reported)")
+    args = ap.parse_args()
+
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "PYTHONDONTWRITEBYTECODE": "0"}
+    over = False
+    for module, budget in BUDGETS_MS.items():
+        best = None
+        for _ in range(max(1, args.runs)):
+            rows = import_profile(module, env)
+            total = next((cum for name, _, cum, _ in reversed(rows) if name == module), 0) / 1000
+            if best is None or total < best[0]:
+                best = (total, rows)
+        total, rows = best
+        flag = "OK " if total <= budget else "OVER"
+        over |= total > budget
+        print(f"[{flag}] import {module:<28} {total:8.1f} ms  (budget {budget} ms)")
+        if args.top:
+            ours = sorted((r for r in rows if r[0].startswith("src.")), key=lambda r: r[1], reverse=True)
+            for name, self_us, cum_us, _ in ours[: args.top]:
+                print(f"         {name:<40} self {self_us / 1000:7.1f} ms   cum {cum_us / 1000:7.1f} ms")
+
+    if args.serve:
+        ready = min(time_to_ready(env) for _ in range(max(1, args.runs))) * 1000
+        flag = "OK " if ready <= READY_BUDGET_MS else "OVER"
+        over |= ready > READY_BUDGET_MS
+        print(f"[{flag}] API ready (/health 200)            {ready:8.1f} ms  (budget {READY_BUDGET_MS} ms)")
+
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
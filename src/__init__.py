@@ -0,0 +1,4 @@
+# Cargar .env una sola vez, antes de que cualquier módulo lea os.getenv (ver src/config.py)
+from src.config import load_env
+
+load_env()
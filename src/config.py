@@ -0,0 +1,56 @@
+# src/config.py
+"""
+Configuración central: el .env se lee UNA sola vez por proceso (al importar el
+paquete `src`, ver src/__init__.py) y antes de que cualquier módulo lea sus
+variables con os.getenv a nivel módulo. Mantiene la semántica de siempre:
+override=True (el .env pisa al entorno).
+
+Helpers tipados para no repetir el parseo de bools/ints en cada módulo.
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+_loaded = False
+
+
+def load_env() -> None:
+    """Load .env once (cwd first, then the repo root). Later calls are no-ops."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    from dotenv import find_dotenv, load_dotenv
+
+    path = find_dotenv(usecwd=True) or str(Path(__file__).resolve().parents[1] / ".env")
+    load_dotenv(dotenv_path=path, override=True)
+
+
+def env_str(name: str, default: str = "") -> str:
+    return (os.getenv(name, default) or default).strip()
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(env_str(name, str(default)))
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(env_str(name, str(default)))
+    except ValueError:
+        return default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    v = env_str(name, "").lower()
+    if v in _TRUE:
+        return True
+    if v in _FALSE:
+        return False
+    return default
@@ -1,42 +1,55 @@
 # src/jobs/process_new_rows.py
 from __future__ import annotations
 
+import argparse
 import os
+import time
+from contextlib import nullcontext
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, ContextManager, Iterable, List, Dict, Optional, Tuple
 
 import pandas as pd
-from dotenv import load_dotenv
-
-# Cargar .env antes de leer cualquier var
-load_dotenv(override=True)
-
-from src.services.rules import (
-    simple_topic,
-    simple_priority,
-    simple_sentiment,
-    owner_for_topic,
-)
+from src.services.rules_engine import REGISTRY, RuleSet
+from src.services.text_norm import cache_stats
+from src.services.classifiers import CLASSIFIERS, check_classifier
+from src.services.triage import split_urgent
+from src.services.dedup import DEDUP_INDEX_PATH, DedupIndex
+from src.services.search_index import SEARCH_INDEX_DIR, SearchIndex
+from src.services.surge import DETECTOR, SurgeStage
+from src.services.sources import get_source
 from src.services.notifier import notify_p1_ticket
-from src.services.llm_client import LLMClient
+from src.services.pipeline import ClassifyStage, Item, NormalizeStage, Pipeline, RouteStage, Stage
+from src.utils.timing import PhaseTimer
+from src.utils.schema import OUTPUT_COLUMNS, TICKET_COLUMNS, append_tickets, coerce, read_tickets, write_tickets
+from src.utils.io import append_rows, read_header, truncate
+from src.utils.journal import AlertLedger, JobJournal
 
 # Permite override por .env si querés apuntar a otros paths
-INPUT_CSV = os.getenv("LOCAL_INPUT_CSV", "data/sample_tickets.csv")
+# Insumo: INGEST_SOURCE=csv (LOCAL_INPUT_CSV) o sheets (espejo local de la planilla)
+SOURCE = get_source()
+INPUT_CSV = SOURCE.path
 OUTPUT_CSV = os.getenv("LOCAL_OUTPUT_CSV", "data/outputs/classified.csv")
+WATCH_DEBOUNCE_MS = int(os.getenv("WATCH_DEBOUNCE_MS", "50"))
+WATCH_MAX_DELAY_MS = int(os.getenv("WATCH_MAX_DELAY_MS", "250"))
+# --watch: cada cuánto se reintentan las alertas P1 pendientes aunque no lleguen filas
+WATCH_RETRY_SEC = float(os.getenv("WATCH_RETRY_SEC", "30"))
+# Checkpoints: filas por chunk (lo que se pierde como máximo si el proceso muere)
+JOB_CHUNK_SIZE = max(1, int(os.getenv("JOB_CHUNK_SIZE", "5000")))
+JOB_JOURNAL_PATH = os.getenv("JOB_JOURNAL_PATH") or OUTPUT_CSV + ".journal.json"
+ALERT_LEDGER_PATH = os.getenv("ALERT_LEDGER_PATH", "data/outputs/alert_ledger.tsv")
 
 # Asegurar carpetas
 Path(OUTPUT_CSV).parent.mkdir(parents=True, exist_ok=True)
 
+EXPECTED_COLS = TICKET_COLUMNS
+OUTPUT_COLS = OUTPUT_COLUMNS
+
 
 def _load_existing(path: str) -> pd.DataFrame:
     p = Path(path)
     if p.exists():
         try:
-            df = pd.read_csv(p)
-            # normalizar tipos básicos
-            if "created_at" in df.columns:
-                df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
-            return df
+            return read_tickets(p, OUTPUT_COLUMNS)
         except Exception:
             pass
     return pd.DataFrame()
@@ -46,99 +59,304 @@ def _load_input(path: str) -> pd.DataFrame:
     p = Path(path)
     if not p.exists():
         raise FileNotFoundError(f"Input CSV not found: {path}")
-    df = pd.read_csv(p)
-    if "created_at" in df.columns:
-        df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce")
-    return df
-
-
-def _text_of(r: Dict) -> str:
-    """Concat minimal text context for rules."""
-    subj = str(r.get("subject", "") or "")
-    desc = str(r.get("description", "") or "")
-    return (subj + " " + desc).strip()
-
-
-def _classify_rows(rows: List[Dict]) -> List[Dict]:
-    """Apply simple rules to compute topic, priority, sentiment, and owner."""
-    out: List[Dict] = []
-    for r in rows:
-        text = _text_of(r)
-
-        # topic/sentiment esperan TEXTO
-        topic = simple_topic(text)
-        sentiment = simple_sentiment(text)
-
-        # priority: intentar (row, topic); si tu firma es distinta, caer a (text)
+    return read_tickets(p)
+
+
+def _alert_payload(out: Dict) -> Dict:
+    # Copia JSON-serializable del representante (queda en el journal hasta que se envíe)
+    return {k: (None if v is None or v != v else v if isinstance(v, (str, int, float, bool)) else str(v))
+            for k, v in out.items()}
+
+
+class ClusterAlertStage(Stage):
+    """
+    Notify del job: una alerta por cluster de near-duplicates P1 (sends en paralelo).
+    ctx.state: `alerted` (clusters alertados con éxito en la corrida: sus nuevos
+    miembros quedan cubiertos), `ledger` (tickets ya alertados nunca se re-alertan),
+    `pending_alerts` (clusters cuyo envío falló: se reintentan), `check` (lease
+    del modo sharded). Un cluster solo pasa a `alerted`/ledger si el envío salió;
+    si falla, el representante va al DLQ y el cluster queda pendiente (la fila
+    igual se persiste, y el journal guarda la alerta para la próxima corrida).
+    """
+    name = "notify"
+    default_concurrency = 4
+
+    def process(self, items: List[Item], ctx) -> None:
+        st = ctx.state
+        if st.get("check"):
+            st["check"]()
+        alerted = st.setdefault("alerted", set())
+        pending: Dict[str, Dict] = st.setdefault("pending_alerts", {})
+        ledger: Optional[AlertLedger] = st.get("ledger")
+        clusters: Dict[str, List[Item]] = {}
+        covered: Dict[str, List[str]] = {}  # cubiertos por la alerta previa del cluster
+        for it in items:
+            if not it.notify or (ledger is not None and it.id in ledger):  # solo P1
+                continue
+            if it.cluster in alerted:
+                covered.setdefault(it.cluster, []).append(it.id)
+                continue
+            clusters.setdefault(it.cluster, []).append(it)
+        if ledger is not None:
+            for key, ids in covered.items():
+                ledger.record(ids, key)
+        retried = self.retry_pending(st, skip=clusters)
+        work = [(key, members, len(members) + len(pending.get(key, {}).get("ids", [])))
+                for key, members in clusters.items()]
+        results = self.map(lambda w: self._send(w[1][0].out, w[2]), work)
+        sent = 0
+        for (key, members, _), ok in zip(work, results):
+            ids = [m.id for m in members]
+            if ok:
+                sent += 1
+                alerted.add(key)
+                if ledger is not None:
+                    ledger.record(ids + pending.pop(key, {}).get("ids", []), key)
+                continue
+            if key not in pending:
+                members[0].dead_letter("notify_failed", stage="notify", drop=False)
+            entry = pending.setdefault(key, {"ticket": _alert_payload(members[0].out), "ids": []})
+            entry["ids"] = sorted(set(entry["ids"]).union(ids))
+        st["alerts_sent"] = st.get("alerts_sent", 0) + sent
+        print(f"[notify] Telegram alerts sent: {sent + retried} (P1 clusters={len(clusters)}, "
+              f"pending={len(pending)})")
+
+    @classmethod
+    def retry_pending(cls, st: Dict, skip: Iterable[str] = ()) -> int:
+        """Re-send alerts that failed before (this run or a previous one). Stops at the first failure."""
+        pending: Dict[str, Dict] = st.get("pending_alerts") or {}
+        ledger: Optional[AlertLedger] = st.get("ledger")
+        skip = set(skip)
+        sent = 0
+        for key in [k for k in pending if k not in skip]:
+            entry = pending[key]
+            ids = [i for i in entry["ids"] if ledger is None or i not in ledger]
+            if not ids:
+                pending.pop(key)
+                continue
+            if not cls._send(entry["ticket"], len(ids)):
+                break  # Telegram sigue caído: el resto espera al próximo intento
+            if ledger is not None:
+                ledger.record(ids, key)
+            st.setdefault("alerted", set()).add(key)
+            pending.pop(key)
+            sent += 1
+        st["alerts_sent"] = st.get("alerts_sent", 0) + sent
+        return sent
+
+    @staticmethod
+    def _send(ticket: Dict, similar: int) -> bool:
         try:
-            priority = simple_priority(r, topic)  # firma 1: (row, topic)
-        except TypeError:
-            priority = simple_priority(text)      # firma 2: (text)
-
-        owner = owner_for_topic(topic)
-
-        rr = dict(r)
-        rr.update(
-            {
-                "topic": topic,
-                "priority": priority,
-                "sentiment": sentiment,
-                "owner_suggested": owner,
-            }
-        )
-        out.append(rr)
-    return out
-
+            return bool(notify_p1_ticket(ticket, similar=similar))
+        except Exception as e:
+            print("[notify] error sending telegram:", e)
+            return False
+
+
+class CheckpointPersistStage(Stage):
+    """
+    Persist del batch job: append al output (fsync) -> índice de búsqueda -> índice
+    dedup -> checkpoint del journal. Todo antes del checkpoint: un chunk rehecho tras
+    un crash no se indexa dos veces (search y dedup son idempotentes por id).
+    Con `fence` (modo sharded) todo corre dentro de la sección fenced del lease y
+    solo si el journal en disco no tiene un token más nuevo.
+    """
+    name = "persist"
+
+    def process(self, items: List[Item], ctx) -> None:
+        st = ctx.state
+        cols_all = list(OUTPUT_COLS)
+        rows = [{**it.out, "is_new": True} for it in items]
+        df = coerce(pd.DataFrame(rows)[cols_all], cols_all)
+        with st["fence"]():
+            st["journal"].fence()
+            size = append_tickets(df, st["output_csv"])
+            if st.get("search") is not None:
+                st["search"].add(rows)
+            if st.get("dedup_path"):
+                st["dedup"].save(st["dedup_path"])
+            st["journal"].checkpoint(size, len(rows), st["alerted"], pending_alerts=st["pending_alerts"])
+
+
+class AppendPersistStage(Stage):
+    """Persist del modo watch: append directo de las filas (latencia mínima)."""
+    name = "persist"
+
+    def process(self, items: List[Item], ctx) -> None:
+        st = ctx.state
+        rows = [{**it.out, "is_new": True} for it in items]
+        append_rows(st["output_csv"], rows, read_header(st["output_csv"]) or OUTPUT_COLS)
+        if st.get("search") is not None:
+            st["search"].add(rows)
+        st["dedup"].save(st["dedup_path"])
+
+
+def build_pipeline(watch: bool = False, alerts: bool = True) -> Pipeline:
+    """
+    normalize -> classify -> route (dedup) -> [surge] -> [notify (clusters + ledger)] -> persist.
+    Surge solo en --watch: el detector vive en memoria y un proceso de una sola
+    pasada no tiene línea base (nunca dispararía). `alerts=False` (workers del modo
+    sharded): los clusters son globales, alerta el coordinador después del merge.
+    """
+    if watch:
+        stages = [NormalizeStage(), ClassifyStage(), RouteStage(), SurgeStage(), ClusterAlertStage(),
+                  AppendPersistStage()]
+    else:
+        notify = [ClusterAlertStage()] if alerts else []
+        stages = [NormalizeStage(), ClassifyStage(), RouteStage(), *notify, CheckpointPersistStage()]
+    return Pipeline(stages, name="watch" if watch else "job")
+
+
+def _resolve_ruleset(tenant: Optional[str]) -> RuleSet:
+    # Rule set: explícito (--tenant / RULES_TENANT) o según el archivo de entrada
+    tenant = tenant or os.getenv("RULES_TENANT") or REGISTRY.tenant_for_input(INPUT_CSV)
+    ruleset = REGISTRY.get(tenant)
+    print(f"[rules] tenant={ruleset.name} source={ruleset.source}")
+    return ruleset
+
+
+def _prepare_output(df_prev: pd.DataFrame, cols_all: List[str], output_csv: str = OUTPUT_CSV) -> int:
+    """Make sure `output_csv` exists with the current header (atomic rewrite if not). Returns its size."""
+    if df_prev.empty or read_header(output_csv) != cols_all:
+        base = df_prev.copy() if not df_prev.empty else pd.DataFrame(columns=cols_all)
+        if "is_new" not in base.columns:
+            base["is_new"] = False
+        base = coerce(base[cols_all], cols_all)
+        base.sort_values(by="created_at", ascending=False, inplace=True, na_position="last")
+        write_tickets(base, output_csv)
+    return Path(output_csv).stat().st_size
+
+
+def recover(journal: JobJournal, output_csv: str = OUTPUT_CSV) -> set:
+    """
+    If the journal's last run was interrupted, cut `output_csv` back to its last
+    checkpoint (drops the partially appended chunk). Returns the clusters it had alerted.
+    """
+    if not journal.interrupted:
+        return set()
+    cut = truncate(output_csv, journal.state.get("output_bytes", 0))
+    print(f"[journal] resuming interrupted run: {journal.state.get('rows_done', 0)} rows "
+          f"checkpointed, partial chunk {'dropped' if cut else 'not found'}")
+    return set(journal.state.get("alerted_clusters", []))
+
+
+def process_rows(new_rows: List[Dict], ruleset: RuleSet, classifier: Optional[str], *,
+                 df_prev: pd.DataFrame, output_csv: str, journal: JobJournal, ledger: Optional[AlertLedger],
+                 dedup: Optional[DedupIndex], dedup_path: Optional[str], alerted: set, timer: PhaseTimer,
+                 chunk_size: int = JOB_CHUNK_SIZE, check: Optional[Callable[[], None]] = None,
+                 fence: Optional[Callable[[], ContextManager]] = None,
+                 search: Optional[SearchIndex] = None, cascade=None, alerts: bool = True,
+                 **journal_extra) -> Tuple[List[Dict], Dict[str, int], int, int]:
+    """
+    Run `new_rows` through the job pipeline chunk by chunk (normalize -> classify ->
+    route/dedup -> alert P1 clusters -> append to `output_csv` + checkpoint). Likely
+    P1s (fast-track) go first so they alert without waiting for the bulk.
+    `check()` runs before alerting and may raise to stop (lost lease); `fence()`
+    (a context manager, e.g. FileLease.fenced) wraps every write to `output_csv`
+    and the journal, and the journal refuses writes once a newer token is on disk.
+    `dedup_path=None` keeps the dedup index in memory only; `search` (if given)
+    indexes every committed chunk for full-text search. The cascade's LLM budget
+    covers the whole call (all chunks); pass `cascade` to share it wider (sharded worker).
+    `alerts=False` skips the notify stage (sharded workers: the coordinator alerts).
+    Returns (classified rows, touched clusters, alerts sent, fast-tracked count).
+    """
+    cols_all = list(EXPECTED_COLS) + ["is_new"]
+    urgent_idx, bulk_idx = split_urgent(new_rows, ruleset)
+    fence = fence or nullcontext
+    with fence():
+        journal.fence()
+        journal.begin(_prepare_output(df_prev, cols_all, output_csv), new_rows=len(new_rows),
+                      alerted_clusters=sorted(alerted), **journal_extra)
+    pipeline = build_pipeline(alerts=alerts)
+    timer.lap("triage")
+    # pending_alerts: envíos fallidos de corridas anteriores (begin() los conserva)
+    state = {"dedup": dedup, "dedup_path": dedup_path, "ledger": ledger, "alerted": alerted,
+             "pending_alerts": journal.state["pending_alerts"], "journal": journal, "output_csv": output_csv,
+             "check": check, "fence": fence, "search": search, "touched": {}, "cascade": cascade}
+    classified_new: List[Dict] = [None] * len(new_rows)
+    for phase, idx in (("fast_track", urgent_idx), ("classify", bulk_idx)):
+        for start in range(0, len(idx), chunk_size):
+            chunk_idx = idx[start:start + chunk_size]
+            items = pipeline.run([new_rows[i] for i in chunk_idx], ruleset, classifier, timer=timer, state=state)
+            for i, it in zip(chunk_idx, items):
+                if it.alive:
+                    classified_new[i] = {**it.out, "is_new": True}
+        if phase == "fast_track":
+            print(f"[triage] fast-tracked {len(idx)}/{len(new_rows)} likely-P1 rows")
+    if alerts and state["pending_alerts"]:
+        if check:
+            check()
+        retried = ClusterAlertStage.retry_pending(state)
+        print(f"[notify] pending alerts re-sent: {retried}, still pending: {len(state['pending_alerts'])}")
+    with fence():
+        journal.finish(Path(output_csv).stat().st_size, pending_alerts=state["pending_alerts"])
+    print(f"[pipeline] {pipeline.stats()}")
+    classified_new = [r for r in classified_new if r is not None]  # classify_error -> DLQ
+    return classified_new, state["touched"], state.get("alerts_sent", 0), len(urgent_idx)
+
+
+def main(tenant: Optional[str] = None, classifier: Optional[str] = None,
+         timer: Optional[PhaseTimer] = None, chunk_size: int = JOB_CHUNK_SIZE) -> Dict:
+    """
+    Run one incremental pass. Phase timings (load/classify/write/notify/summarize) go to `timer`.
+
+    New rows are processed in chunks of `chunk_size`; each chunk is appended to the
+    output (fsync), its P1s alerted through the ledger and then checkpointed in the
+    journal. If a previous run died mid-chunk, its partial append is cut off first
+    and only that chunk is redone; the ledger keeps alerts from repeating.
+    """
+    timer = timer or PhaseTimer()
+    classifier = check_classifier(classifier)  # `ml` sin modelo: fallar acá, no clasificar con reglas
+    ruleset = _resolve_ruleset(tenant)
+
+    # 0) Recuperación: recortar el chunk a medio escribir de una corrida interrumpida
+    journal = JobJournal.load(JOB_JOURNAL_PATH)
+    resumed = journal.interrupted
+    alerted = recover(journal, OUTPUT_CSV)
 
-def main() -> None:
     # 1) Cargar insumo y salidas previas
-    df_in = _load_input(INPUT_CSV)
+    df_in = SOURCE.load()
     df_prev = _load_existing(OUTPUT_CSV)
 
-    # 2) Definir columnas esperadas
-    expected_cols = [
-        "id",
-        "created_at",
-        "channel",
-        "subject",
-        "description",
-        "topic",
-        "priority",
-        "sentiment",
-        "owner_suggested",
-    ]
-    for c in expected_cols:
-        if c not in df_in.columns:
-            df_in[c] = None
-    for c in expected_cols:
-        if c not in df_prev.columns:
-            df_prev[c] = None
-
-    # 3) Detectar nuevas filas por 'id'
-    prev_ids = (
-        set(df_prev["id"].astype(str))
-        if not df_prev.empty and "id" in df_prev.columns
-        else set()
-    )
-    df_in["id"] = df_in["id"].astype(str)
+    # 2) Columnas esperadas (read_tickets ya agrega las faltantes con tipos compactos)
+    expected_cols = list(EXPECTED_COLS)
+
+    # 3) Detectar nuevas filas por 'id' (ids ya son str internados)
+    prev_ids = set(df_prev["id"]) if not df_prev.empty else set()
     df_new = df_in[~df_in["id"].isin(prev_ids)].copy()
 
-    # 4) Clasificar nuevas (reglas)
+    # Índice de búsqueda: ponerse al día con el output existente (primera corrida o índice borrado)
+    search = SearchIndex.open(SEARCH_INDEX_DIR)
+    if not df_prev.empty:
+        backfilled = search.catch_up(df_prev[["id", "subject", "description"]].to_dict(orient="records"))
+        if backfilled:
+            print(f"[search] indexed {backfilled} existing rows")
+    if SOURCE.name != "csv":
+        print(f"[source] {SOURCE.stats()}")
+    timer.lap("load")
+
+    # 4-5) Triage + por chunk: clasificar -> append al output -> alertar P1 -> checkpoint
+    #      (los P1 probables primero: alertan sin esperar al bulk ni a la escritura)
     new_rows = df_new.to_dict(orient="records")
-    classified_new = _classify_rows(new_rows)
+    dedup = DedupIndex.load(DEDUP_INDEX_PATH)
+    cols_all = expected_cols + ["is_new"]
+    classified_new, touched, p1_sent, fast_tracked = process_rows(
+        new_rows, ruleset, classifier, df_prev=df_prev, output_csv=OUTPUT_CSV, journal=journal,
+        ledger=AlertLedger(ALERT_LEDGER_PATH), dedup=dedup, dedup_path=DEDUP_INDEX_PATH,
+        alerted=alerted, timer=timer, chunk_size=chunk_size, search=search, input=INPUT_CSV,
+    )
+    print(f"[normalize] cache={cache_stats()}")
+
+    multi = sum(1 for n in touched.values() if n > 1)
+    print(f"[dedup] clusters_total={len(dedup)} touched={len(touched)} with_duplicates={multi}")
 
-    # 5) Marcar 'is_new' y armar DF final de nuevas
-    for r in classified_new:
-        r["is_new"] = True
+    # 6) Conciliar en memoria (resumen y métricas): previas + nuevas clasificadas
     df_new_cls = (
         pd.DataFrame(classified_new)
         if classified_new
-        else pd.DataFrame(columns=expected_cols + ["is_new"])
+        else pd.DataFrame(columns=cols_all)
     )
 
-    # 6) Conciliar: unir previas + nuevas clasificadas (solo si hay nuevas)
-    cols_all = expected_cols + ["is_new"]
-
     if df_prev.empty and df_new_cls.empty:
         merged = pd.DataFrame(columns=cols_all)
     elif df_prev.empty and not df_new_cls.empty:
@@ -156,27 +374,18 @@ def main() -> None:
             [df_prev[cols_all], df_new_cls[cols_all]],
             ignore_index=True,
         )
-
-    # 7) Guardar outputs
+    # concat de categorías distintas cae a object: re-aplicar el schema
+    merged = coerce(merged, cols_all)
     merged.sort_values(
         by="created_at", ascending=False, inplace=True, na_position="last"
     )
-    merged.to_csv(OUTPUT_CSV, index=False)
-
-    # 8) Notificación: SOLO para nuevos P1
-    p1_sent = 0
-    for row in classified_new:
-        try:
-            if row.get("priority") == "P1":  # solo P1
-                ok = notify_p1_ticket(row)
-                if ok:
-                    p1_sent += 1
-        except Exception as e:
-            print("[notify] error sending telegram:", e)
-    print(f"[notify] Telegram alerts sent: {p1_sent}")
+    # write/notify ya ocurrieron chunk a chunk (append atómico por chunk + ledger)
+    timer.lap("classify")
 
     # 9) (Opcional) Resumen IA en consola (sobre todo el dataset o solo nuevas)
     try:
+        from src.services.llm_client import LLMClient  # diferido: solo para el resumen
+
         llm = LLMClient()
         # Elegí qué resumir: todo (merged) suele ser más útil semana a semana
         rows_for_summary = merged.to_dict(orient="records")
@@ -190,6 +399,7 @@ def main() -> None:
         print(summary)
     except Exception as e:
         print("[summary] AI summary unavailable:", e)
+    timer.lap("summarize")
 
     # 10) Métricas rápidas
     total_now = len(merged)
@@ -198,7 +408,86 @@ def main() -> None:
         int((merged["priority"] == "P1").sum()) if "priority" in merged.columns else 0
     )
     print(f"[metrics] total={total_now} (+{new_count} new), P1_total={p1_now}")
+    print(f"[timing] {timer.as_dict()}")
+    return {"total": total_now, "new": new_count, "p1_total": p1_now, "alerts_sent": p1_sent,
+            "fast_tracked": fast_tracked, "resumed": resumed}
+
+
+def _pending_ids(state: Dict) -> Dict[str, List[str]]:
+    return {k: list(v["ids"]) for k, v in state["pending_alerts"].items()}
+
+
+def watch(tenant: Optional[str] = None, classifier: Optional[str] = None,
+          debounce_ms: int = WATCH_DEBOUNCE_MS, max_delay_ms: int = WATCH_MAX_DELAY_MS) -> None:
+    """
+    Long-running mode: one full catch-up pass, then react to new input rows.
+
+    Only the rows added since the last pass are read (CSV: appended bytes, via
+    CsvTailReader on each file event; Sheets: rows after the last one read,
+    polled every SHEETS_POLL_SEC). New rows are classified, clustered, appended
+    to OUTPUT_CSV and P1 clusters are alerted right away. The LLM summary is
+    skipped here (too slow for the alert path); use the batch job or /run for it.
+    """
+    # Watcher + tail ANTES de la pasada completa: lo que se agregue mientras corre main()
+    # se ve igual (lo que main ya procesó lo filtra `seen`)
+    SOURCE.seek_end()
+    main(tenant=tenant, classifier=classifier)
+
+    seen = set(read_tickets(OUTPUT_CSV, usecols=["id"])["id"]) if Path(OUTPUT_CSV).exists() else set()
+    dedup = DedupIndex.load(DEDUP_INDEX_PATH)
+    ledger = AlertLedger(ALERT_LEDGER_PATH)
+    search = SearchIndex.open(SEARCH_INDEX_DIR)
+    pipeline = build_pipeline(watch=True)
+    # Estado de alertas de todo el watch (no por tick): los clusters ya alertados cubren a sus
+    # nuevos miembros y los envíos fallidos (incluidos los que dejó main() en el journal)
+    # se reintentan en los ticks siguientes
+    journal = JobJournal.load(JOB_JOURNAL_PATH)
+    state = {"dedup": dedup, "dedup_path": DEDUP_INDEX_PATH, "ledger": ledger, "output_csv": OUTPUT_CSV,
+             "search": search, "alerted": set(), "pending_alerts": journal.state.get("pending_alerts") or {}}
+    last_retry = time.monotonic()
+    print(f"[watch] watching {SOURCE.name}:{INPUT_CSV}, debounce={debounce_ms}ms, "
+          f"pending alerts={len(state['pending_alerts'])}")
+
+    try:
+        while True:
+            pending_before = _pending_ids(state)
+            woke = SOURCE.wait(debounce_ms / 1000.0, max_delay_ms / 1000.0,
+                               timeout=WATCH_RETRY_SEC if state["pending_alerts"] else None)
+            t0 = time.perf_counter()
+            rows = [r for r in SOURCE.read_new() if r.get("id") and r["id"] not in seen] if woke else []
+            state["alerts_sent"], state["touched"] = 0, {}
+            if rows:
+                ruleset = REGISTRY.get(tenant or os.getenv("RULES_TENANT") or REGISTRY.tenant_for_input(INPUT_CSV))
+                # P1 antes que el append: la alerta es lo sensible a latencia (el notify reintenta los pendientes)
+                items = pipeline.run(rows, ruleset, classifier, state=state)
+                seen.update(it.id for it in items)
+                last_retry = time.monotonic()
+                print(f"[watch] +{len(items)} rows, alerts={state['alerts_sent']}, "
+                      f"latency={(time.perf_counter() - t0) * 1000:.1f}ms")
+            elif state["pending_alerts"] and time.monotonic() - last_retry >= WATCH_RETRY_SEC:
+                retried = ClusterAlertStage.retry_pending(state)
+                last_retry = time.monotonic()
+                print(f"[notify] pending alerts re-sent: {retried}, still pending: {len(state['pending_alerts'])}")
+            if _pending_ids(state) != pending_before:
+                # Que un reinicio del watch (o la próxima corrida del job) los siga reintentando
+                size = Path(OUTPUT_CSV).stat().st_size if Path(OUTPUT_CSV).exists() else 0
+                journal.finish(size, pending_alerts=state["pending_alerts"])
+    except KeyboardInterrupt:
+        surge = DETECTOR.snapshot()
+        print(f"[surge] alerts={len(surge['recent_alerts'])} stale_skipped={surge['skipped_stale']} "
+              f"heavy_hitters={[h['keyword'] for h in surge['heavy_hitters'][:5]]}")
+        print("[watch] stopped")
+    finally:
+        SOURCE.close()
 
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="Classify new rows from the input CSV")
+    ap.add_argument("--tenant", default=None, help="Rule set to use (config/rules/<tenant>.json)")
+    ap.add_argument("--classifier", choices=CLASSIFIERS, default=None, help="Default: CLASSIFIER env or 'rules'")
+    ap.add_argument("--watch", action="store_true", help="Keep running and process rows added to the input")
+    args = ap.parse_args()
+    if args.watch:
+        watch(tenant=args.tenant, classifier=args.classifier)
+    else:
+        main(tenant=args.tenant, classifier=args.classifier)
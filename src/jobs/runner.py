@@ -0,0 +1,137 @@
+# src/jobs/runner.py
+"""
+Single-flight background runner for process_new_rows.
+
+- `trigger()` returns immediately with a run record (status "queued").
+- At most one run executes at a time (one worker thread).
+- Triggers that arrive while a run is executing collapse into ONE follow-up
+  run: the first creates it, the rest are counted in its `coalesced` field.
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.utils.timing import PhaseTimer
+
+RUN_HISTORY = 100
+
+
+def _default_job(timer: PhaseTimer) -> Dict:
+    # Import diferido: pandas & co. se cargan recién en la primera corrida
+    from src.jobs.process_new_rows import main as run_job
+    return run_job(timer=timer)
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class JobRunner:
+    def __init__(self, job: Optional[Callable[[PhaseTimer], Dict]] = None, history: int = RUN_HISTORY):
+        self._job = job or _default_job
+        self._history = history
+        self._cv = threading.Condition()
+        self._runs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._current: Optional[str] = None
+        self._pending: Optional[str] = None
+        self._worker: Optional[threading.Thread] = None
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+            self._worker.start()
+
+    def trigger(self, source: str = "api") -> Dict:
+        with self._cv:
+            if self._pending is not None:
+                run = self._runs[self._pending]
+                run["coalesced"] += 1
+                return dict(run)
+
+            run_id = uuid.uuid4().hex[:12]
+            run = {
+                "id": run_id,
+                "status": "queued",
+                "source": source,
+                "triggered_at": _now(),
+                "started_at": None,
+                "finished_at": None,
+                "coalesced": 0,
+                "phases_ms": {},
+                "result": None,
+                "error": None,
+            }
+            self._runs[run_id] = run
+            while len(self._runs) > self._history:
+                oldest = next(iter(self._runs))
+                if oldest in (self._current, self._pending):
+                    break
+                self._runs.pop(oldest)
+            self._pending = run_id
+            self._ensure_worker()
+            self._cv.notify_all()
+            return dict(run)
+
+    def _loop(self) -> None:
+        while True:
+            with self._cv:
+                while self._pending is None:
+                    self._cv.wait()
+                run_id, self._pending = self._pending, None
+                self._current = run_id
+                run = self._runs[run_id]
+                run["status"] = "running"
+                run["started_at"] = _now()
+
+            timer = PhaseTimer(on_lap=lambda t, run=run: self._progress(run, t))
+            try:
+                result = self._job(timer)
+                status, error = "succeeded", None
+            except Exception as e:
+                result, status, error = None, "failed", str(e)
+
+            with self._cv:
+                run.update({
+                    "status": status,
+                    "finished_at": _now(),
+                    "phases_ms": timer.as_dict(),
+                    "result": result,
+                    "error": error,
+                })
+                self._current = None
+                self._cv.notify_all()
+
+    def _progress(self, run: Dict, timer: PhaseTimer) -> None:
+        # Fases ya cerradas visibles en /runs/{id} mientras la corrida sigue
+        with self._cv:
+            run["phases_ms"] = timer.as_dict()
+
+    def get(self, run_id: str) -> Optional[Dict]:
+        with self._cv:
+            run = self._runs.get(run_id)
+            return dict(run) if run else None
+
+    def recent(self, n: int = 20) -> List[Dict]:
+        with self._cv:
+            return [dict(r) for r in list(self._runs.values())[-n:]][::-1]
+
+    def wait(self, run_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Block until the run finishes (or timeout); returns its latest record."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cv:
+            while True:
+                run = self._runs.get(run_id)
+                if run is None or run["status"] in ("succeeded", "failed"):
+                    return dict(run) if run else None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return dict(run)
+                self._cv.wait(remaining)
+
+
+RUNNER = JobRunner()
@@ -0,0 +1,262 @@
+# src/jobs/sharded.py
+"""
+Modo sharded de process_new_rows: N workers (en uno o varios hosts con un
+filesystem compartido) se reparten particiones hash de los ids.
+
+- partición = crc32(id) % SHARD_PARTITIONS (estable entre hosts y corridas).
+- Cada partición se toma con un lease de archivo (src/utils/lease.py); el
+  worker la clasifica con el mismo loop por chunks del job (journal propio de
+  la partición) y escribe su propio classified.csv. Los workers no alertan.
+- Si un worker muere, su lease vence y otro lo reclama: recorta el chunk a
+  medio escribir y sigue desde el último checkpoint. Fencing: el token del lease se guarda en el journal de la
+  partición; append, checkpoint, recorte y finish corren bajo el lock del lease
+  y se rechazan si el journal en disco ya tiene un token más nuevo.
+- `merge` (coordinador) agrega las salidas de las particiones terminadas al
+  OUTPUT_CSV principal: reasigna dup_cluster con el índice global, manda una
+  alerta por cluster P1 (ledger + pendientes del journal principal: un cluster
+  repartido entre particiones alerta una sola vez; los envíos fallidos se
+  reintentan en cada merge) y borra la salida de la partición ya mergeada.
+  Las alertas P1 salen recién en el merge.
+
+    python -m src.jobs.sharded worker                 # en cada nodo (o varias veces)
+    python -m src.jobs.sharded merge                  # coordinador, al final
+    python -m src.jobs.sharded run --workers 4        # local: 4 procesos + merge
+
+El resumen IA no corre en este modo (usar el job normal o /run).
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.jobs import process_new_rows as job
+from src.services.classifiers import cascade_for, check_classifier
+from src.services.dedup import DEDUP_INDEX_PATH, DedupIndex
+from src.services.pipeline import Context, Item, RouteStage
+from src.services.search_index import SEARCH_INDEX_DIR, SearchIndex
+from src.utils.journal import AlertLedger, JobJournal
+from src.utils.lease import FileLease, LeaseLost, default_owner
+from src.utils.schema import OUTPUT_COLUMNS, append_tickets, coerce, read_tickets
+from src.utils.timing import PhaseTimer
+
+SHARD_DIR = os.getenv("SHARD_DIR", "data/outputs/shards")
+SHARD_PARTITIONS = max(1, int(os.getenv("SHARD_PARTITIONS", "16")))
+SHARD_POLL_SEC = float(os.getenv("SHARD_POLL_SEC", "1"))
+
+
+def partition_of(ticket_id, partitions: int) -> int:
+    return zlib.crc32(str(ticket_id).encode("utf-8")) % partitions
+
+
+def _partition_dir(p: int, partitions: int) -> Path:
+    # Un layout por cantidad de particiones: cambiar N no mezcla salidas viejas
+    return Path(SHARD_DIR) / f"n{partitions}" / f"p{p:03d}"
+
+
+def _input_sig(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _pending(p: int, partitions: int, sig: str) -> bool:
+    """Partition not yet done for this exact input (or left interrupted)."""
+    state = JobJournal.load(_partition_dir(p, partitions) / "journal.json").state
+    return not (state.get("status") == JobJournal.DONE and state.get("input_sig") == sig)
+
+
+def _main_ids() -> set:
+    if not Path(job.OUTPUT_CSV).exists():
+        return set()
+    return set(read_tickets(job.OUTPUT_CSV, usecols=["id"])["id"])
+
+
+def run_partition(p: int, partitions: int, df_in: pd.DataFrame, parts: np.ndarray, done_ids: set,
+                  sig: str, lease: FileLease, ruleset, classifier: Optional[str] = None,
+                  chunk_size: int = job.JOB_CHUNK_SIZE, timer: Optional[PhaseTimer] = None, cascade=None) -> Dict:
+    """Classify the new rows of partition `p` into its own output (caller holds `lease`)."""
+    timer = timer or PhaseTimer()
+    d = _partition_dir(p, partitions)
+    out = str(d / "classified.csv")
+    with lease.fenced():
+        # Leído y marcado bajo el lock: el dueño anterior (si sigue vivo) ya no puede
+        # appendear ni checkpointear, y el recorte no pisa un append suyo en curso.
+        journal = JobJournal.load(d / "journal.json", token=lease.token)
+        journal.claim()
+        alerted = job.recover(journal, out)
+    df_prev = job._load_existing(out)
+    seen = done_ids | (set(df_prev["id"]) if not df_prev.empty else set())
+    df_new = df_in[(parts == p) & ~df_in["id"].isin(seen)]
+    timer.lap("load")
+
+    # Sin dedup ni alertas acá: los clusters son globales (los asigna y alerta el merge)
+    classified, _, _, _ = job.process_rows(
+        df_new.to_dict(orient="records"), ruleset, classifier, df_prev=df_prev, output_csv=out,
+        journal=journal, ledger=None, dedup=None, dedup_path=None, alerted=alerted, timer=timer,
+        chunk_size=chunk_size, check=lease.check, fence=lease.fenced, cascade=cascade, alerts=False,
+        input=job.INPUT_CSV, input_sig=sig, partition=p, partitions=partitions, owner=lease.owner,
+    )
+    return {"partition": p, "new": len(classified)}
+
+
+def run_worker(partitions: int = SHARD_PARTITIONS, owner: Optional[str] = None,
+               tenant: Optional[str] = None, classifier: Optional[str] = None,
+               chunk_size: int = job.JOB_CHUNK_SIZE, poll: float = SHARD_POLL_SEC, sync: bool = True) -> Dict:
+    """
+    Claim and process partitions until none is pending for the current input.
+    Partitions leased by live workers are waited on; expired leases are reclaimed.
+    `sync=False` when the coordinator already synced the source (run_local).
+    """
+    timer = PhaseTimer()
+    classifier = check_classifier(classifier)  # `ml` sin modelo: fallar acá, no clasificar con reglas
+    ruleset = job._resolve_ruleset(tenant)
+    if sync:
+        job.SOURCE.sync()  # Sheets: filas nuevas al espejo (bajo su lease de sync; CSV: no-op)
+    sig = _input_sig(job.INPUT_CSV)  # antes de leer: si el input cambia, la próxima corrida lo ve
+    df_in = job._load_input(job.INPUT_CSV)
+    parts = np.fromiter((partition_of(i, partitions) for i in df_in["id"]), dtype=np.int64, count=len(df_in))
+    done_ids = _main_ids()
+    lease_owner = owner or default_owner()
+    start = zlib.crc32(lease_owner.encode("utf-8")) % partitions  # cada worker arranca en otro lugar
+    order = [(start + k) % partitions for k in range(partitions)]
+    cascade = cascade_for({}, classifier)  # un presupuesto LLM por worker, no por partición
+    timer.lap("load")
+
+    results: List[Dict] = []
+    while True:
+        pending = [p for p in order if _pending(p, partitions, sig)]
+        if not pending:
+            break
+        progressed = False
+        for p in pending:
+            lease = FileLease(_partition_dir(p, partitions) / "lease", lease_owner)
+            if not lease.acquire():
+                continue
+            try:
+                if _pending(p, partitions, sig):  # otro pudo terminarla entre el check y el lease
+                    results.append(run_partition(p, partitions, df_in, parts, done_ids, sig, lease,
+                                                 ruleset, classifier, chunk_size, timer, cascade))
+                progressed = True
+            except LeaseLost as e:
+                print(f"[shard] p{p}: {e}; dropping it")
+            finally:
+                lease.release()
+        if not progressed:
+            time.sleep(poll)  # el resto está tomado: esperar que terminen o venzan
+
+    summary = {
+        "owner": lease_owner,
+        "partitions": [r["partition"] for r in results],
+        "new": sum(r["new"] for r in results),
+        "timing": timer.as_dict(),
+    }
+    print(f"[shard] worker {lease_owner}: {summary}")
+    return summary
+
+
+def merge(partitions: int = SHARD_PARTITIONS) -> Dict:
+    """
+    Coordinator: append finished partition outputs to OUTPUT_CSV (crash-safe via the
+    main journal), re-cluster them with the global dedup index, alert P1 clusters
+    (one alert per global cluster), index them for search and drop merged outputs.
+    Per partition: assign -> alert (ledger) -> append -> search -> dedup.save ->
+    checkpoint. Pending alerts (failed sends) are retried on every merge.
+    Partitions that are leased or interrupted are skipped (merge again later).
+    """
+    cols_all = list(OUTPUT_COLUMNS)
+    with FileLease(Path(SHARD_DIR) / f"n{partitions}" / "merge.lease"):
+        journal = JobJournal.load(job.JOB_JOURNAL_PATH)
+        alerted = job.recover(journal, job.OUTPUT_CSV)
+        df_main = job._load_existing(job.OUTPUT_CSV)
+        main_ids = set(df_main["id"]) if not df_main.empty else set()
+        journal.begin(job._prepare_output(df_main, cols_all, job.OUTPUT_CSV), merge=True, partitions=partitions,
+                      alerted_clusters=sorted(alerted))
+        del df_main
+        dedup = DedupIndex.load(DEDUP_INDEX_PATH)
+        search = SearchIndex.open(SEARCH_INDEX_DIR)  # solo el coordinador indexa (output principal)
+        # Mismo estado que ClusterAlertStage en el job: ledger y pendientes del journal principal
+        state = {"dedup": dedup, "ledger": AlertLedger(job.ALERT_LEDGER_PATH), "alerted": alerted,
+                 "pending_alerts": journal.state["pending_alerts"], "touched": {}}
+        route, notify = RouteStage(), job.ClusterAlertStage()
+        merged, skipped = 0, []
+        for p in range(partitions):
+            d = _partition_dir(p, partitions)
+            out = d / "classified.csv"
+            if not out.exists():
+                continue
+            lease = FileLease(d / "lease")
+            if not lease.acquire():
+                skipped.append(p)
+                continue
+            try:
+                if JobJournal.load(d / "journal.json").interrupted:
+                    skipped.append(p)
+                    continue
+                df = read_tickets(out, OUTPUT_COLUMNS)
+                df = df[~df["id"].isin(main_ids)]
+                if len(df):
+                    rows = df.to_dict(orient="records")
+                    items = [Item(r, out=r) for r in rows]
+                    ctx = Context(None, state=state)
+                    route.process(items, ctx)  # dup_cluster global (entre particiones) + P1 -> notify
+                    notify.process(items, ctx)  # una alerta por cluster global; el ledger evita repetir
+                    size = append_tickets(coerce(pd.DataFrame(rows)[cols_all], cols_all), job.OUTPUT_CSV)
+                    search.add(rows)
+                    dedup.save(DEDUP_INDEX_PATH)  # antes del checkpoint (un chunk rehecho mantiene su cluster)
+                    journal.checkpoint(size, len(rows), state["alerted"], pending_alerts=state["pending_alerts"])
+                    main_ids.update(df["id"])
+                    merged += len(rows)
+                out.unlink()
+            finally:
+                lease.release()
+        retried = job.ClusterAlertStage.retry_pending(state) if state["pending_alerts"] else 0
+        journal.finish(Path(job.OUTPUT_CSV).stat().st_size, pending_alerts=state["pending_alerts"])
+    print(f"[shard] merged {merged} rows; skipped partitions={skipped}; alerts sent="
+          f"{state.get('alerts_sent', 0)} (retried {retried}), pending={len(state['pending_alerts'])}")
+    return {"merged": merged, "skipped": skipped, "total": len(main_ids),
+            "alerts_sent": state.get("alerts_sent", 0), "pending_alerts": len(state["pending_alerts"])}
+
+
+def _worker_proc(partitions: int, tenant: Optional[str], classifier: Optional[str]) -> None:
+    run_worker(partitions, tenant=tenant, classifier=classifier, sync=False)
+
+
+def run_local(workers: int, partitions: int = SHARD_PARTITIONS, tenant: Optional[str] = None,
+              classifier: Optional[str] = None) -> Dict:
+    """`workers` processes on this host, then merge. The source is synced once, here."""
+    classifier = check_classifier(classifier)  # antes de lanzar los procesos
+    job.SOURCE.sync()
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_worker_proc, args=(partitions, tenant, classifier)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    failed = [proc.exitcode for proc in procs if proc.exitcode]
+    if failed:
+        print(f"[shard] {len(failed)} worker(s) failed (exit codes {failed}); merging what finished")
+    return merge(partitions)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Sharded process_new_rows (file leases over a shared filesystem)")
+    ap.add_argument("mode", choices=["worker", "merge", "run"])
+    ap.add_argument("--partitions", type=int, default=SHARD_PARTITIONS)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="run: local worker processes")
+    ap.add_argument("--owner", default=None, help="worker: lease owner id (default host:pid:rand)")
+    ap.add_argument("--tenant", default=None)
+    ap.add_argument("--classifier", choices=job.CLASSIFIERS, default=None)
+    args = ap.parse_args()
+    if args.mode == "worker":
+        run_worker(args.partitions, owner=args.owner, tenant=args.tenant, classifier=args.classifier)
+    elif args.mode == "merge":
+        merge(args.partitions)
+    else:
+        run_local(args.workers, args.partitions, tenant=args.tenant, classifier=args.classifier)
@@ -0,0 +1,52 @@
+# src/jobs/train_classifier.py
+"""
+Offline training of the statistical classifier from labeled job output.
+
+    python -m src.jobs.train_classifier --input data/outputs/classified.csv
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.services.ml_classifier import CLASSIFIER_MODEL_PATH, HEADS, train
+from src.services.text_norm import ticket_text
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Train the hashed TF-IDF + linear ticket classifier")
+    ap.add_argument("--input", default="data/outputs/classified.csv")
+    ap.add_argument("--out", default=CLASSIFIER_MODEL_PATH)
+    ap.add_argument("--epochs", type=int, default=50)
+    ap.add_argument("--lr", type=float, default=1.0)
+    ap.add_argument("--holdout", type=float, default=0.1, help="Fraction kept aside for accuracy report")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.input, dtype=str).dropna(subset=list(HEADS))
+    if df.empty:
+        raise SystemExit(f"No labeled rows in {args.input}")
+
+    rng = np.random.default_rng(0)
+    mask = rng.random(len(df)) < args.holdout if len(df) >= 20 else np.zeros(len(df), dtype=bool)
+    train_df, test_df = df[~mask], df[mask]
+
+    texts = [ticket_text(r) for r in train_df.to_dict(orient="records")]
+    t0 = time.perf_counter()
+    model = train(texts, {h: train_df[h].tolist() for h in HEADS}, epochs=args.epochs, lr=args.lr)
+    print(f"[train] rows={len(train_df)} features={len(model.idf)} time={time.perf_counter() - t0:.2f}s")
+
+    if not test_df.empty:
+        preds = model.predict([ticket_text(r) for r in test_df.to_dict(orient="records")])
+        for h in HEADS:
+            acc = np.mean([p[h] == y for p, y in zip(preds, test_df[h])])
+            print(f"[eval] {h}: accuracy={acc:.3f} (n={len(test_df)})")
+
+    model.save(args.out)
+    print(f"[train] model saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,64 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List
+import hmac
+import os
+
+import anyio
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Dict, List
+import json
+import time
 
 from src.utils.logger import get_logger, set_request_id
-from src.processor import process_ticket
-from src.metrics import METRICS
-from src.utils.dlq_handler import prune_dlq_older_than
+from src.processor import PIPELINE, process_tickets
+from src.metrics import HISTORY, METRICS
+from src.config import env_bool, env_float, env_int, env_str
+from src.utils.dlq_handler import start_prune_worker
+from src.utils.resilience import breaker_stats
+from src.utils.profiler import PROFILER, profiled, set_profile_mode, reset_profile_mode
+from src.services.rules_engine import get_ruleset
+from src.services.classifiers import DEFAULT_CLASSIFIER, check_classifier
+from src.services.ollama_client import get_scheduler, scheduler_stats
+from src.services.triage import is_urgent, split_urgent
+from src.services.admission import ADMISSION, AdmissionRejected
+from src.services.surge import DETECTOR
+from src.services.idempotency import (
+    IDEMPOTENCY, IDEMPOTENCY_ENABLED, IDEMPOTENCY_WAIT_TIMEOUT, ticket_key,
+)
+from src.utils.stream_parse import iter_csv, iter_ndjson
+from concurrent.futures import TimeoutError as FutureTimeout
 
 logger = get_logger("api")
 
 app = FastAPI(title="AI Automation Workflow API", version="0.2.0")
 
-pruned = prune_dlq_older_than(days=7)
-logger.info(f"DLQ pruned on startup: {pruned} files")
+# Streaming ingest (/process/stream): tickets por micro-batch y tamaño máx. de línea/registro
+STREAM_BATCH_SIZE = env_int("STREAM_BATCH_SIZE", 64)
+STREAM_MAX_LINE_BYTES = env_int("STREAM_MAX_LINE_BYTES", 256 * 1024)
+# SSE de métricas (/metrics/stream): cada cuántos segundos se empujan los deltas
+METRICS_STREAM_INTERVAL = env_float("METRICS_STREAM_INTERVAL_SEC", 1.0)
+
+# DLQ: retención y cada cuánto se poda (en background, fuera del arranque)
+DLQ_RETENTION_DAYS = env_int("DLQ_RETENTION_DAYS", 7)
+DLQ_PRUNE_INTERVAL = env_float("DLQ_PRUNE_INTERVAL_SEC", 3600.0)
+
+@app.on_event("startup")
+def schedule_dlq_prune():
+    start_prune_worker(days=DLQ_RETENTION_DAYS, interval=DLQ_PRUNE_INTERVAL)
+
+@app.on_event("startup")
+def warm_llm():
+    # Ollama: cargar el modelo y mantenerlo vivo en background (no bloquea el arranque)
+    if env_str("LLM_PROVIDER").lower() != "ollama":
+        return
+    if not env_bool("OLLAMA_WARMUP", True):
+        return
+    host = env_str("OLLAMA_HOST", "http://127.0.0.1:11434")
+    model = env_str("LLM_MODEL_NAME", "gpt-4o-mini")
+    get_scheduler(host, model).start_keepalive()
+    logger.info("Ollama warm-up/keep-alive started", extra={"stage": "startup", "extra": {"model": model}})
 
 # --------- Middleware para request_id en cada request ----------
 @app.middleware("http")
@@ -24,6 +69,34 @@ async def add_request_id(request: Request, call_next):
     response.headers["x-request-id"] = set_request_id(rid)  # devuelve el que quedó
     return response
 
+# --------- Middleware de tamaño de body (/process) ----------
+@app.middleware("http")
+async def body_size_limit(request: Request, call_next):
+    # Content-Length sobre el límite → 413 sin leer ni parsear el JSON
+    if request.method == "POST" and request.url.path == "/process":
+        try:
+            ADMISSION.check_size(body_bytes=int(request.headers.get("content-length") or 0))
+        except ValueError:
+            pass  # header inválido: lo resuelve el parseo
+        except AdmissionRejected as e:
+            logger.warning(f"Admission rejected ({e.status}): {e.reason}", extra={"stage": "admission"})
+            return JSONResponse(status_code=e.status, content={"detail": e.reason})
+    return await call_next(request)
+
+# --------- Middleware de profiling (opt-in, header x-profile) ----------
+@app.middleware("http")
+async def profiling_toggle(request: Request, call_next):
+    mode = PROFILER.mode_for_request(request.headers.get("x-profile"))
+    if mode is None:
+        return await call_next(request)
+    token = set_profile_mode(mode)
+    try:
+        response = await call_next(request)
+    finally:
+        reset_profile_mode(token)
+    response.headers["x-profiled"] = mode
+    return response
+
 # --------------------- Modelos ---------------------
 class Ticket(BaseModel):
     id: str
@@ -35,19 +108,268 @@ class Ticket(BaseModel):
 class BatchIn(BaseModel):
     tickets: List[Ticket]
 
+class ProfilingConfig(BaseModel):
+    enabled: bool | None = None
+    mode: str | None = None
+    sample_rate: float | None = None
+
 # --------------------- Endpoints ---------------------
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+def resolve_ruleset(tenant: str | None = None, x_tenant: str | None = Header(default=None)):
+    # Rule set por request: query ?tenant=... o header x-tenant (sin ninguno → default)
+    try:
+        return get_ruleset(tenant or x_tenant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def resolve_classifier(classifier: str | None = None, x_classifier: str | None = Header(default=None)):
+    # Clasificador por request: ?classifier=rules|ml o header x-classifier (default: env CLASSIFIER)
+    try:
+        return check_classifier((classifier or x_classifier or DEFAULT_CLASSIFIER).strip())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        # Pedido explícito de `ml` sin modelo: no caer en silencio a reglas
+        raise HTTPException(status_code=503, detail="model not trained; run jobs/train_classifier")
+
+def _rejected(e: AdmissionRejected) -> HTTPException:
+    # 413 no se arregla reintentando: sin Retry-After
+    headers = None if e.status == 413 else {"Retry-After": str(e.retry_after)}
+    return HTTPException(status_code=e.status, detail=e.reason, headers=headers)
+
+async def admission(batch: BatchIn, ruleset=Depends(resolve_ruleset)):
+    # Control de admisión: 413/429/503 rápido en vez de encolar sin límite; batches con P1 pasan primero
+    urgent = None
+    try:
+        # 413 antes del pre-pass: un batch gigante no se recorre en el event loop
+        ADMISSION.check_size(len(batch.tickets))
+        urgent = any(is_urgent(t.model_dump(), ruleset) for t in batch.tickets)
+        async with ADMISSION.slot(len(batch.tickets), urgent):
+            yield
+    except AdmissionRejected as e:
+        logger.warning(f"Admission rejected ({e.status}): {e.reason}",
+                       extra={"stage": "admission", "extra": {"tickets": len(batch.tickets), "urgent": urgent}})
+        raise _rejected(e)
+
+def _run_tickets(tickets: List[Dict], ruleset, classifier: str, state: Dict) -> List[Dict]:
+    # P1 probables primero (pre-pass de reglas): su alerta no espera al resto del batch
+    results: List[Dict | None] = [None] * len(tickets)
+    for idx in split_urgent(tickets, ruleset):
+        if not idx:
+            continue
+        for i, res in zip(idx, process_tickets([tickets[i] for i in idx], ruleset, classifier, state)):
+            results[i] = res
+    return results
+
+def _await_ticket(ticket: Dict, key: str, fut, ruleset, classifier: str, state: Dict) -> Dict:
+    """
+    Wait for the in-flight original. If it failed without a result, re-claim the
+    key: only one waiter becomes the new leader, the rest wait on it.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        try:
+            res = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            # el original sigue corriendo: no hay resultado que repetir (no es un hit)
+            return {"ticket_id": ticket["id"], "status": "IN_PROGRESS", "idempotent": False}
+        if res is not None:
+            return {**res, "idempotent": True}
+        claim, value = IDEMPOTENCY.claim(key)
+        if claim == "hit":
+            return {**value, "idempotent": True}
+        if claim == "wait":
+            fut = value
+            continue
+        try:
+            res = _run_tickets([ticket], ruleset, classifier, state)[0]
+        except BaseException:
+            IDEMPOTENCY.complete(key, None)
+            raise
+        IDEMPOTENCY.complete(key, res)
+        return res
+
+def _process_tickets(tickets: List[Dict], ruleset, classifier: str, idem_key: str | None = None,
+                     state: Dict | None = None) -> List[Dict]:
+    """
+    Run the batch through the idempotency store: tickets already processed OK
+    return their cached result (`"idempotent": true`), tickets being processed
+    by a concurrent retry wait for it, and only the rest reach process_ticket.
+    """
+    state = {} if state is None else state  # uno por request: presupuesto LLM del cascade, etc.
+    if not IDEMPOTENCY_ENABLED:
+        return _run_tickets(tickets, ruleset, classifier, state)
+
+    results: List[Dict | None] = [None] * len(tickets)
+    leaders, waiters = [], []
+    for i, t in enumerate(tickets):
+        key = ticket_key(t["id"], ruleset.name, idem_key)
+        claim, value = IDEMPOTENCY.claim(key)
+        if claim == "hit":
+            results[i] = {**value, "idempotent": True}
+        elif claim == "wait":
+            waiters.append((i, key, value))
+        else:
+            leaders.append((i, key))
+
+    try:
+        out = _run_tickets([tickets[i] for i, _ in leaders], ruleset, classifier, state)
+    except BaseException:
+        for _, key in leaders:
+            IDEMPOTENCY.complete(key, None)
+        raise
+    for (i, key), res in zip(leaders, out):
+        results[i] = res
+        IDEMPOTENCY.complete(key, res)
+
+    for i, key, fut in waiters:
+        results[i] = _await_ticket(tickets[i], key, fut, ruleset, classifier, state)
+
+    hits = sum(1 for r in results if r.get("idempotent") is True)
+    if hits:
+        METRICS["idempotent_hits"] += hits
+        logger.info(f"Idempotent replay: {hits}/{len(tickets)} tickets", extra={"stage": "idempotency"})
+    return results
+
 @app.post("/process")
-def process(batch: BatchIn):
-    results = []
-    for t in batch.tickets:
-        res = process_ticket(t.model_dump())
-        results.append(res)
+@profiled
+def process(batch: BatchIn, ruleset=Depends(resolve_ruleset), classifier: str = Depends(resolve_classifier),
+            idempotency_key: str | None = Header(default=None), _admitted=Depends(admission)):
+    tickets = [t.model_dump() for t in batch.tickets]
+    results = _process_tickets(tickets, ruleset, classifier, idempotency_key)
     return {"processed": len(results), "results": results}
 
+def _ticket_from_record(rec: Dict) -> Dict:
+    # CSV del job (subject) o NDJSON (title); vacíos = no enviado
+    rec = {k: v for k, v in rec.items() if v not in ("", None)}
+    if "title" not in rec and "subject" in rec:
+        rec["title"] = rec["subject"]
+    if "id" in rec and not isinstance(rec["id"], str):
+        rec["id"] = str(rec["id"])
+    return Ticket.model_validate(rec).model_dump()
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que NO lee `receive` en paralelo buscando el disconnect:
+    acá el body del request se sigue leyendo mientras respondemos, y ese listener
+    se comería chunks del request. El disconnect lo ve el propio lector del body.
+    """
+    async def listen_for_disconnect(self, receive) -> None:
+        await anyio.sleep_forever()
+
+@app.post("/process/stream")
+async def process_stream(request: Request, ruleset=Depends(resolve_ruleset),
+                         classifier: str = Depends(resolve_classifier),
+                         idempotency_key: str | None = Header(default=None)):
+    """
+    Ingest NDJSON (default) or CSV (`Content-Type: text/csv`) incrementally.
+    Tickets are validated as they arrive and processed in micro-batches (what each
+    received chunk completes, up to STREAM_BATCH_SIZE); one NDJSON result line per
+    input record, then a final summary line.
+    """
+    is_csv = "csv" in (request.headers.get("content-type") or "").lower()
+    parse = iter_csv if is_csv else iter_ndjson
+
+    async def results():
+        counts = {"received": 0, "processed": 0, "invalid": 0, "dlq": 0, "rejected": 0}
+        run_state: Dict = {}  # compartido por los micro-batches del stream (presupuesto LLM)
+
+        async def flush(batch):
+            tickets = [t for _, t in batch]
+            try:
+                # admisión por micro-batch: un stream largo no monopoliza el presupuesto
+                async with ADMISSION.slot(len(tickets), any(is_urgent(t, ruleset) for t in tickets)):
+                    out = await run_in_threadpool(_process_tickets, tickets, ruleset, classifier, idempotency_key,
+                                                    run_state)
+            except AdmissionRejected as e:
+                counts["rejected"] += len(batch)
+                return "".join(json.dumps({"record": n, "status": "REJECTED", "error": e.reason,
+                                           "retry_after": e.retry_after}) + "\n" for n, _ in batch)
+            lines = []
+            for (n, _), res in zip(batch, out):
+                counts["processed"] += 1
+                counts["dlq"] += res["status"] == "DLQ"
+                lines.append(json.dumps({"record": n, **res}, ensure_ascii=False) + "\n")
+            return "".join(lines)
+
+        async for records in parse(request.stream(), STREAM_MAX_LINE_BYTES):
+            batch, errors = [], []
+            for n, rec, err in records:
+                counts["received"] += 1
+                if err is None:
+                    try:
+                        batch.append((n, _ticket_from_record(rec)))
+                        continue
+                    except ValidationError as e:
+                        err = "; ".join(f"{'.'.join(map(str, x['loc']))}: {x['msg']}" for x in e.errors())
+                counts["invalid"] += 1
+                errors.append(json.dumps({"record": n, "status": "INVALID", "error": err}, ensure_ascii=False) + "\n")
+            if errors:
+                yield "".join(errors)
+            size = min(STREAM_BATCH_SIZE, ADMISSION.max_batch)
+            for i in range(0, len(batch), size):
+                yield await flush(batch[i:i + size])
+
+        logger.info("Stream ingest done", extra={"stage": "stream", "extra": counts})
+        yield json.dumps({"done": True, **counts}) + "\n"
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+def _multi(values: List[str] | None) -> List[str]:
+    # ?priority=P1&priority=P2 o ?priority=P1,P2
+    return [v.strip() for raw in values or [] for v in raw.split(",") if v.strip()]
+
+@app.get("/tickets/search")
+def search_tickets(q: str, limit: int | None = Query(default=None, ge=1, le=200), offset: int = Query(default=0, ge=0),
+                   fields: str | None = None):
+    """
+    Full-text search over subject + description (index maintained by the job).
+    Every word must match (exact, prefix or substring); results ranked by BM25.
+    """
+    from src.services.search_index import SEARCH_PAGE_SIZE, get_search_index
+    from src.services.ticket_query import QueryError, get_index
+
+    t0 = time.perf_counter()
+    res = get_search_index().search(q, limit or SEARCH_PAGE_SIZE, offset)
+    try:
+        rows = get_index().records([r["id"] for r in res["results"]],
+                                   _multi([fields]) if fields else ["id", "created_at", "subject", "topic", "priority"])
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    results = [{**(row or {"id": r["id"]}), "score": r["score"]} for r, row in zip(res["results"], rows)]
+    return {"query": q, "total": res["total"], "offset": offset, "count": len(results),
+            "took_ms": round((time.perf_counter() - t0) * 1000, 2), "results": results}
+
+@app.get("/tickets")
+def list_tickets(topic: List[str] | None = Query(default=None), priority: List[str] | None = Query(default=None),
+                 sentiment: List[str] | None = Query(default=None), owner: List[str] | None = Query(default=None),
+                 created_from: str | None = None, created_to: str | None = None,
+                 cursor: str | None = None, limit: int | None = Query(default=None, ge=1),
+                 fields: str | None = None, if_none_match: str | None = Header(default=None)):
+    """
+    Classified tickets (job output), filtered and paginated by cursor, in file order.
+    `fields=id,priority,...` projects columns. Send back the ETag as If-None-Match
+    to get 304 when the page did not change; keep polling with `next_cursor` to
+    receive only rows appended since.
+    """
+    from src.services.ticket_query import TICKETS_PAGE_SIZE, QueryError, get_index  # pandas solo si se usa
+
+    filters = {"topic": _multi(topic), "priority": _multi(priority),
+               "sentiment": _multi(sentiment), "owner_suggested": _multi(owner)}
+    try:
+        page = get_index().query(filters, created_from, created_to, cursor, limit or TICKETS_PAGE_SIZE,
+                                 _multi([fields]) if fields else None)
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
+    if if_none_match and (if_none_match.strip() == "*" or
+                          page.etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(page.body(), headers=headers)
+
 @app.get("/metrics")
 def metrics():
     processed = METRICS["processed"]
@@ -66,8 +388,94 @@ def metrics():
         "retry_failed": METRICS["retry_failed"],
         "success_rate": success_rate,
         "error_rate": error_rate,
+        # Retries del cliente resueltos desde el cache de idempotencia
+        "idempotent_hits": METRICS["idempotent_hits"],
+        "idempotency": IDEMPOTENCY.snapshot(),
+        # Ollama: espera en cola vs. tiempo de generación
+        "ollama": scheduler_stats(),
+        # Circuit breakers de dependencias salientes (telegram, llm:*)
+        "breakers": breaker_stats(),
+        # Pipeline por etapas (normalize/classify/route/notify): tiempo acumulado
+        "pipeline": PIPELINE.stats(),
+        # Control de admisión: en vuelo, cola y rechazos (413/429/503)
+        "admission": ADMISSION.snapshot(),
+        # Surges por topic/canal (tasas con decaimiento) + keywords más frecuentes (count-min sketch)
+        "surge_alerts": METRICS["surge_alerts"],
+        "surge_alerts_failed": METRICS["surge_alerts_failed"],
+        "surge": DETECTOR.snapshot(),
     }
 
+@app.get("/metrics/history")
+def metrics_history(resolution: str = "1s", since: float | None = None, until: float | None = None):
+    """Per-second (`1s`) or per-minute (`1m`) buckets: counter deltas + stage latencies."""
+    try:
+        buckets = HISTORY.range(resolution, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"resolution": resolution, "buckets": buckets}
+
+@app.get("/metrics/stream")
+async def metrics_stream(request: Request, interval: float = METRICS_STREAM_INTERVAL):
+    """
+    Server-Sent Events: one `snapshot` event (same body as /metrics), then every
+    `interval` seconds a `delta` event with the 1s buckets completed since the
+    previous one plus the current cumulative counters.
+    """
+    interval = max(0.2, interval)
+
+    async def events():
+        last = int(time.time())
+        yield f"event: snapshot\ndata: {json.dumps(metrics())}\n\n"
+        while not await request.is_disconnected():
+            await anyio.sleep(interval)
+            now = int(time.time())  # solo segundos cerrados: [last, now)
+            payload = {"ts": now, "buckets": HISTORY.range("1s", last, now), "totals": dict(METRICS)}
+            last = now
+            yield f"event: delta\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# --------------------- Admin: profiling ---------------------
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    # Cerrado por defecto: sin PROFILING_ADMIN_TOKEN configurado no hay admin
+    expected = os.getenv("PROFILING_ADMIN_TOKEN") or ""
+    if not expected or not hmac.compare_digest((x_admin_token or "").encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/admin/profiling", dependencies=[Depends(require_admin)])
+def profiling_status():
+    return PROFILER.status()
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+def profiling_configure(cfg: ProfilingConfig):
+    try:
+        return PROFILER.configure(enabled=cfg.enabled, mode=cfg.mode, sample_rate=cfg.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.delete("/admin/profiling", dependencies=[Depends(require_admin)])
+def profiling_reset():
+    PROFILER.reset()
+    return PROFILER.status()
+
+@app.get("/admin/profiling/top", dependencies=[Depends(require_admin)])
+def profiling_top(n: int = 20, sort: str = "tottime"):
+    return PROFILER.top(n=n, sort=sort)
+
+@app.get("/admin/profiling/flamegraph", dependencies=[Depends(require_admin)])
+def profiling_flamegraph():
+    # Formato folded: `flamegraph.pl out.folded > out.svg` o importar en speedscope
+    return PlainTextResponse(PROFILER.folded())
+
+@app.get("/admin/profiling/pstats", dependencies=[Depends(require_admin)])
+def profiling_pstats():
+    # Compatible con `python -m pstats`, snakeviz o flameprof
+    return Response(
+        content=PROFILER.pstats_dump(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": "attachment; filename=api.pstats"},
+    )
+
 # ----------------- Global exception hook -----------------
 @app.exception_handler(Exception)
 async def unhandled_exc(request: Request, exc: Exception):
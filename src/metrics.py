@@ -1,5 +1,112 @@
+"""
+Métricas globales en memoria + serie temporal (ring buffers por segundo y por minuto).
+
+`METRICS` sigue siendo un dict de contadores acumulados (`METRICS["processed"] += 1`),
+pero cada escritura registra también el delta en el bucket actual de `HISTORY`.
+Las latencias por etapa se cargan con `observe(stage, seconds)`.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+METRICS_HISTORY_SECONDS = int(os.getenv("METRICS_HISTORY_SECONDS", "3600"))
+METRICS_HISTORY_MINUTES = int(os.getenv("METRICS_HISTORY_MINUTES", "1440"))
+
+
+class _Ring:
+    """Fixed-width time buckets (`width` seconds) in a ring of `size` slots."""
+
+    def __init__(self, width: int, size: int):
+        self.width = width
+        self.size = size
+        self._slots: List[Optional[Dict]] = [None] * size
+
+    def _bucket(self, now: float) -> Dict:
+        start = int(now // self.width) * self.width
+        i = (start // self.width) % self.size
+        b = self._slots[i]
+        if b is None or b["ts"] != start:
+            b = self._slots[i] = {"ts": start, "counters": {}, "latency": {}}
+        return b
+
+    def add(self, now: float, name: str, delta: float) -> None:
+        c = self._bucket(now)["counters"]
+        c[name] = c.get(name, 0) + delta
+
+    def observe(self, now: float, stage: str, seconds: float) -> None:
+        lat = self._bucket(now)["latency"]
+        s = lat.get(stage)
+        if s is None:
+            s = lat[stage] = [0, 0.0, 0.0]  # count, total, max
+        s[0] += 1
+        s[1] += seconds
+        s[2] = max(s[2], seconds)
+
+    def range(self, since: float, until: float) -> List[Dict]:
+        out = []
+        for b in self._slots:
+            if b is not None and since <= b["ts"] < until:
+                out.append({
+                    "ts": b["ts"],
+                    "counters": dict(b["counters"]),
+                    "latency": {
+                        k: {"count": v[0], "avg_ms": round(v[1] / v[0] * 1000, 2), "max_ms": round(v[2] * 1000, 2)}
+                        for k, v in b["latency"].items()
+                    },
+                })
+        out.sort(key=lambda b: b["ts"])
+        return out
+
+
+class MetricsHistory:
+    RESOLUTIONS = {"1s": 1, "1m": 60}
+
+    def __init__(self, seconds: int = METRICS_HISTORY_SECONDS, minutes: int = METRICS_HISTORY_MINUTES):
+        self._rings = {"1s": _Ring(1, max(1, seconds)), "1m": _Ring(60, max(1, minutes))}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, delta: float) -> None:
+        now = time.time()
+        with self._lock:
+            for ring in self._rings.values():
+                ring.add(now, name, delta)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        now = time.time()
+        with self._lock:
+            for ring in self._rings.values():
+                ring.observe(now, stage, seconds)
+
+    def range(self, resolution: str = "1s", since: Optional[float] = None, until: Optional[float] = None) -> List[Dict]:
+        """Buckets with ts in [since, until); default: the whole ring, up to now."""
+        if resolution not in self._rings:
+            raise ValueError(f"Unknown resolution {resolution!r}; expected one of {tuple(self.RESOLUTIONS)}")
+        with self._lock:
+            return self._rings[resolution].range(since or 0, until if until is not None else float("inf"))
+
+
+HISTORY = MetricsHistory()
+
+
+class _Counters(dict):
+    """dict de contadores que además registra cada delta en HISTORY."""
+
+    def __setitem__(self, key, value):
+        delta = value - self.get(key, 0)
+        super().__setitem__(key, value)
+        if delta:
+            HISTORY.add(key, delta)
+
+
+def observe(stage: str, seconds: float) -> None:
+    HISTORY.observe(stage, seconds)
+
+
 # Métricas globales en memoria
-METRICS = {
+METRICS = _Counters({
     "processed": 0,
     "failed": 0,
     "dlq": 0,
@@ -7,4 +114,7 @@ METRICS = {
     "notify_failed": 0,
     "retries": 0,
     "retry_failed": 0,
-}
+    "idempotent_hits": 0,
+    "surge_alerts": 0,
+    "surge_alerts_failed": 0,
+})
@@ -1,16 +1,18 @@
 import os
-import time
-import requests
+from src.config import env_float, env_int
 from src.utils.logger import get_logger
-
-from dotenv import load_dotenv, find_dotenv
-env_path = find_dotenv(usecwd=True)
-load_dotenv(dotenv_path=env_path, override=True)
+from src.utils.resilience import (
+    CircuitOpenError, Deadline, NonRetryableError, call_with_resilience, get_breaker,
+)
 
 logger = get_logger("notifier")
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
+# Presupuesto total por mensaje (intentos + backoff) y timeout máximo por intento
+TELEGRAM_DEADLINE_SEC = env_float("TELEGRAM_DEADLINE_SEC", 5.0)
+TELEGRAM_ATTEMPT_TIMEOUT_SEC = env_float("TELEGRAM_ATTEMPT_TIMEOUT_SEC", 3.0)
+TELEGRAM_MAX_RETRIES = env_int("TELEGRAM_MAX_RETRIES", 3)
 
 logger.info(
     "Telegram config snapshot",
@@ -20,37 +22,47 @@ logger.info(
     }}
 )
 
-def send_telegram_message(text: str, max_retries: int = 3, backoff_sec: float = 1.5) -> tuple[bool, int]:
+def send_telegram_message(text: str, max_retries: int = TELEGRAM_MAX_RETRIES,
+                          backoff_sec: float = 0.5, parse_mode: str | None = None) -> tuple[bool, int]:
     """
-    Envía un mensaje a Telegram con reintentos exponenciales.
+    Envía un mensaje a Telegram con reintentos (backoff exponencial con jitter),
+    acotados por TELEGRAM_DEADLINE_SEC en total y por el circuit breaker "telegram":
+    con el circuito abierto falla al instante (el ticket va directo al DLQ).
     Devuelve: (ok, retries_used)  -> retries_used = intentos adicionales al primero (0..max_retries-1)
     """
     if not BOT_TOKEN or not CHAT_ID:
         logger.warning("Telegram no configurado (BOT_TOKEN/CHAT_ID vacíos)")
         return False, 0
 
+    import requests  # diferido: ~100ms de import que la API no necesita para arrancar
+
     url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
     payload = {"chat_id": CHAT_ID, "text": text}
+    if parse_mode:
+        payload["parse_mode"] = parse_mode
+    attempts = [0]
 
-    last_error = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            r = requests.post(url, json=payload, timeout=10)
-            if r.status_code == 200:
-                logger.info("Notificación Telegram enviada")
-                return True, (attempt - 1)
-            else:
-                last_error = f"HTTP {r.status_code}: {r.text}"
-                logger.warning(f"Telegram {last_error}")
-        except Exception as e:
-            last_error = str(e)
-            logger.warning(f"Error enviando Telegram: {e}")
-
-        if attempt < max_retries:
-            time.sleep(backoff_sec * attempt)
+    def _post(timeout: float):
+        attempts[0] += 1
+        r = requests.post(url, json=payload, timeout=timeout)
+        if r.status_code == 200:
+            return r
+        if 400 <= r.status_code < 500 and r.status_code != 429:
+            raise NonRetryableError(f"HTTP {r.status_code}: {r.text}")
+        raise RuntimeError(f"HTTP {r.status_code}: {r.text}")
 
-    logger.error(f"Fallaron los reintentos de Telegram. Último error: {last_error}")
-    return False, (max_retries - 1)
+    try:
+        _, used = call_with_resilience(
+            _post, get_breaker("telegram"), Deadline(TELEGRAM_DEADLINE_SEC),
+            max_attempts=max_retries, attempt_timeout=TELEGRAM_ATTEMPT_TIMEOUT_SEC, backoff_base=backoff_sec,
+        )
+        logger.info("Notificación Telegram enviada")
+        return True, used
+    except CircuitOpenError as e:
+        logger.warning(f"Telegram omitido: {e}")
+    except Exception as e:
+        logger.error(f"Fallaron los reintentos de Telegram. Último error: {e}")
+    return False, max(0, attempts[0] - 1)
 
 
 def format_p1_alert(ticket: dict) -> str:
@@ -1,65 +1,94 @@
+import time
+from typing import Dict, List
+
 from src.utils.logger import get_logger
-from src.utils.dlq_handler import write_to_dlq
-from src.metrics import METRICS
+from src.metrics import METRICS, observe
 from src.notifier import send_telegram_message, format_p1_alert
+from src.services.pipeline import ClassifyStage, Item, NormalizeStage, Pipeline, RouteStage, Stage
+from src.services.rules_engine import RuleSet, get_ruleset
+from src.services.surge import SurgeStage
+from src.services.text_norm import normalize_ticket
 
 logger = get_logger("processor")
 
-# Stubs: pluggea tu clasificador real / LLM si ya lo tenés
-def classify(ticket: dict) -> dict:
-    # TODO: reemplazar por tu pipeline real (tema, prioridad, sentimiento, owner sugerido)
+def classify(ticket: dict, ruleset: RuleSet | None = None, labels: dict | None = None) -> dict:
+    """
+    Clasifica con el rule set del tenant (o el default), salvo que vengan `labels`
+    ya calculados en batch (ver services.classifiers).
+    Prioridad/owner enviados por el cliente tienen precedencia.
+    """
+    res = labels or (ruleset or get_ruleset()).classify(normalize_ticket(ticket))
+
     enriched = ticket.copy()
-    enriched.setdefault("priority", "P2")
-    enriched.setdefault("owner", "auto-assigned")
-    enriched["sentiment"] = "neutral"
-    enriched["topic"] = "general"
+    enriched["priority"] = enriched.get("priority") or res["priority"]
+    enriched["owner"] = enriched.get("owner") or res["owner_suggested"]
+    enriched["sentiment"] = res["sentiment"]
+    enriched["topic"] = res["topic"]
     return enriched
 
 def should_notify(ticket: dict) -> bool:
     return str(ticket.get("priority", "")).upper() == "P1"
 
-def process_ticket(ticket: dict) -> dict:
-    METRICS["processed"] += 1
-    ticket_id = ticket.get("id")
-
-    logger.info("Procesando ticket", extra={"ticket_id": ticket_id, "stage": "start"})
+class TicketAlertStage(Stage):
+    """Notify de la API: una alerta por ticket P1 (sends en paralelo); si falla -> DLQ."""
+    name = "notify"
+    default_concurrency = 4
 
-    # 1) Clasificación
-    try:
-        enriched = classify(ticket)
-        logger.info("Clasificación OK", extra={"ticket_id": ticket_id, "stage": "classify"})
-    except Exception as e:
-        METRICS["failed"] += 1
-        METRICS["dlq"] += 1
-        path = write_to_dlq(ticket, f"classify_error: {e}", stage="classify")
-        return {"ticket_id": ticket_id, "status": "DLQ", "dlq_path": path}
+    def process(self, items: List[Item], ctx) -> None:
+        self.map(self._notify, [it for it in items if it.notify])
 
-    # 2) Notificación si P1 (Week 6: contar reintentos)
-    if should_notify(enriched):
-        ok = False
-        retries_used = 0
+    def _notify(self, it: Item) -> None:
+        ok, retries_used = False, 0
+        t0 = time.perf_counter()
         try:
-            msg = format_p1_alert(enriched)
-            ok, retries_used = send_telegram_message(msg)
+            ok, retries_used = send_telegram_message(format_p1_alert(it.out))
         except Exception as e:
-            logger.warning(f"Notifier throw: {e}", extra={"ticket_id": ticket_id, "stage": "notify"})
+            logger.warning(f"Notifier throw: {e}", extra={"ticket_id": it.id, "stage": "notify"})
+        observe("notify", time.perf_counter() - t0)
 
         # Contabilizamos métricas Week 6
         METRICS["retries"] += retries_used
-
         if not ok:
             METRICS["notify_failed"] += 1
-            METRICS["failed"] += 1
             METRICS["retry_failed"] += 1
-            METRICS["dlq"] += 1
-            path = write_to_dlq(enriched, "notify_failed", stage="notify")
-            return {"ticket_id": ticket_id, "status": "DLQ", "dlq_path": path}
+            it.dead_letter("notify_failed", stage="notify")
         else:
             METRICS["notify_success"] += 1
             logger.info(
                 "Notificación P1 OK",
-                extra={"ticket_id": ticket_id, "stage": "notify", "extra": {"retries_used": retries_used}}
+                extra={"ticket_id": it.id, "stage": "notify", "extra": {"retries_used": retries_used}}
             )
 
-    logger.info("Procesamiento OK", extra={"ticket_id": ticket_id, "stage": "end"})
-    return {"ticket_id": ticket_id, "status": "OK"}
+# Pipeline de la API: sin persist (la respuesta es el resultado)
+PIPELINE = Pipeline([NormalizeStage(), ClassifyStage(enrich=lambda t, lab: classify(t, labels=lab)),
+                     RouteStage(), SurgeStage(), TicketAlertStage()], name="api")
+
+def process_tickets(tickets: List[Dict], ruleset: RuleSet | None = None, classifier: str | None = None,
+                    state: Dict | None = None) -> List[Dict]:
+    """
+    Run a batch through the API pipeline; one `{"ticket_id", "status", ...}` per ticket.
+    `state` is shared by every batch of one request (e.g. the cascade's LLM budget).
+    """
+    if not tickets:
+        return []
+    t0 = time.perf_counter()
+    METRICS["processed"] += len(tickets)
+    for t in tickets:
+        logger.info("Procesando ticket", extra={"ticket_id": t.get("id"), "stage": "start"})
+    items = PIPELINE.run(tickets, ruleset or get_ruleset(), classifier, state=state)
+
+    results = []
+    for it in items:
+        if it.alive:
+            logger.info("Procesamiento OK", extra={"ticket_id": it.id, "stage": "end"})
+        else:
+            METRICS["failed"] += 1
+            METRICS["dlq"] += 1
+        results.append({"ticket_id": it.id, "status": it.status, **it.info})
+    per_ticket = (time.perf_counter() - t0) / len(tickets)
+    for _ in tickets:
+        observe("ticket", per_ticket)
+    return results
+
+def process_ticket(ticket: dict, ruleset: RuleSet | None = None, classifier: str | None = None) -> dict:
+    return process_tickets([ticket], ruleset, classifier)[0]
@@ -1,8 +1,8 @@
 from __future__ import annotations
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from datetime import datetime
-from src.jobs.process_new_rows import main as run_job
+from src.jobs.runner import RUNNER
 
 app = FastAPI(title="AI Automation Workflow API")
 
@@ -11,9 +11,30 @@ def health():
     return {"ok": True, "ts": datetime.utcnow().isoformat()}
 
 @app.post("/run")
-def run():
-    try:
-        run_job()
-        return {"ok": True, "ts": datetime.utcnow().isoformat()}
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
+def run(wait: bool = False, timeout: float = 600.0):
+    """
+    Encola una corrida y responde al instante (202) con su id.
+    Triggers durante una corrida se colapsan en UNA corrida de seguimiento.
+    `?wait=true` bloquea hasta que termine (comportamiento anterior).
+    """
+    run_info = RUNNER.trigger(source="api")
+    if not wait:
+        return JSONResponse(status_code=202, content={
+            "ok": True, "run_id": run_info["id"], "ts": datetime.utcnow().isoformat(), "run": run_info,
+        })
+
+    done = RUNNER.wait(run_info["id"], timeout=timeout)
+    if done["status"] == "failed":
+        return JSONResponse(status_code=500, content={"ok": False, "run_id": done["id"], "error": done["error"], "run": done})
+    return {"ok": done["status"] == "succeeded", "run_id": done["id"], "run": done}
+
+@app.get("/runs")
+def runs(limit: int = 20):
+    return {"runs": RUNNER.recent(limit)}
+
+@app.get("/runs/{run_id}")
+def run_status(run_id: str):
+    info = RUNNER.get(run_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return info
@@ -0,0 +1,195 @@
+# src/services/admission.py
+"""
+Admission control for /process and /process/stream.
+
+- Max batch size per request (413 if bigger). /process checks the body's
+  Content-Length first (ADMISSION_MAX_BODY_BYTES) and the ticket count before
+  any per-ticket work (P1 pre-pass), so an oversized batch costs nothing.
+- Global budget of in-flight tickets and of concurrent requests (below the
+  threadpool size, so admitted requests never queue for a thread).
+- Bounded wait queue, ordered by priority: batches with a likely P1 go first,
+  and a slice of the budget (ADMISSION_P1_RESERVE) is kept for them only.
+- Full queue -> 429 right away (an urgent batch evicts the newest non-urgent
+  waiter instead, which gets 503). Waiting longer than ADMISSION_QUEUE_TIMEOUT_SEC
+  -> 503. Both carry Retry-After, estimated from the recent throughput.
+
+Lives on the event loop (asyncio, no locks): waiting requests do not hold a
+threadpool thread, only admitted ones do.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+from src.config import env_bool, env_float, env_int
+
+ADMISSION_ENABLED = env_bool("ADMISSION_ENABLED", True)
+ADMISSION_MAX_BATCH = env_int("ADMISSION_MAX_BATCH", 1000)
+ADMISSION_MAX_BODY_BYTES = env_int("ADMISSION_MAX_BODY_BYTES", 16 * 1024 * 1024)
+ADMISSION_MAX_INFLIGHT = env_int("ADMISSION_MAX_INFLIGHT_TICKETS", 2000)
+ADMISSION_MAX_REQUESTS = env_int("ADMISSION_MAX_CONCURRENT_REQUESTS", 32)
+ADMISSION_MAX_QUEUE = env_int("ADMISSION_MAX_QUEUE", 64)
+ADMISSION_QUEUE_TIMEOUT = env_float("ADMISSION_QUEUE_TIMEOUT_SEC", 2.0)
+ADMISSION_P1_RESERVE = env_float("ADMISSION_P1_RESERVE", 0.1)
+
+URGENT, BULK = 0, 1
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_batch: int = ADMISSION_MAX_BATCH, max_inflight: int = ADMISSION_MAX_INFLIGHT,
+                 max_requests: int = ADMISSION_MAX_REQUESTS, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, p1_reserve: float = ADMISSION_P1_RESERVE,
+                 max_body: int = ADMISSION_MAX_BODY_BYTES):
+        self.max_inflight = max(1, max_inflight)
+        self.max_body = max(1, max_body)
+        self.max_batch = max(1, min(max_batch, self.max_inflight))  # un batch siempre tiene que poder entrar
+        self.max_requests = max(1, max_requests)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        # límite para batches sin P1: el resto queda reservado a los urgentes
+        self.bulk_limit = max(self.max_batch, int(self.max_inflight * (1 - min(max(p1_reserve, 0.0), 0.9))))
+        self.inflight = 0
+        self.requests = 0
+        self._waiters: List[list] = []  # heap de [prio, seq, n, future]
+        self._seq = itertools.count()
+        self._rate = 0.0  # tickets/s (EWMA), para Retry-After
+        self.stats = {"admitted": 0, "waited": 0, "rejected_413": 0, "rejected_429": 0,
+                      "rejected_503": 0, "shed": 0}
+
+    # --------------------- Interno ---------------------
+    def _fits(self, n: int, prio: int) -> bool:
+        limit = self.max_inflight if prio == URGENT else self.bulk_limit
+        return self.requests < self.max_requests and self.inflight + n <= limit
+
+    def _queued_ahead(self, prio: int) -> bool:
+        return any(w[0] <= prio and not w[3].done() for w in self._waiters)
+
+    def _retry_after(self) -> int:
+        backlog = self.inflight + sum(w[2] for w in self._waiters if not w[3].done())
+        if self._rate <= 0:
+            return max(1, math.ceil(self.queue_timeout))
+        return int(min(60, max(1, math.ceil(backlog / self._rate))))
+
+    def _admit(self, n: int) -> None:
+        self.inflight += n
+        self.requests += 1
+        self.stats["admitted"] += 1
+
+    def _wake(self) -> None:
+        # En orden de prioridad; sin saltear al primero (latencia predecible, sin inanición)
+        while self._waiters:
+            prio, _, n, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._fits(n, prio):
+                return
+            heapq.heappop(self._waiters)
+            self._admit(n)
+            fut.set_result(True)
+
+    def _shed_for(self, prio: int) -> bool:
+        """Queue full: evict the newest waiter of lower priority (it gets 503)."""
+        victims = [w for w in self._waiters if w[0] > prio and not w[3].done()]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda w: w[1])
+        victim[3].set_exception(AdmissionRejected(503, "shed for a higher-priority batch", self._retry_after()))
+        self.stats["shed"] += 1
+        return True
+
+    # --------------------- Público ---------------------
+    def check_size(self, n: int | None = None, body_bytes: int | None = None) -> None:
+        """413 (AdmissionRejected) if the batch or its body is over the limit; no-op if disabled."""
+        if not ADMISSION_ENABLED:
+            return
+        if body_bytes is not None and body_bytes > self.max_body:
+            self.stats["rejected_413"] += 1
+            raise AdmissionRejected(413, f"body of {body_bytes} bytes exceeds the limit of {self.max_body}")
+        if n is not None and n > self.max_batch:
+            self.stats["rejected_413"] += 1
+            raise AdmissionRejected(413, f"batch of {n} tickets exceeds the limit of {self.max_batch}")
+
+    async def acquire(self, n: int, urgent: bool = False) -> None:
+        """Wait for room for `n` tickets; raises AdmissionRejected (413/429/503)."""
+        self.check_size(n)
+        prio = URGENT if urgent else BULK
+        if self._fits(n, prio) and not self._queued_ahead(prio):
+            self._admit(n)
+            return
+        live = sum(1 for w in self._waiters if not w[3].done())
+        if live >= self.max_queue and not self._shed_for(prio):
+            self.stats["rejected_429"] += 1
+            raise AdmissionRejected(429, "too many requests queued", self._retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [prio, next(self._seq), n, fut])
+        self.stats["waited"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                return  # admitido justo al vencer
+            fut.cancel()
+            self.stats["rejected_503"] += 1
+            raise AdmissionRejected(503, "server saturated, queue wait timed out", self._retry_after())
+        except asyncio.CancelledError:
+            # cliente desconectado mientras esperaba
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self.release(n, 0.0)
+            else:
+                fut.cancel()
+            raise
+        except AdmissionRejected:
+            self.stats["rejected_503"] += 1
+            raise
+
+    def release(self, n: int, held: float) -> None:
+        self.inflight = max(0, self.inflight - n)
+        self.requests = max(0, self.requests - 1)
+        if held > 0 and n:
+            rate = n / held * max(1, self.requests + 1)  # aprox. throughput total con la concurrencia actual
+            self._rate = rate if self._rate == 0 else 0.8 * self._rate + 0.2 * rate
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, n: int, urgent: bool = False) -> AsyncIterator[None]:
+        """acquire/release around the block (no-op with ADMISSION_ENABLED=0)."""
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        await self.acquire(n, urgent)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(n, time.perf_counter() - t0)
+
+    def snapshot(self) -> Dict:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "inflight_tickets": self.inflight,
+            "inflight_requests": self.requests,
+            "queued": sum(1 for w in self._waiters if not w[3].done()),
+            "limits": {"max_batch": self.max_batch, "max_body_bytes": self.max_body, "max_inflight_tickets": self.max_inflight,
+                       "bulk_limit": self.bulk_limit, "max_requests": self.max_requests,
+                       "max_queue": self.max_queue, "queue_timeout_sec": self.queue_timeout},
+            "throughput_tps": round(self._rate, 1),
+            **self.stats,
+        }
+
+
+ADMISSION = AdmissionController()
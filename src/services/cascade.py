@@ -0,0 +1,213 @@
+# src/services/cascade.py
+"""
+Confidence-gated cascade: rules first, LLM only for uncertain tickets.
+
+Tier 1 is the tenant's RuleSet (cheap, emits `confidence`). Tickets below
+CASCADE_MIN_CONFIDENCE are deduplicated by content hash, looked up in the label
+cache, and the rest are packed many-per-prompt into `LLMClient.classify_batch`.
+Each run is bounded by a call cap, an estimated-token budget and a minimum
+interval between calls; anything past the budget keeps its rule labels.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.services.rules_engine import RuleSet
+from src.services.text_norm import normalize_ticket
+from src.utils.logger import get_logger
+
+logger = get_logger("cascade")
+
+CASCADE_MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.7"))
+CASCADE_BATCH_SIZE = int(os.getenv("CASCADE_BATCH_SIZE", "20"))
+CASCADE_MAX_CALLS = int(os.getenv("CASCADE_MAX_CALLS", "10"))
+CASCADE_TOKEN_BUDGET = int(os.getenv("CASCADE_TOKEN_BUDGET", "20000"))
+CASCADE_MIN_INTERVAL = float(os.getenv("CASCADE_MIN_INTERVAL_SEC", "0.5"))
+CASCADE_CACHE_PATH = os.getenv("CASCADE_CACHE_PATH", "data/outputs/llm_label_cache.jsonl")
+CASCADE_CACHE_SIZE = int(os.getenv("CASCADE_CACHE_SIZE", "100000"))
+
+MAX_TICKET_CHARS = 300
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class LabelCache:
+    """LRU of LLM labels keyed by (tenant, content hash), backed by an append-only JSONL file."""
+
+    def __init__(self, path: Optional[str] = CASCADE_CACHE_PATH, maxsize: int = CASCADE_CACHE_SIZE):
+        self.path = Path(path) if path else None
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not self.path or not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    self._put(rec["key"], rec["labels"])
+                except (ValueError, KeyError):
+                    continue
+
+    def _put(self, key: str, labels: Dict) -> None:
+        self._data[key] = labels
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+            return hit
+
+    def put_many(self, items: Dict[str, Dict]) -> None:
+        if not items:
+            return
+        with self._lock:
+            for k, v in items.items():
+                self._put(k, v)
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a", encoding="utf-8") as f:
+                    for k, v in items.items():
+                        f.write(json.dumps({"key": k, "labels": v}, ensure_ascii=False) + "\n")
+
+
+LABEL_CACHE = LabelCache()
+
+
+class CascadeClassifier:
+    """One instance per run/request: the budget counters are per instance (thread-safe: sub-batches share it)."""
+
+    def __init__(self, llm=None, min_confidence: float = CASCADE_MIN_CONFIDENCE,
+                 batch_size: int = CASCADE_BATCH_SIZE, max_calls: int = CASCADE_MAX_CALLS,
+                 token_budget: int = CASCADE_TOKEN_BUDGET, min_interval: float = CASCADE_MIN_INTERVAL,
+                 cache: LabelCache = LABEL_CACHE):
+        self._llm = llm
+        self.min_confidence = min_confidence
+        self.batch_size = max(1, batch_size)
+        self.max_calls = max_calls
+        self.token_budget = token_budget
+        self.min_interval = min_interval
+        self.cache = cache
+        self._last_call = 0.0
+        self._lock = threading.Lock()  # presupuesto compartido entre sub-batches concurrentes
+        self.stats = {
+            "tickets": 0, "uncertain": 0, "cache_hits": 0, "llm_labeled": 0,
+            "llm_calls": 0, "llm_errors": 0, "tokens_est": 0, "over_budget": 0,
+        }
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from src.services.llm_client import LLMClient
+            self._llm = LLMClient()
+        return self._llm
+
+    def _can_spend(self, tokens: int) -> bool:
+        return (self.stats["llm_calls"] < self.max_calls
+                and self.stats["tokens_est"] + tokens <= self.token_budget)
+
+    def _throttle(self) -> None:
+        wait = self._last_call + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self._last_call = time.monotonic()
+
+    def classify(self, rows: List[Dict], ruleset: RuleSet) -> List[Dict]:
+        results = []
+        pending: Dict[str, List[int]] = {}  # cache key -> posiciones en results
+        texts: Dict[str, str] = {}
+        for i, r in enumerate(rows):
+            nt = normalize_ticket(r)
+            res = ruleset.classify(nt)
+            res["classified_by"] = "rules"
+            results.append(res)
+            if res["confidence"] >= self.min_confidence:
+                continue
+            with self._lock:
+                self.stats["uncertain"] += 1
+            key = f"{ruleset.name}:{hashlib.blake2b(nt.text.encode('utf-8'), digest_size=16).hexdigest()}"
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._lock:
+                    self.stats["cache_hits"] += 1
+                self._apply(res, cached, ruleset, "cache")
+                continue
+            pending.setdefault(key, []).append(i)
+            texts[key] = nt.text[:MAX_TICKET_CHARS]
+        with self._lock:
+            self.stats["tickets"] += len(rows)
+
+        self._escalate(pending, texts, results, ruleset)
+        return results
+
+    def _escalate(self, pending: Dict[str, List[int]], texts: Dict[str, str],
+                  results: List[Dict], ruleset: RuleSet) -> None:
+        allowed = ruleset.labels()
+        keys = list(pending)
+        overhead = _estimate_tokens(json.dumps(allowed)) + 60
+        pos = 0
+        while pos < len(keys):
+            # Armar el batch respetando el presupuesto de tokens restante (reservado bajo lock)
+            with self._lock:
+                batch, tokens = [], overhead
+                while pos < len(keys) and len(batch) < self.batch_size:
+                    cost = _estimate_tokens(texts[keys[pos]]) + 15  # entrada + salida estimada
+                    if not self._can_spend(tokens + cost):
+                        break
+                    batch.append(keys[pos])
+                    tokens += cost
+                    pos += 1
+                if not batch:
+                    break
+                self._throttle()
+                self.stats["llm_calls"] += 1
+                self.stats["tokens_est"] += tokens
+            try:
+                labels = self.llm.classify_batch([texts[k] for k in batch], allowed)
+            except Exception as e:
+                with self._lock:
+                    self.stats["llm_errors"] += 1
+                logger.warning(f"LLM batch failed, keeping rule labels: {e}", extra={"stage": "cascade"})
+                continue
+
+            fresh = {}
+            for k, lab in zip(batch, labels):
+                if lab is None:
+                    continue
+                fresh[k] = lab
+                for i in pending[k]:
+                    self._apply(results[i], lab, ruleset, "llm")
+            with self._lock:
+                self.stats["llm_labeled"] += sum(len(pending[k]) for k in fresh)
+            self.cache.put_many(fresh)
+
+        with self._lock:
+            self.stats["over_budget"] += sum(len(pending[k]) for k in keys[pos:])
+
+    @staticmethod
+    def _apply(res: Dict, labels: Dict, ruleset: RuleSet, source: str) -> None:
+        # El LLM nunca baja la prioridad de las reglas: un P1 por keyword se queda P1
+        priority = min(res.get("priority", "P3"), labels.get("priority") or "P3")
+        res.update(labels)
+        res["priority"] = priority
+        res["owner_suggested"] = ruleset.owner(res["topic"])
+        res["classified_by"] = source
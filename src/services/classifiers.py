@@ -0,0 +1,87 @@
+# src/services/classifiers.py
+"""
+Classifier selection shared by the job and the API.
+
+Every implementation takes a batch of ticket dicts and returns, per ticket,
+`topic`, `priority`, `sentiment` and `owner_suggested` (owner always comes from
+the tenant's rule set).
+
+The cascade's LLM budget is per job run / API request: the caller keeps one
+CascadeClassifier (`cascade_for(state)`) and passes it to every `classify_batch`
+call of the run (chunks, urgent/bulk split, concurrent sub-batches).
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+from src.services.rules_engine import RuleSet
+from src.services.text_norm import normalize_ticket
+from src.utils.logger import get_logger
+
+logger = get_logger("classifiers")
+
+CLASSIFIERS = ("rules", "ml", "cascade")
+DEFAULT_CLASSIFIER = (os.getenv("CLASSIFIER", "rules") or "rules").strip().lower()
+
+
+def _rules_batch(rows: List[Dict], ruleset: RuleSet) -> List[Dict]:
+    return [ruleset.classify(normalize_ticket(r)) for r in rows]
+
+
+def _ml_batch(rows: List[Dict], ruleset: RuleSet) -> List[Dict]:
+    from src.services.ml_classifier import get_model
+
+    preds = get_model().predict([normalize_ticket(r) for r in rows])
+    for p in preds:
+        p["owner_suggested"] = ruleset.owner(p["topic"])
+    return preds
+
+
+def cascade_for(state: Dict[str, Any], name: str | None = None):
+    """The run's CascadeClassifier (created on first use and kept in `state`); None if not cascade."""
+    if (name or DEFAULT_CLASSIFIER).lower() != "cascade":
+        return None
+    if state.get("cascade") is None:
+        from src.services.cascade import CascadeClassifier
+
+        state["cascade"] = CascadeClassifier()
+    return state["cascade"]
+
+
+def _cascade_batch(rows: List[Dict], ruleset: RuleSet, cascade=None) -> List[Dict]:
+    if cascade is None:
+        from src.services.cascade import CascadeClassifier
+
+        cascade = CascadeClassifier()  # sin run compartido: presupuesto solo para este batch
+    labels = cascade.classify(rows, ruleset)
+    logger.info(f"Cascade stats: {cascade.stats}", extra={"stage": "cascade"})
+    return labels
+
+
+def check_classifier(name: str | None = None) -> str:
+    """
+    Resolved classifier name. Raises if it can't run as requested: ValueError for an
+    unknown name, FileNotFoundError for `ml` without a trained model (no silent
+    fallback to rules).
+    """
+    name = (name or DEFAULT_CLASSIFIER).lower()
+    if name not in CLASSIFIERS:
+        raise ValueError(f"Unknown classifier {name!r}; expected one of {CLASSIFIERS}")
+    if name == "ml":
+        from src.services.ml_classifier import CLASSIFIER_MODEL_PATH
+
+        if not os.path.isfile(CLASSIFIER_MODEL_PATH):
+            raise FileNotFoundError(f"model not trained ({CLASSIFIER_MODEL_PATH}); run jobs/train_classifier")
+    return name
+
+
+def classify_batch(rows: List[Dict], ruleset: RuleSet, name: str | None = None, cascade: Optional[Any] = None) -> List[Dict]:
+    name = (name or DEFAULT_CLASSIFIER).lower()
+    if name == "rules":
+        return _rules_batch(rows, ruleset)
+    if name == "ml":
+        return _ml_batch(rows, ruleset)
+    if name == "cascade":
+        return _cascade_batch(rows, ruleset, cascade)
+    raise ValueError(f"Unknown classifier {name!r}; expected one of {CLASSIFIERS}")
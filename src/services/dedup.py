@@ -0,0 +1,169 @@
+# src/services/dedup.py
+"""
+Near-duplicate ticket clustering with MinHash + LSH banding.
+
+Each ticket is shingled (word 3-grams over its normalized description, falling
+back to the subject), reduced to a NUM_PERM-value MinHash signature, and looked
+up in BANDS hash tables. Only candidates sharing a band are compared, so the cost
+per ticket does not grow with the number of clusters. Only cluster
+representatives are indexed, which keeps the index bounded by the number of
+distinct reports rather than the number of tickets.
+
+`assign` is idempotent for recently assigned ids (the last DEDUP_RECENT_IDS,
+persisted with the index): a chunk the job redoes after a crash gets the same
+clusters without counting its tickets twice.
+"""
+from __future__ import annotations
+
+import os
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from src.services.text_norm import normalize
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "data/outputs/dedup_index.npz")
+# ids recientes recordados (>= un chunk del job: lo que se rehace tras un crash)
+DEDUP_RECENT_IDS = int(os.getenv("DEDUP_RECENT_IDS", "50000"))
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20250901)  # semilla fija: firmas estables entre corridas
+_A = _rng.integers(1, int(_PRIME), size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(_PRIME), size=NUM_PERM, dtype=np.uint64)
+
+
+def _shingles(text: str) -> List[str]:
+    tokens = normalize(text).tokens
+    if len(tokens) < 3:
+        return [" ".join(tokens)] if tokens else [""]
+    return [" ".join(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
+
+
+def _dedup_text(r: Dict) -> str:
+    desc = str(r.get("description") or "").strip()
+    return desc or str(r.get("subject") or r.get("title") or "")
+
+
+def signatures(texts: List[str], chunk: int = 2048) -> np.ndarray:
+    """MinHash signatures for a batch of texts, shape (len(texts), NUM_PERM)."""
+    if not texts:
+        return np.empty((0, NUM_PERM), dtype=np.uint64)
+    if len(texts) > chunk:
+        return np.vstack([signatures(texts[i:i + chunk], chunk) for i in range(0, len(texts), chunk)])
+    hashes: List[int] = []
+    starts: List[int] = []
+    for t in texts:
+        starts.append(len(hashes))
+        hashes.extend(zlib.crc32(s.encode("utf-8")) for s in _shingles(t))
+    h = np.asarray(hashes, dtype=np.uint64) % _PRIME
+    # (NUM_PERM, total_shingles) → mínimo por segmento (ticket) en una sola pasada
+    perm = (_A[:, None] * h[None, :] + _B[:, None]) % _PRIME
+    return np.minimum.reduceat(perm, np.asarray(starts), axis=1).T.copy()
+
+
+class DedupIndex:
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self.rep_ids: List[str] = []
+        self.rep_sigs: List[np.ndarray] = []
+        self.sizes: List[int] = []
+        self.recent: "OrderedDict[str, int]" = OrderedDict()  # id -> cluster (ya contado)
+        self._bands: List[Dict[bytes, int]] = [dict() for _ in range(BANDS)]
+
+    def __len__(self) -> int:
+        return len(self.rep_ids)
+
+    def _band_keys(self, sig: np.ndarray) -> Iterable[bytes]:
+        for b in range(BANDS):
+            yield sig[b * ROWS_PER_BAND:(b + 1) * ROWS_PER_BAND].tobytes()
+
+    def _register(self, cluster: int, sig: np.ndarray) -> None:
+        for b, key in enumerate(self._band_keys(sig)):
+            self._bands[b].setdefault(key, cluster)
+
+    def _find(self, sig: np.ndarray) -> Optional[int]:
+        seen = set()
+        for b, key in enumerate(self._band_keys(sig)):
+            c = self._bands[b].get(key)
+            if c is None or c in seen:
+                continue
+            seen.add(c)
+            if float(np.mean(self.rep_sigs[c] == sig)) >= self.threshold:
+                return c
+        return None
+
+    def assign(self, rows: List[Dict]) -> Dict[str, int]:
+        """
+        Set `dup_cluster` (id of the cluster's first ticket) on each row.
+        Returns the size of every cluster touched by this batch. Ids assigned
+        recently keep their cluster and are not counted again.
+        """
+        touched: Dict[str, int] = {}
+        fresh = []
+        for r in rows:
+            c = self.recent.get(str(r.get("id")))
+            if c is None:
+                fresh.append(r)
+                continue
+            r["dup_cluster"] = self.rep_ids[c]
+            touched[self.rep_ids[c]] = self.sizes[c]
+        rows = fresh
+        sigs = signatures([_dedup_text(r) for r in rows])
+        for r, sig in zip(rows, sigs):
+            c = self._find(sig)
+            if c is None:
+                c = len(self.rep_ids)
+                self.rep_ids.append(str(r.get("id")))
+                self.rep_sigs.append(sig)
+                self.sizes.append(0)
+                self._register(c, sig)
+            self.sizes[c] += 1
+            self.recent[str(r.get("id"))] = c
+            r["dup_cluster"] = self.rep_ids[c]
+            touched[self.rep_ids[c]] = self.sizes[c]
+        while len(self.recent) > DEDUP_RECENT_IDS:
+            self.recent.popitem(last=False)
+        return touched
+
+    # --------- Persistencia (solo representantes; las bandas se reconstruyen) ---------
+    def save(self, path: str | Path = DEDUP_INDEX_PATH) -> None:
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(p.stem + ".tmp.npz")
+        np.savez_compressed(
+            tmp,
+            rep_ids=np.asarray(self.rep_ids, dtype=str),
+            rep_sigs=np.asarray(self.rep_sigs, dtype=np.uint64).reshape(-1, NUM_PERM),
+            sizes=np.asarray(self.sizes, dtype=np.int64),
+            recent_ids=np.asarray(list(self.recent), dtype=str),
+            recent_clusters=np.asarray(list(self.recent.values()), dtype=np.int64),
+        )
+        os.replace(tmp, p)
+
+    @classmethod
+    def load(cls, path: str | Path = DEDUP_INDEX_PATH, threshold: float = DEDUP_THRESHOLD) -> "DedupIndex":
+        idx = cls(threshold)
+        p = Path(path)
+        if not p.exists():
+            return idx
+        try:
+            data = np.load(p)
+            idx.rep_ids = [str(x) for x in data["rep_ids"]]
+            idx.rep_sigs = list(data["rep_sigs"])
+            idx.sizes = [int(x) for x in data["sizes"]]
+            if "recent_ids" in data:  # índices anteriores no lo tienen
+                idx.recent = OrderedDict(zip((str(x) for x in data["recent_ids"]),
+                                             (int(c) for c in data["recent_clusters"])))
+        except Exception as e:
+            print(f"[dedup] could not load index {p}, starting empty: {e}")
+            return cls(threshold)
+        for c, sig in enumerate(idx.rep_sigs):
+            idx._register(c, sig)
+        return idx
@@ -0,0 +1,141 @@
+# src/services/idempotency.py
+"""
+Idempotency store for /process: a retried ticket returns its cached result
+instead of re-running process_ticket (no second P1 alert, no double counting).
+
+- Key: ticket id scoped by tenant, or by the `Idempotency-Key` header if sent.
+- Memory: TTL + LRU (IDEMPOTENCY_TTL_SEC, IDEMPOTENCY_MAX_ENTRIES).
+- Optional persistence: sqlite file (IDEMPOTENCY_DB) so retries survive restarts.
+- Single-flight: a retry that arrives while the original is still running waits
+  for it and gets the same result.
+- Only "OK" results are cached: DLQ'd tickets (e.g. Telegram down) can be retried.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.config import env_bool
+
+IDEMPOTENCY_ENABLED = env_bool("IDEMPOTENCY_ENABLED", True)
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL_SEC", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "100000"))
+IDEMPOTENCY_DB = os.getenv("IDEMPOTENCY_DB", "")
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT_SEC", "30"))
+
+
+class _SqliteBacking:
+    def __init__(self, path: str):
+        import sqlite3  # solo con IDEMPOTENCY_DB configurado
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS idem (key TEXT PRIMARY KEY, expires REAL, result TEXT)")
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str, now: float) -> Optional[Tuple[float, Dict]]:
+        with self._lock:
+            row = self._db.execute("SELECT expires, result FROM idem WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] <= now:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, expires: float, result: Dict) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO idem VALUES (?, ?, ?)", (key, expires, json.dumps(result)))
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._db.execute("DELETE FROM idem WHERE expires <= ?", (time.time(),))
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, maxsize: int = IDEMPOTENCY_MAX_ENTRIES,
+                 db_path: Optional[str] = IDEMPOTENCY_DB or None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._backing = _SqliteBacking(db_path) if db_path else None
+        self.stats = {"hits": 0, "misses": 0, "waited": 0, "stored": 0}
+
+    def _get(self, key: str, now: float) -> Optional[Dict]:
+        hit = self._data.get(key)
+        if hit is not None:
+            if hit[0] > now:
+                self._data.move_to_end(key)
+                return hit[1]
+            del self._data[key]
+        if self._backing is not None:
+            row = self._backing.get(key, now)
+            if row is not None:
+                self._remember(key, *row)
+                return row[1]
+        return None
+
+    def _remember(self, key: str, expires: float, result: Dict) -> None:
+        self._data[key] = (expires, result)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def claim(self, key: str) -> Tuple[str, object]:
+        """
+        ("hit", result) if already processed; ("wait", Future) if another request is
+        processing it right now; ("lead", None) if the caller must process it and
+        then call `complete`.
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._get(key, now)
+            if cached is not None:
+                self.stats["hits"] += 1
+                return "hit", cached
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats["waited"] += 1
+                return "wait", fut
+            self.stats["misses"] += 1
+            self._inflight[key] = Future()
+            return "lead", None
+
+    def complete(self, key: str, result: Optional[Dict]) -> None:
+        """Publish the leader's result to waiters; cache it only if status is OK."""
+        expires = time.time() + self.ttl
+        with self._lock:
+            fut = self._inflight.pop(key, None)
+            if result is not None and result.get("status") == "OK":
+                self._remember(key, expires, result)
+                self.stats["stored"] += 1
+        if result is not None and result.get("status") == "OK" and self._backing is not None:
+            self._backing.put(key, expires, result)
+        if fut is not None:
+            fut.set_result(result)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": IDEMPOTENCY_ENABLED,
+                "entries": len(self._data),
+                "in_flight": len(self._inflight),
+                "persistent": self._backing is not None,
+                **self.stats,
+            }
+
+
+IDEMPOTENCY = IdempotencyStore()
+
+
+def ticket_key(ticket_id: str, scope: str, header_key: Optional[str] = None) -> str:
+    # Con header: el cliente define el alcance (un retry = mismo header); si no, tenant + id
+    if header_key:
+        return f"hdr:{header_key}:{ticket_id}"
+    return f"ticket:{scope}:{ticket_id}"
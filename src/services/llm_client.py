@@ -4,10 +4,15 @@ import os
 import json
 import requests
 from typing import List, Dict
-from dotenv import load_dotenv
 
-# Cargar .env siempre que se importe este módulo
-load_dotenv(override=True)
+from src.config import env_float, env_int
+from src.services.ollama_client import QueueFullError, get_scheduler  # .env ya cargado por src/__init__ (src.config)
+from src.utils.resilience import Deadline, NonRetryableError, call_with_resilience, get_breaker
+
+# Presupuesto total por llamada al LLM (intentos + backoff). Alto por defecto:
+# un modelo local en CPU puede tardar minutos en el primer warm-up.
+LLM_DEADLINE_SEC = env_float("LLM_DEADLINE_SEC", 600.0)
+LLM_MAX_ATTEMPTS = env_int("LLM_MAX_ATTEMPTS", 2)
 
 SYSTEM_PROMPT = (
     "You are an operations analyst. Summarize weekly support tickets with clear, "
@@ -24,11 +29,70 @@ def _build_summary_prompt(rows: List[Dict]) -> str:
         topics[r.get("topic","other")] = topics.get(r.get("topic","other"), 0) + 1
     top_sorted = sorted(topics.items(), key=lambda x: x[1], reverse=True)[:5]
     top_str = ", ".join(f"{t}({c})" for t, c in top_sorted)
+    # Clusters de near-duplicates (columna dup_cluster del job)
+    clusters = {}
+    for r in rows:
+        c = r.get("dup_cluster")
+        if c is None or c != c or str(c) == "":  # None / NaN / vacío
+            continue
+        clusters.setdefault(str(c), [0, r.get("topic", "other")])[0] += 1
+    dup = sorted((v for v in clusters.values() if v[0] > 1), key=lambda x: x[0], reverse=True)
+    dup_str = ""
+    if dup:
+        dup_str = (
+            f" Repeated-issue clusters: {len(dup)} (largest: "
+            + ", ".join(f"{t}({n})" for n, t in dup[:3]) + ")."
+        )
     return (
-        f"Weekly tickets: {total}. Critical (P1): {p1}. Top topics: {top_str}.\n"
+        f"Weekly tickets: {total}. Critical (P1): {p1}. Top topics: {top_str}.{dup_str}\n"
         "Write a short executive summary and 2–3 next actions."
     )
 
+CLASSIFY_SYSTEM_PROMPT = (
+    "You are a support-ticket triage engine. Classify every ticket you are given. "
+    "Answer ONLY with a JSON array, one object per ticket, no prose."
+)
+
+def _build_classify_prompt(texts: List[str], allowed: Dict[str, List[str]]) -> str:
+    lines = [
+        "Allowed values:",
+        f"- topic: {', '.join(allowed['topic'])}",
+        f"- priority: {', '.join(allowed['priority'])} (P1 = blocking/critical)",
+        f"- sentiment: {', '.join(allowed['sentiment'])}",
+        'Return: [{"i": <ticket number>, "topic": ..., "priority": ..., "sentiment": ...}, ...]',
+        "",
+        "Tickets:",
+    ]
+    for i, t in enumerate(texts):
+        lines.append(f"{i}. {t}")
+    return "\n".join(lines)
+
+def _parse_classify_response(raw: str, n: int, allowed: Dict[str, List[str]]) -> List[Dict | None]:
+    """Per-ticket labels from a batch answer; tickets missing or with invalid values -> None."""
+    out: List[Dict | None] = [None] * n
+    start, end = raw.find("["), raw.rfind("]")
+    if start == -1 or end <= start:
+        return out
+    try:
+        items = json.loads(raw[start:end + 1])
+    except ValueError:
+        return out
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            i = int(item.get("i"))
+        except (TypeError, ValueError):
+            continue
+        labels = {k: str(item.get(k, "")).strip() for k in ("topic", "priority", "sentiment")}
+        if 0 <= i < n and all(labels[k] in allowed[k] for k in labels):
+            out[i] = labels
+    return out
+
+def _not_local(exc: BaseException) -> bool:
+    # Cola llena del scheduler = presión local, no una falla del modelo: no abre el circuito
+    return not isinstance(exc, QueueFullError)
+
 class LLMClient:
     def __init__(self):
         # Leer SIEMPRE al instanciar (por si cambiaste .env)
@@ -39,46 +103,63 @@ class LLMClient:
         print(f"[llm_client] provider={self.provider} model={self.model} host={self.ollama_host}")
 
     # ---------- OpenAI (no lo usarás ahora, pero queda operativo) ----------
-    def _openai_chat(self, prompt: str) -> str:
+    def _openai_request(self, system: str, prompt: str, max_tokens: int, temperature: float) -> str:
         if not self.openai_api_key:
-            return "AI summary unavailable (missing OPENAI_API_KEY)."
+            raise RuntimeError("missing OPENAI_API_KEY")
         url = "https://api.openai.com/v1/chat/completions"
         headers = {"Authorization": f"Bearer {self.openai_api_key}", "Content-Type": "application/json"}
         data = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "system", "content": system},
                 {"role": "user", "content": prompt},
             ],
-            "temperature": 0.4,
-            "max_tokens": 220,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
         }
-        try:
-            resp = requests.post(url, headers=headers, data=json.dumps(data), timeout=25)
+
+        def _call(timeout: float) -> str:
+            resp = requests.post(url, headers=headers, data=json.dumps(data), timeout=timeout)
+            if 400 <= resp.status_code < 500 and resp.status_code != 429:
+                raise NonRetryableError(f"OpenAI HTTP {resp.status_code}: {resp.text[:200]}")
             resp.raise_for_status()
             return resp.json()["choices"][0]["message"]["content"].strip()
+
+        result, _ = call_with_resilience(
+            _call, get_breaker("llm:openai"), Deadline(LLM_DEADLINE_SEC),
+            max_attempts=LLM_MAX_ATTEMPTS, attempt_timeout=25,
+        )
+        return result
+
+    def _openai_chat(self, prompt: str) -> str:
+        if not self.openai_api_key:
+            return "AI summary unavailable (missing OPENAI_API_KEY)."
+        try:
+            return self._openai_request(SYSTEM_PROMPT, prompt, max_tokens=220, temperature=0.4)
         except Exception:
             return "AI summary unavailable (OpenAI error)."
 
     # ---------- Ollama (ajustado para Windows/CPU) ----------
+    def _ollama_request(self, system: str, prompt: str, num_predict: int, temperature: float) -> str:
+        # Scheduler compartido: warm-up, keep_alive, cola con límite de concurrencia y single-flight
+        sched = get_scheduler(self.ollama_host, self.model)  # ej: llama3.2:3b
+        # (connect_timeout=10s, read_timeout<=600s) → evita cortes por warm-up, acotado por el deadline
+        result, _ = call_with_resilience(
+            lambda timeout: sched.generate(
+                f"{system}\n\n{prompt}",
+                options={"temperature": temperature, "num_predict": num_predict},
+                timeout=(min(10, timeout), timeout),
+            ),
+            get_breaker(f"llm:ollama:{self.ollama_host}"), Deadline(LLM_DEADLINE_SEC),
+            max_attempts=LLM_MAX_ATTEMPTS, attempt_timeout=600, is_failure=_not_local,
+        )
+        return result
+
     def _ollama_generate(self, prompt: str) -> str:
-        url = f"{self.ollama_host.rstrip('/')}/api/generate"
-        data = {
-            "model": self.model,  # ej: llama3.2:3b
-            "prompt": f"{SYSTEM_PROMPT}\n\n{prompt}",
-            "stream": False,           # 1 sola respuesta JSON
-            "keep_alive": "30m",       # mantiene el modelo cargado en RAM
-            "options": {
-                "temperature": 0.3,
-                "num_predict": 280     # resumen corto → acelera la respuesta
-            }
-        }
         try:
-            # (connect_timeout=10s, read_timeout=600s) → evita cortes por warm-up
-            r = requests.post(url, json=data, timeout=(10, 600))
-            r.raise_for_status()
-            obj = r.json()
-            return (obj.get("response") or "").strip() or "AI summary (Ollama) unavailable."
+            # resumen corto (num_predict=280) → acelera la respuesta
+            return self._ollama_request(SYSTEM_PROMPT, prompt, num_predict=280, temperature=0.3) \
+                or "AI summary (Ollama) unavailable."
         except Exception as e:
             return f"AI summary unavailable (Ollama error: {e})"
 
@@ -88,3 +169,15 @@ class LLMClient:
         if self.provider == "ollama":
             return self._ollama_generate(prompt)
         return self._openai_chat(prompt)
+
+    def complete(self, system: str, prompt: str, max_tokens: int = 400, temperature: float = 0.0) -> str:
+        """Raw completion; raises on provider errors (callers decide the fallback)."""
+        if self.provider == "ollama":
+            return self._ollama_request(system, prompt, num_predict=max_tokens, temperature=temperature)
+        return self._openai_request(system, prompt, max_tokens=max_tokens, temperature=temperature)
+
+    def classify_batch(self, texts: List[str], allowed: Dict[str, List[str]]) -> List[Dict | None]:
+        """Classify many tickets in one prompt. Raises on provider errors; unparsed tickets -> None."""
+        prompt = _build_classify_prompt(texts, allowed)
+        raw = self.complete(CLASSIFY_SYSTEM_PROMPT, prompt, max_tokens=40 * len(texts) + 50)
+        return _parse_classify_response(raw, len(texts), allowed)
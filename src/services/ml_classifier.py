@@ -0,0 +1,247 @@
+# src/services/ml_classifier.py
+"""
+CPU-only statistical classifier: hashed TF-IDF features + linear softmax heads
+(topic, priority, sentiment), stored as a compact .npz file.
+
+Features are unigrams + bigrams of the normalized ticket text (text_norm), hashed
+into N_FEATURES buckets with crc32 (stable across processes). Only buckets seen
+during training are stored; unknown buckets map to -1 and are dropped.
+Inference builds one CSR batch and scores it with a gather + `np.add.reduceat`,
+so the per-ticket Python work is tokenization only (which is cached).
+"""
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.services.text_norm import NormText, normalize
+
+N_FEATURES = 1 << 18
+HEADS = ("topic", "priority", "sentiment")
+MODEL_VERSION = 1
+CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", "models/ticket_classifier.npz")
+
+_BUCKET_MEMO: Dict[str, int] = {}
+_BUCKET_MEMO_MAX = 500_000
+
+
+def _bucket(term: str) -> int:
+    b = _BUCKET_MEMO.get(term)
+    if b is None:
+        b = zlib.crc32(term.encode("utf-8")) & (N_FEATURES - 1)
+        if len(_BUCKET_MEMO) < _BUCKET_MEMO_MAX:
+            _BUCKET_MEMO[term] = b
+    return b
+
+
+def _terms(nt: NormText) -> List[str]:
+    toks = nt.tokens
+    return list(toks) + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+
+
+def _hashed_counts(texts: Sequence[str | NormText]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Raw term counts as CSR (indptr, indices, counts) over hashed buckets."""
+    indptr = [0]
+    indices: List[int] = []
+    counts: List[float] = []
+    for t in texts:
+        row: Dict[int, int] = {}
+        for term in _terms(normalize(t)):
+            b = _bucket(term)
+            row[b] = row.get(b, 0) + 1
+        indices.extend(row.keys())
+        counts.extend(row.values())
+        indptr.append(len(indices))
+    return (
+        np.asarray(indptr, dtype=np.int64),
+        np.asarray(indices, dtype=np.int64),
+        np.asarray(counts, dtype=np.float32),
+    )
+
+
+def _tfidf(indptr: np.ndarray, cols: np.ndarray, counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    """Sublinear TF * IDF, L2-normalized per row. `cols` are already model columns."""
+    vals = (1.0 + np.log(counts)) * idf[cols]
+    n = len(indptr) - 1
+    row_ids = np.repeat(np.arange(n), np.diff(indptr))
+    norms = np.sqrt(np.bincount(row_ids, weights=vals * vals, minlength=n)).astype(np.float32)
+    norms[norms == 0] = 1.0
+    return (vals / norms[row_ids]).astype(np.float32)
+
+
+def _with_bias(indptr: np.ndarray, cols: np.ndarray, vals: np.ndarray, bias_col: int):
+    """Append a constant bias feature to every row (also guarantees non-empty rows for reduceat)."""
+    n = len(indptr) - 1
+    lengths = np.diff(indptr) + 1
+    new_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_indptr[1:])
+    new_cols = np.full(new_indptr[-1], bias_col, dtype=np.int64)
+    new_vals = np.ones(new_indptr[-1], dtype=np.float32)
+    # posiciones de los features originales dentro del nuevo layout
+    row_ids = np.repeat(np.arange(n), np.diff(indptr))
+    pos = np.arange(len(cols)) - indptr[row_ids] + new_indptr[row_ids]
+    new_cols[pos] = cols
+    new_vals[pos] = vals
+    return new_indptr, new_cols, new_vals
+
+
+def _take_rows(indptr: np.ndarray, cols: np.ndarray, vals: np.ndarray, rows: np.ndarray):
+    """Sub-CSR with the given rows, in that order."""
+    lengths = indptr[rows + 1] - indptr[rows]
+    new_ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_ptr[1:])
+    pos = np.repeat(indptr[rows] - new_ptr[:-1], lengths) + np.arange(new_ptr[-1])
+    return new_ptr, cols[pos], vals[pos]
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class TicketClassifier:
+    def __init__(self, feat_lookup: np.ndarray, idf: np.ndarray,
+                 heads: Dict[str, Tuple[np.ndarray, np.ndarray]], source: str = ""):
+        self.feat_lookup = feat_lookup  # bucket -> columna del modelo (-1 = desconocido)
+        self.idf = idf                  # (n_cols,)
+        self.heads = heads              # head -> (W (n_cols + 1, C), classes)
+        self.bias_col = len(idf)
+        self.source = source
+
+    # ---------------------- Inferencia ----------------------
+    def _features(self, texts: Sequence[str | NormText]):
+        indptr, buckets, counts = _hashed_counts(texts)
+        cols = self.feat_lookup[buckets]
+        keep = cols >= 0
+        if not keep.all():
+            row_ids = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            indptr = np.concatenate([[0], np.cumsum(np.bincount(row_ids[keep], minlength=len(indptr) - 1))])
+            cols, counts = cols[keep], counts[keep]
+        vals = _tfidf(indptr, cols, counts, self.idf)
+        return _with_bias(indptr, cols, vals, self.bias_col)
+
+    def predict_proba(self, texts: Sequence[str | NormText]) -> Dict[str, np.ndarray]:
+        if not texts:
+            return {h: np.empty((0, len(self.heads[h][1])), dtype=np.float32) for h in self.heads}
+        indptr, cols, vals = self._features(texts)
+        out = {}
+        for head, (W, _classes) in self.heads.items():
+            scores = np.add.reduceat(W[cols] * vals[:, None], indptr[:-1], axis=0)
+            out[head] = _softmax(scores)
+        return out
+
+    def predict(self, texts: Sequence[str | NormText]) -> List[Dict]:
+        """Labels + confidence (max class probability) per head, one dict per text."""
+        probs = self.predict_proba(texts)
+        results: List[Dict] = [{} for _ in texts]
+        for head, p in probs.items():
+            classes = self.heads[head][1]
+            best = p.argmax(axis=1)
+            conf = p[np.arange(len(best)), best]
+            for i, (b, c) in enumerate(zip(best, conf)):
+                results[i][head] = str(classes[b])
+                results[i][f"{head}_confidence"] = float(c)
+        return results
+
+    # ---------------------- Persistencia ----------------------
+    def save(self, path: str | Path = CLASSIFIER_MODEL_PATH) -> None:
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        used = np.flatnonzero(self.feat_lookup >= 0)
+        order = self.feat_lookup[used]
+        buckets = np.empty(len(order), dtype=np.int32)
+        buckets[order] = used
+        arrays = {
+            "version": np.asarray(MODEL_VERSION),
+            "n_features": np.asarray(N_FEATURES),
+            "buckets": buckets,
+            "idf": self.idf.astype(np.float16),
+        }
+        for head, (W, classes) in self.heads.items():
+            arrays[f"{head}_W"] = W.astype(np.float16)
+            arrays[f"{head}_classes"] = np.asarray(classes, dtype=str)
+        tmp = p.with_name(p.stem + ".tmp.npz")
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, p)
+
+    @classmethod
+    def load(cls, path: str | Path = CLASSIFIER_MODEL_PATH) -> "TicketClassifier":
+        data = np.load(path)
+        if int(data["version"]) != MODEL_VERSION or int(data["n_features"]) != N_FEATURES:
+            raise ValueError(f"Incompatible classifier model: {path}")
+        buckets = data["buckets"].astype(np.int64)
+        lookup = np.full(N_FEATURES, -1, dtype=np.int32)
+        lookup[buckets] = np.arange(len(buckets), dtype=np.int32)
+        heads = {}
+        for head in HEADS:
+            if f"{head}_W" in data:
+                heads[head] = (data[f"{head}_W"].astype(np.float32), list(data[f"{head}_classes"]))
+        return cls(lookup, data["idf"].astype(np.float32), heads, source=str(path))
+
+
+# ---------------------------- Entrenamiento (offline) ----------------------------
+def train(texts: Sequence[str | NormText], labels: Dict[str, Sequence[str]],
+          epochs: int = 50, lr: float = 1.0, l2: float = 1e-4,
+          batch_size: int = 1024, seed: int = 0) -> TicketClassifier:
+    """
+    Fit one softmax head per label column with mini-batch SGD.
+    `labels` maps head name -> list of labels aligned with `texts`.
+    """
+    indptr, buckets, counts = _hashed_counts(texts)
+    n = len(indptr) - 1
+
+    used = np.unique(buckets)
+    lookup = np.full(N_FEATURES, -1, dtype=np.int32)
+    lookup[used] = np.arange(len(used), dtype=np.int32)
+    cols = lookup[buckets].astype(np.int64)
+
+    # IDF suavizado sobre document frequency (cada bucket aparece una vez por fila)
+    df = np.bincount(cols, minlength=len(used))
+    idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+
+    vals = _tfidf(indptr, cols, counts, idf)
+    indptr, cols, vals = _with_bias(indptr, cols, vals, len(used))
+
+    rng = np.random.default_rng(seed)
+    heads: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+    for head, ys in labels.items():
+        classes = sorted({str(y) for y in ys})
+        y_idx = np.searchsorted(classes, [str(y) for y in ys])
+        W = np.zeros((len(used) + 1, len(classes)), dtype=np.float32)
+        for _ in range(epochs):
+            perm = rng.permutation(n)
+            for start in range(0, n, batch_size):
+                batch = perm[start:start + batch_size]
+                b_ptr, b_cols, b_vals = _take_rows(indptr, cols, vals, batch)
+                local = np.repeat(np.arange(len(batch)), np.diff(b_ptr))
+                grad = _softmax(np.add.reduceat(W[b_cols] * b_vals[:, None], b_ptr[:-1], axis=0))
+                grad[np.arange(len(batch)), y_idx[batch]] -= 1.0
+                W *= (1.0 - lr * l2)
+                # actualización dispersa: solo filas de features presentes en el batch
+                np.add.at(W, b_cols, (-lr / len(batch)) * b_vals[:, None] * grad[local])
+        heads[head] = (W, classes)
+    return TicketClassifier(lookup, idf, heads, source="trained")
+
+
+# ---------------------------- Cache del modelo ----------------------------
+_model_lock = threading.Lock()
+_model: Optional[Tuple[Tuple[str, int], TicketClassifier]] = None
+
+
+def get_model(path: str | Path = CLASSIFIER_MODEL_PATH) -> TicketClassifier:
+    """Load once; reload only when the model file's mtime changes."""
+    global _model
+    key = (str(path), os.stat(path).st_mtime_ns)
+    cached = _model
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with _model_lock:
+        if _model is None or _model[0] != key:
+            _model = (key, TicketClassifier.load(path))
+        return _model[1]
@@ -1,46 +1,28 @@
 # src/services/notifier.py
 from __future__ import annotations
-import os
-import requests
+import re
 from typing import Optional, Dict
 
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-
-def _tg_api(method: str) -> str:
-    return f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/{method}"
+_MD_SPECIAL = re.compile(r"([_*`\[])")
 
 def send_telegram_message(text: str, parse_mode: Optional[str] = None) -> bool:
     """
-    Send a plain message to the configured chat. Returns True on success.
+    Send a message to the configured chat. Returns True on success.
+    Same transport as the API (src.notifier): one retry policy, one "telegram" breaker.
     """
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        # Soft fail (useful for demos without credentials)
-        print("[notifier] Telegram disabled (missing token/chat_id).")
-        return False
-
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text}
-    if parse_mode:
-        payload["parse_mode"] = parse_mode
+    from src.notifier import send_telegram_message as _send  # diferido (arranque rápido)
 
-    try:
-        r = requests.post(_tg_api("sendMessage"), data=payload, timeout=15)
-        r.raise_for_status()
-        ok = r.json().get("ok", False)
-        if not ok:
-            print("[notifier] Telegram API responded not OK:", r.text)
-        return ok
-    except Exception as e:
-        print("[notifier] Telegram error:", e)
-        return False
+    ok, _ = _send(text, parse_mode=parse_mode)
+    return ok
 
 
 # --------- High-level helpers ---------
 
-def format_ticket_alert(t: Dict) -> str:
+def format_ticket_alert(t: Dict, similar: int = 1) -> str:
     """
     Nicely formatted P1 alert.
     Expected keys: id, subject, topic, sentiment, created_at, owner_suggested, description
+    `similar` > 1 means the alert stands for a cluster of near-duplicate tickets.
     """
     id_ = t.get("id", "—")
     subject = t.get("subject", "No subject")
@@ -54,7 +36,7 @@ def format_ticket_alert(t: Dict) -> str:
     if len(desc) > 220:
         desc = desc[:220].rstrip() + "…"
 
-    return (
+    text = (
         "🚨 *Critical ticket (P1)*\n"
         f"*ID*: `{id_}`\n"
         f"*Subject*: {subject}\n"
@@ -63,7 +45,31 @@ def format_ticket_alert(t: Dict) -> str:
         f"*Created*: {created}\n"
         f"*Notes*: {desc}"
     )
+    if similar > 1:
+        text += f"\n*Similar reports*: {similar} (cluster `{t.get('dup_cluster', id_)}`)"
+    return text
 
-def notify_p1_ticket(t: Dict) -> bool:
-    text = format_ticket_alert(t)
+def notify_p1_ticket(t: Dict, similar: int = 1) -> bool:
+    text = format_ticket_alert(t, similar=similar)
     return send_telegram_message(text, parse_mode="Markdown")
+
+def escape_markdown(text) -> str:
+    """Escape Telegram (legacy) Markdown entities in values that come from the data."""
+    return _MD_SPECIAL.sub(r"\\\1", str(text))
+
+def format_surge_alert(s: Dict) -> str:
+    """Surge alert. Expected keys: key ("topic:login"), count, expected, window_sec, keywords."""
+    field, _, value = str(s.get("key", "")).partition(":")
+    minutes = max(1, round(float(s.get("window_sec", 300)) / 60))
+    text = (
+        "📈 *Ticket surge*\n"
+        f"*{escape_markdown(field.title() or 'Key')}*: {escape_markdown(value or '—')}\n"
+        f"*Recent*: ~{s.get('count', 0):.0f} tickets (last ~{minutes} min)\n"
+        f"*Expected*: ~{s.get('expected', 0):.1f}"
+    )
+    if s.get("keywords"):
+        text += f"\n*Top keywords*: {escape_markdown(', '.join(s['keywords']))}"
+    return text
+
+def notify_surge(s: Dict) -> bool:
+    return send_telegram_message(format_surge_alert(s), parse_mode="Markdown")
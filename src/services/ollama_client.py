@@ -0,0 +1,205 @@
+# src/services/ollama_client.py
+"""
+Shared Ollama request scheduler (one per host+model and process).
+
+- Warm-up: loads the model with an empty generate call so the first real
+  request doesn't pay the load cost.
+- Keep-alive: a daemon thread re-sends `keep_alive` before it expires.
+- Concurrency: at most OLLAMA_MAX_CONCURRENCY generations run at once; up to
+  OLLAMA_QUEUE_SIZE callers wait (bounded by OLLAMA_QUEUE_TIMEOUT_SEC).
+- Single-flight: identical in-flight prompts share one generation (followers
+  wait at most their own request timeout, then TimeoutError).
+- Stats: queue wait vs. generation time (plus Ollama's own load/eval durations).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, Optional, Tuple
+
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "1"))
+OLLAMA_QUEUE_SIZE = int(os.getenv("OLLAMA_QUEUE_SIZE", "32"))
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT_SEC", "300"))
+OLLAMA_KEEPALIVE_REFRESH = float(os.getenv("OLLAMA_KEEPALIVE_REFRESH_SEC", "600"))
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, v: float) -> None:
+        self.count += 1
+        self.total += v
+        self.max = max(self.max, v)
+
+    def as_dict(self) -> Dict[str, float]:
+        avg = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "avg_ms": round(avg * 1000, 1), "max_ms": round(self.max * 1000, 1)}
+
+
+class OllamaScheduler:
+    def __init__(self, host: str, model: str, keep_alive: str = OLLAMA_KEEP_ALIVE,
+                 max_concurrency: int = OLLAMA_MAX_CONCURRENCY, queue_size: int = OLLAMA_QUEUE_SIZE,
+                 queue_timeout: float = OLLAMA_QUEUE_TIMEOUT):
+        self.host = host.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        import requests  # diferido: solo si se usa Ollama
+
+        self._session = requests.Session()
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._waiting = 0
+        self._keepalive_thread: Optional[threading.Thread] = None
+        self._last_used = 0.0
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_wait = _Timing()
+        self.generation = _Timing()
+        self.load = _Timing()
+        self.counters = {"requests": 0, "shared": 0, "shared_timeouts": 0, "rejected": 0, "errors": 0,
+                         "warmups": 0}
+
+    # ------------------------- HTTP -------------------------
+    def _post(self, payload: Dict, timeout: Tuple[float, float]) -> Dict:
+        r = self._session.post(f"{self.host}/api/generate", json=payload, timeout=timeout)
+        r.raise_for_status()
+        obj = r.json()
+        if obj.get("load_duration"):
+            self.load.add(obj["load_duration"] / 1e9)
+        return obj
+
+    def warm_up(self) -> float:
+        """Load (or keep loaded) the model; returns elapsed seconds."""
+        t0 = time.perf_counter()
+        self._post({"model": self.model, "keep_alive": self.keep_alive}, timeout=(10, 600))
+        self.counters["warmups"] += 1
+        self._last_used = time.monotonic()
+        return time.perf_counter() - t0
+
+    def start_keepalive(self, interval: float = OLLAMA_KEEPALIVE_REFRESH) -> None:
+        """Warm up in the background and refresh keep_alive while the process is idle."""
+        if self._keepalive_thread is not None:
+            return
+
+        def _loop():
+            while True:
+                if time.monotonic() - self._last_used >= interval:
+                    try:
+                        self.warm_up()
+                    except Exception as e:
+                        print(f"[ollama] keep-alive/warm-up failed: {e}")
+                time.sleep(min(interval, 60))
+
+        self._keepalive_thread = threading.Thread(target=_loop, name="ollama-keepalive", daemon=True)
+        self._keepalive_thread.start()
+
+    # ------------------------- Generación -------------------------
+    def generate(self, prompt: str, options: Optional[Dict] = None,
+                 timeout: Tuple[float, float] = (10, 600)) -> str:
+        options = options or {}
+        key = hashlib.blake2b(
+            json.dumps([self.model, prompt, options], sort_keys=True).encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+        with self._lock:
+            self.counters["requests"] += 1
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                if self._waiting >= self.queue_size:
+                    self.counters["rejected"] += 1
+                    raise QueueFullError(f"Ollama queue full ({self.queue_size} waiting)")
+                fut = Future()
+                self._inflight[key] = fut
+                self._waiting += 1
+            else:
+                self.counters["shared"] += 1
+
+        if not leader:
+            # Acotado por el mismo timeout (ya recortado al deadline del caller): un líder
+            # colgado no retiene a los seguidores para siempre
+            wait = sum(timeout)
+            try:
+                return fut.result(timeout=wait)
+            except FutureTimeout:
+                with self._lock:
+                    self.counters["shared_timeouts"] += 1
+                raise TimeoutError(f"shared Ollama generation not done after {wait:.1f}s") from None
+
+        try:
+            t0 = time.perf_counter()
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+            with self._lock:
+                self._waiting -= 1
+            if not acquired:
+                raise TimeoutError(f"Ollama queue wait exceeded {self.queue_timeout}s")
+            self.queue_wait.add(time.perf_counter() - t0)
+            try:
+                t1 = time.perf_counter()
+                obj = self._post({
+                    "model": self.model,
+                    "prompt": prompt,
+                    "stream": False,
+                    "keep_alive": self.keep_alive,
+                    "options": options,
+                }, timeout)
+                self.generation.add(time.perf_counter() - t1)
+                self._last_used = time.monotonic()
+            finally:
+                self._slots.release()
+            text = (obj.get("response") or "").strip()
+            fut.set_result(text)
+            return text
+        except BaseException as e:
+            self.counters["errors"] += 1
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def snapshot(self) -> Dict:
+        return {
+            "host": self.host,
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "waiting": self._waiting,
+            "in_flight": len(self._inflight),
+            **self.counters,
+            "queue_wait": self.queue_wait.as_dict(),
+            "generation": self.generation.as_dict(),
+            "model_load": self.load.as_dict(),
+        }
+
+
+_SCHEDULERS: Dict[Tuple[str, str], OllamaScheduler] = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+
+def get_scheduler(host: str, model: str) -> OllamaScheduler:
+    key = (host.rstrip("/"), model)
+    sched = _SCHEDULERS.get(key)
+    if sched is None:
+        with _SCHEDULERS_LOCK:
+            sched = _SCHEDULERS.setdefault(key, OllamaScheduler(host, model))
+    return sched
+
+
+def scheduler_stats() -> list:
+    return [s.snapshot() for s in list(_SCHEDULERS.values())]
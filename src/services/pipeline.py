@@ -0,0 +1,206 @@
+# src/services/pipeline.py
+"""
+Batch pipeline shared by the API (/process, /process/stream) and the job.
+
+    normalize -> classify -> route -> surge -> notify -> persist
+
+Every stage receives the whole batch (`List[Item]`) and only sees the items
+still alive (not sent to the DLQ by an earlier stage). Implementations are
+pluggable per entry point (e.g. per-ticket alerts in the API, one alert per
+near-duplicate cluster in the job). `concurrency` is per stage and is used by
+`Stage.map` for the stage's parallel part (sub-batches of the classifier,
+Telegram sends); default from PIPELINE_<STAGE>_CONCURRENCY.
+
+Each stage is timed: per batch in HISTORY (latency `stage.<name>`), cumulative
+in `Pipeline.stats()` and, if given, in the caller's PhaseTimer.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from src.config import env_int
+from src.metrics import observe
+from src.services.classifiers import cascade_for, classify_batch
+from src.services.rules_engine import RuleSet
+from src.utils.dlq_handler import write_to_dlq
+from src.utils.logger import get_logger
+from src.utils.timing import PhaseTimer
+
+logger = get_logger("pipeline")
+
+LABEL_KEYS = ("topic", "priority", "sentiment", "owner_suggested")
+
+
+@dataclass
+class Item:
+    ticket: Dict
+    out: Optional[Dict] = None          # ticket enriquecido (classify en adelante)
+    notify: bool = False
+    cluster: Optional[str] = None
+    status: str = "OK"
+    info: Dict = field(default_factory=dict)  # extras para la respuesta (dlq_path, ...)
+
+    @property
+    def alive(self) -> bool:
+        return self.status == "OK"
+
+    @property
+    def id(self):
+        return self.ticket.get("id")
+
+    def dead_letter(self, reason: str, stage: str, drop: bool = True) -> str:
+        """Write to the DLQ; `drop=False` keeps the item going (e.g. the job still persists it)."""
+        path = write_to_dlq(self.out or self.ticket, reason, stage=stage)
+        if drop:
+            self.status = "DLQ"
+            self.info["dlq_path"] = path
+        return path
+
+
+@dataclass
+class Context:
+    ruleset: RuleSet
+    classifier: Optional[str] = None
+    state: Dict[str, Any] = field(default_factory=dict)  # dedup, ledger, journal, ... (según entry point)
+
+
+class Stage:
+    name = "stage"
+    default_concurrency = 1
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.concurrency = max(1, concurrency if concurrency is not None
+                               else env_int(f"PIPELINE_{self.name.upper()}_CONCURRENCY", self.default_concurrency))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def process(self, items: List[Item], ctx: Context) -> None:
+        raise NotImplementedError
+
+    def map(self, fn: Callable, work: List) -> List:
+        """fn over `work` with up to `concurrency` threads (in order)."""
+        if self.concurrency == 1 or len(work) < 2:
+            return [fn(w) for w in work]
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix=f"pipe-{self.name}")
+        return list(self._pool.map(fn, work))
+
+
+def _split(items: List, parts: int) -> List[List]:
+    size = -(-len(items) // max(1, parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# --------------------- Etapas genéricas ---------------------
+class NormalizeStage(Stage):
+    """Canonical fields: str id, title/subject alias (API vs. CSV)."""
+    name = "normalize"
+
+    def process(self, items: List[Item], ctx: Context) -> None:
+        for it in items:
+            t = it.ticket
+            if t.get("id") is not None and not isinstance(t["id"], str):
+                t["id"] = str(t["id"])
+            if not t.get("subject") and t.get("title"):
+                t["subject"] = t["title"]
+            elif not t.get("title") and t.get("subject"):
+                t["title"] = t["subject"]
+
+
+def merge_labels(ticket: Dict, labels: Dict) -> Dict:
+    """Job semantics: the classifier's labels overwrite the row's."""
+    out = dict(ticket)
+    out.update({k: labels[k] for k in LABEL_KEYS})
+    return out
+
+
+class ClassifyStage(Stage):
+    """
+    Batch classification (rules/ml/cascade) in `concurrency` sub-batches. If the
+    classifier fails the batch falls back to the tenant's rules ticket by ticket;
+    a ticket that the rules or the enrichment can't handle goes to the DLQ
+    (`classify_error`) and the rest continue. The cascade's LLM budget
+    lives in ctx.state (one per job run / API request, shared by the sub-batches).
+    """
+    name = "classify"
+
+    def __init__(self, enrich: Callable[[Dict, Dict], Dict] = merge_labels, concurrency: Optional[int] = None):
+        super().__init__(concurrency)
+        self.enrich = enrich
+
+    def process(self, items: List[Item], ctx: Context) -> None:
+        tickets = [it.ticket for it in items]
+        cascade = cascade_for(ctx.state, ctx.classifier)
+        try:
+            parts = self.map(lambda part: classify_batch(part, ctx.ruleset, ctx.classifier, cascade),
+                             _split(tickets, self.concurrency))
+            labels = [lab for part in parts for lab in part]
+        except Exception as e:
+            logger.warning(f"Batch classify ({ctx.classifier}) failed, falling back to rules: {e}")
+            labels = None
+        for i, it in enumerate(items):
+            try:
+                # Fallback ticket por ticket: uno que rompe las reglas no tira el batch
+                lab = labels[i] if labels is not None else classify_batch([it.ticket], ctx.ruleset, "rules")[0]
+                it.out = self.enrich(it.ticket, lab)
+            except Exception as e:
+                it.dead_letter(f"classify_error: {e}", stage="classify")
+
+
+class RouteStage(Stage):
+    """P1 -> notify. With a DedupIndex in ctx.state["dedup"], assigns dup_cluster too."""
+    name = "route"
+
+    def process(self, items: List[Item], ctx: Context) -> None:
+        dedup = ctx.state.get("dedup")
+        if dedup is not None:
+            touched = dedup.assign([it.out for it in items])
+            ctx.state.setdefault("touched", {}).update(touched)
+        for it in items:
+            it.notify = str(it.out.get("priority", "")).upper() == "P1"
+            it.cluster = it.out.get("dup_cluster") or it.id
+
+
+# --------------------- Pipeline ---------------------
+class Pipeline:
+    def __init__(self, stages: Iterable[Stage], name: str = "pipeline"):
+        self.stages = list(stages)
+        self.name = name
+        self._stats: Dict[str, Dict[str, float]] = {s.name: {"batches": 0, "items": 0, "seconds": 0.0}
+                                                    for s in self.stages}
+        self._lock = threading.Lock()
+
+    def run(self, tickets: List[Dict], ruleset: RuleSet, classifier: Optional[str] = None,
+            timer: Optional[PhaseTimer] = None, state: Optional[Dict[str, Any]] = None) -> List[Item]:
+        """`state` is shared with the stages as-is (they may update it: alerts_sent, touched...)."""
+        items = [Item(dict(t)) for t in tickets]  # copia: normalize no toca los dicts del caller
+        ctx = Context(ruleset, classifier, state if state is not None else {})
+        for stage in self.stages:
+            live = [it for it in items if it.alive]
+            if not live:
+                break
+            t0 = time.perf_counter()
+            stage.process(live, ctx)
+            dt = time.perf_counter() - t0
+            observe(f"stage.{stage.name}", dt)
+            with self._lock:
+                s = self._stats[stage.name]
+                s["batches"] += 1
+                s["items"] += len(live)
+                s["seconds"] += dt
+            if timer is not None:
+                timer.lap(stage.name)
+        return items
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {"batches": s["batches"], "items": s["items"], "total_ms": round(s["seconds"] * 1000, 1),
+                       "avg_ms_per_item": round(s["seconds"] * 1000 / s["items"], 3) if s["items"] else 0.0}
+                for name, s in self._stats.items()
+            }
@@ -1,6 +1,9 @@
 from __future__ import annotations
 from typing import Literal, Dict
 
+from src.services.rules_engine import compile_ruleset
+from src.services.text_norm import normalize
+
 Priority = Literal["P1","P2","P3"]
 
 
@@ -35,40 +38,55 @@ OWNER_SUGGESTIONS = {
 }
 
 
+PRIORITY_BLOCKERS = ["cannot", "can't", "no puedo", "unauthorized", "breach", "fraud", "acceso raro"]
+NEGATIVE_KEYWORDS = ["cannot", "can't", "error", "crash", "crashes", "overcharged", "fraud", "no puedo", "se cierra", "cobraron de más"]
+POSITIVE_KEYWORDS = ["thanks", "thank you", "excellent", "great", "fast", "gracias", "excelente", "rápido"]
+
+
+# Definición builtin (mismo formato que config/rules/<tenant>.json); fallback si no hay archivo
+DEFAULT_RULES = {
+    "topics": [
+        {"name": topic, "keywords": kws, "owner": OWNER_SUGGESTIONS.get(topic)}
+        for topic, kws in TOPIC_KEYWORDS.items()
+    ],
+    "default_topic": "other",
+    "default_owner": "L1 Support",
+    "priority": {
+        "rules": [
+            {"level": "P1", "keywords": PRIORITY_BLOCKERS, "topics": ["security"]},
+            {"level": "P2", "topics": ["billing", "mobile"]},
+        ],
+        "default": "P3",
+    },
+    "sentiment": {
+        "rules": [
+            {"label": "neg", "keywords": NEGATIVE_KEYWORDS},
+            {"label": "pos", "keywords": POSITIVE_KEYWORDS},
+        ],
+        "default": "neu",
+    },
+}
+
+BUILTIN_RULESET = compile_ruleset(DEFAULT_RULES, name="default", source="builtin")
+
+
 def simple_topic(text: str) -> str:
-    t = text.lower()
-    for topic, kws in TOPIC_KEYWORDS.items():
-        if any(k in t for k in kws):
-            return topic
-    return "other"
+    return BUILTIN_RULESET.topic(normalize(text).text)
 
 
 
 
 def simple_priority(text: str) -> Priority:
-    t = text.lower()
-    neg_blockers = ["cannot", "can't", "no puedo", "unauthorized", "breach", "fraud", "acceso raro"]
-    if any(k in t for k in TOPIC_KEYWORDS["security"]) or any(k in t for k in neg_blockers):
-     return "P1"
-    if any(k in t for k in TOPIC_KEYWORDS["billing"]) or any(k in t for k in TOPIC_KEYWORDS["mobile"]):
-     return "P2"
-    return "P3"
+    return BUILTIN_RULESET.priority(normalize(text).text)
 
 
 
 
 def simple_sentiment(text: str) -> str:
-    t = text.lower()
-    neg = ["cannot", "can't", "error", "crash", "crashes", "overcharged", "fraud", "no puedo", "se cierra", "cobraron de más"]
-    pos = ["thanks", "thank you", "excellent", "great", "fast", "gracias", "excelente", "rápido"]
-    if any(k in t for k in neg):
-        return "neg"
-    if any(k in t for k in pos):
-        return "pos"
-    return "neu"
+    return BUILTIN_RULESET.sentiment(normalize(text).text)
 
 
 
 
 def owner_for_topic(topic: str) -> str:
-    return OWNER_SUGGESTIONS.get(topic, "L1 Support")
\ No newline at end of file
+    return BUILTIN_RULESET.owner(topic)
\ No newline at end of file
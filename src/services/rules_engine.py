@@ -0,0 +1,265 @@
+# src/services/rules_engine.py
+"""
+Compiled, hot-reloadable rule sets (one per tenant).
+
+Rule definitions live as JSON files in RULES_DIR (`<tenant>.json`). Each file is
+compiled once into one regex per rule. Keywords go through the same
+`text_norm.fold` as ticket text, so "contraseña" also matches "contrasena".
+The registry swaps the compiled object atomically when the file changes, so
+in-flight work keeps using the RuleSet it already holds.
+
+Definition format:
+
+    {
+      "topics": [{"name": "login", "keywords": ["login", ...], "owner": "L1 Support"}, ...],
+      "default_topic": "other",
+      "default_owner": "L1 Support",
+      "priority": {"rules": [{"level": "P1", "keywords": [...], "topics": ["security"]}, ...],
+                   "default": "P3"},
+      "sentiment": {"rules": [{"label": "neg", "keywords": [...]}, ...], "default": "neu"}
+    }
+
+`topics` inside a priority/sentiment rule reuses the keywords of those topics.
+Rules are evaluated in order; the first match wins.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from src.services.text_norm import NormText, fold, normalize
+
+RULES_DIR = os.getenv("RULES_DIR", "config/rules")
+RULES_RELOAD_INTERVAL = float(os.getenv("RULES_RELOAD_INTERVAL", "2"))
+DEFAULT_TENANT = "default"
+
+_TENANT_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def _compile_keywords(keywords: List[str]) -> Optional[Pattern[str]]:
+    kws = sorted({fold(str(k)) for k in keywords if str(k).strip()}, key=len, reverse=True)
+    if not kws:
+        return None
+    return re.compile("|".join(re.escape(k) for k in kws))
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    name: str
+    topics: Tuple[Tuple[str, Pattern[str]], ...]
+    owners: Dict[str, str]
+    default_topic: str
+    default_owner: str
+    priority_rules: Tuple[Tuple[str, Pattern[str]], ...]
+    default_priority: str
+    sentiment_rules: Tuple[Tuple[str, Pattern[str]], ...]
+    default_sentiment: str
+    source: str = field(default="builtin", compare=False)
+
+    # topic/priority/sentiment reciben texto ya normalizado (text_norm): una sola pasada por ticket
+    def topic(self, t: str) -> str:
+        for name, rx in self.topics:
+            if rx.search(t):
+                return name
+        return self.default_topic
+
+    def priority(self, t: str) -> str:
+        for level, rx in self.priority_rules:
+            if rx.search(t):
+                return level
+        return self.default_priority
+
+    def sentiment(self, t: str) -> str:
+        for label, rx in self.sentiment_rules:
+            if rx.search(t):
+                return label
+        return self.default_sentiment
+
+    def owner(self, topic: str) -> str:
+        return self.owners.get(topic, self.default_owner)
+
+    def labels(self) -> Dict[str, List[str]]:
+        """Allowed values per field (used to constrain other classifiers)."""
+        def _uniq(items: List[str]) -> List[str]:
+            return list(dict.fromkeys(items))
+        return {
+            "topic": _uniq([n for n, _ in self.topics] + [self.default_topic]),
+            "priority": _uniq(sorted([lvl for lvl, _ in self.priority_rules] + [self.default_priority])),
+            "sentiment": _uniq([lbl for lbl, _ in self.sentiment_rules] + [self.default_sentiment]),
+        }
+
+    def classify(self, text: str | NormText) -> Dict:
+        """
+        Labels plus a heuristic `confidence`: high when exactly one topic matched,
+        lower when several topics compete, lowest when nothing matched.
+        """
+        t = normalize(text).text
+        hits = [name for name, rx in self.topics if rx.search(t)]
+        topic = hits[0] if hits else self.default_topic
+
+        if not hits:
+            confidence = 0.3
+        elif len(hits) > 1:
+            confidence = 0.6
+        else:
+            confidence = 0.9
+
+        return {
+            "topic": topic,
+            "priority": self.priority(t),
+            "sentiment": self.sentiment(t),
+            "owner_suggested": self.owner(topic),
+            "confidence": confidence,
+        }
+
+
+def compile_ruleset(defn: Dict, name: str = DEFAULT_TENANT, source: str = "builtin") -> RuleSet:
+    """Validate a rule definition and compile it into a RuleSet. Raises ValueError if invalid."""
+    if not isinstance(defn, dict) or not isinstance(defn.get("topics"), list):
+        raise ValueError(f"Ruleset '{name}': 'topics' must be a list")
+
+    topic_keywords: Dict[str, List[str]] = {}
+    owners: Dict[str, str] = {}
+    topics: List[Tuple[str, Pattern[str]]] = []
+    for t in defn["topics"]:
+        tname = t.get("name") if isinstance(t, dict) else None
+        if not tname:
+            raise ValueError(f"Ruleset '{name}': every topic needs a 'name'")
+        kws = list(t.get("keywords") or [])
+        topic_keywords[tname] = kws
+        if t.get("owner"):
+            owners[tname] = t["owner"]
+        rx = _compile_keywords(kws)
+        if rx is not None:
+            topics.append((tname, rx))
+
+    def _rules(section: Dict, label_key: str) -> Tuple[Tuple[str, Pattern[str]], ...]:
+        compiled = []
+        for rule in section.get("rules") or []:
+            label = rule.get(label_key)
+            if not label:
+                raise ValueError(f"Ruleset '{name}': rule without '{label_key}'")
+            kws = list(rule.get("keywords") or [])
+            for ref in rule.get("topics") or []:
+                if ref not in topic_keywords:
+                    raise ValueError(f"Ruleset '{name}': unknown topic '{ref}' referenced by '{label}'")
+                kws.extend(topic_keywords[ref])
+            rx = _compile_keywords(kws)
+            if rx is not None:
+                compiled.append((label, rx))
+        return tuple(compiled)
+
+    prio = defn.get("priority") or {}
+    sent = defn.get("sentiment") or {}
+    return RuleSet(
+        name=name,
+        topics=tuple(topics),
+        owners=owners,
+        default_topic=defn.get("default_topic", "other"),
+        default_owner=defn.get("default_owner", "L1 Support"),
+        priority_rules=_rules(prio, "level"),
+        default_priority=prio.get("default", "P3"),
+        sentiment_rules=_rules(sent, "label"),
+        default_sentiment=sent.get("default", "neu"),
+        source=source,
+    )
+
+
+def load_ruleset(path: str | Path, name: str) -> RuleSet:
+    with open(path, "r", encoding="utf-8") as f:
+        defn = json.load(f)
+    return compile_ruleset(defn, name=name, source=str(path))
+
+
+@dataclass(frozen=True)
+class _Entry:
+    ruleset: RuleSet
+    fingerprint: Optional[Tuple[int, int, int]]
+    checked_at: float
+
+
+class RuleRegistry:
+    """
+    Per-tenant cache of compiled rule sets.
+
+    `get()` is a dict lookup plus a monotonic-clock comparison; the rules file is
+    only stat'ed every `reload_interval` seconds and recompiled only when its
+    (mtime, size, inode) fingerprint changes. A file that fails to compile keeps
+    the previous version active.
+    """
+
+    def __init__(self, rules_dir: str | Path = RULES_DIR, reload_interval: float = RULES_RELOAD_INTERVAL):
+        self.rules_dir = Path(rules_dir)
+        self.reload_interval = reload_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, tenant: str) -> Path:
+        return self.rules_dir / f"{tenant}.json"
+
+    @staticmethod
+    def _fingerprint(path: Path) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def get(self, tenant: Optional[str] = None) -> RuleSet:
+        tenant = tenant or DEFAULT_TENANT
+        entry = self._entries.get(tenant)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < self.reload_interval:
+            return entry.ruleset
+        return self._refresh(tenant, entry, now)
+
+    def _refresh(self, tenant: str, entry: Optional[_Entry], now: float) -> RuleSet:
+        if not _TENANT_RE.match(tenant):
+            raise ValueError(f"Invalid tenant name: {tenant!r}")
+
+        path = self._path(tenant)
+        fp = self._fingerprint(path)
+        if entry is not None and entry.fingerprint == fp:
+            self._entries[tenant] = _Entry(entry.ruleset, fp, now)
+            return entry.ruleset
+
+        with self._lock:
+            # Otro thread pudo haber recompilado mientras esperábamos el lock
+            current = self._entries.get(tenant)
+            if current is not None and current is not entry and current.fingerprint == fp:
+                return current.ruleset
+
+            if fp is None:
+                if tenant != DEFAULT_TENANT:
+                    raise ValueError(f"Unknown tenant: {tenant!r} (no {path})")
+                from src.services.rules import BUILTIN_RULESET
+                ruleset = BUILTIN_RULESET
+            else:
+                try:
+                    ruleset = load_ruleset(path, tenant)
+                except (OSError, ValueError) as e:
+                    if entry is None:
+                        raise ValueError(f"Could not load rules for tenant {tenant!r}: {e}") from e
+                    print(f"[rules] reload failed for {path}, keeping previous version: {e}")
+                    ruleset = entry.ruleset
+
+            self._entries[tenant] = _Entry(ruleset, fp, now)
+            return ruleset
+
+    def tenant_for_input(self, input_path: str | Path) -> str:
+        """Rule set for an input file: `<RULES_DIR>/<input stem>.json` if present, else default."""
+        stem = Path(input_path).stem
+        return stem if _TENANT_RE.match(stem) and self._path(stem).exists() else DEFAULT_TENANT
+
+
+REGISTRY = RuleRegistry()
+
+
+def get_ruleset(tenant: Optional[str] = None) -> RuleSet:
+    return REGISTRY.get(tenant)
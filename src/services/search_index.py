@@ -0,0 +1,384 @@
+# src/services/search_index.py
+"""
+Full-text search over the classified tickets (subject + description).
+
+- Text: same normalization as the classifiers (text_norm: casefold, no accents),
+  tokens = \\w+. Subject tokens count twice (boost).
+- Segments (LSM): the job writes one immutable segment per checkpointed chunk
+  (`seg-NNNNNN.npz`: sorted terms, offsets, postings doc/tf, ids, lengths) and then
+  rewrites `manifest.json` atomically. Tail segments of similar size are merged
+  (binary-counter policy: O(log N) segments, each doc rewritten O(log N) times).
+  Doc numbers are global (segment base + local) and never change on merge.
+- Readers (API, dashboard) reload the manifest when it changes and only load
+  segments they do not have yet. Merged-away segments stay on disk (listed as
+  `retired` in the manifest) for SEARCH_SEGMENT_GRACE_SEC and are deleted by a
+  later write, so a reader holding an older manifest can still load them; if
+  one is gone anyway, refresh() re-reads the manifest and retries.
+- Query: every query term must match (AND). A term matches exactly (weight 1)
+  and, from SEARCH_MIN_PARTIAL chars, as a prefix (0.8) or substring (0.5) of
+  indexed terms, found via a trigram index over the vocabulary (not the docs,
+  so it stays small). Ranking: BM25; ties -> newest first. Offset pagination.
+- Crash-safety: the segment is written after the output append and before the
+  journal checkpoint; a redone chunk skips ids already indexed.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.config import env_float, env_int, env_str
+from src.services.text_norm import _TOKEN_RE, normalize, normalize_ticket
+from src.utils.io import atomic_write
+
+SEARCH_INDEX_DIR = env_str("SEARCH_INDEX_DIR", "data/outputs/search_index")
+SEARCH_MIN_PARTIAL = env_int("SEARCH_MIN_PARTIAL", 3)
+SEARCH_MAX_EXPANSIONS = env_int("SEARCH_MAX_EXPANSIONS", 32)
+SEARCH_PAGE_SIZE = env_int("SEARCH_PAGE_SIZE", 20)
+SEARCH_SEGMENT_GRACE_SEC = env_float("SEARCH_SEGMENT_GRACE_SEC", 300.0)
+REFRESH_RETRIES = 3
+
+SUBJECT_BOOST = 2
+K1, B = 1.2, 0.75
+W_EXACT, W_PREFIX, W_SUBSTR = 1.0, 0.8, 0.5
+
+
+def doc_terms(row: Dict) -> Counter:
+    # Texto ya normalizado por los clasificadores (cache hit en el job); los primeros
+    # tokens son los del subject
+    tokens = normalize_ticket(row).tokens
+    n_subj = len(_TOKEN_RE.findall(str(row.get("subject") or row.get("title") or "")))
+    tf = Counter(tokens)
+    for t in tokens[:n_subj]:
+        tf[t] += SUBJECT_BOOST - 1
+    return tf
+
+
+def _trigrams(term: str) -> Set[str]:
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def _build(vocab: np.ndarray, tid: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Postings (term id, doc, tf; one per term/doc, docs ascending) -> offsets +
+    docs/tfs grouped by term. Stable sort by term keeps each posting list sorted.
+    """
+    order = np.argsort(tid, kind="stable")
+    counts = np.bincount(tid, minlength=len(vocab))
+    return {"terms": vocab, "offsets": np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            "docs": docs[order].astype(np.int32), "tfs": np.minimum(tfs[order], 65535).astype(np.uint16)}
+
+
+class Segment:
+    def __init__(self, name: str, base: int, data: Dict[str, np.ndarray]):
+        self.name = name
+        self.base = base
+        self.terms = data["terms"]
+        self.offsets = data["offsets"]
+        self.docs = data["docs"]
+        self.tfs = data["tfs"]
+        self.ids = data["ids"]
+        self.lengths = data["lengths"]
+        self._term_idx = {t: i for i, t in enumerate(self.terms.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        i = self._term_idx.get(term)
+        if i is None:
+            return None
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return self.docs[a:b] + self.base, self.tfs[a:b]
+
+    @classmethod
+    def load(cls, path: Path, base: int) -> "Segment":
+        with np.load(path) as z:
+            return cls(path.name, base, {k: z[k] for k in z.files})
+
+
+class SearchIndex:
+    def __init__(self, path: str | Path = SEARCH_INDEX_DIR):
+        self.path = Path(path)
+        self.manifest: Dict = {"segments": [], "next_seq": 1}
+        self._segments: List[Segment] = []
+        self._manifest_key = None
+        self._lengths = np.empty(0, dtype=np.int32)
+        self._ids = np.empty(0, dtype=str)
+        self._df: Dict[str, int] = {}            # document frequency por término
+        self._tri: Dict[str, Set[str]] = defaultdict(set)
+        self._id_set: Optional[Set[str]] = None  # solo el writer (lazy)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # --------------------- Lectura ---------------------
+    @classmethod
+    def open(cls, path: str | Path = SEARCH_INDEX_DIR) -> "SearchIndex":
+        idx = cls(path)
+        idx.refresh()
+        return idx
+
+    def _read_manifest(self) -> Tuple[Optional[Tuple[int, int]], Dict]:
+        p = self.path / "manifest.json"
+        try:
+            st = p.stat()
+            return (st.st_mtime_ns, st.st_size), json.loads(p.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None, {"segments": [], "next_seq": 1}
+
+    def refresh(self) -> bool:
+        """Pick up segments written (or merged) since the last call. True if something changed."""
+        with self._lock:
+            for attempt in range(REFRESH_RETRIES):
+                key, manifest = self._read_manifest()
+                if key == self._manifest_key:
+                    return False
+                loaded = {s.name: s for s in self._segments}
+                try:
+                    segments = []
+                    for entry in manifest["segments"]:
+                        seg = loaded.get(entry["name"])
+                        if seg is None or seg.base != entry["base"]:
+                            seg = Segment.load(self.path / entry["name"], entry["base"])
+                        segments.append(seg)
+                except FileNotFoundError:
+                    # manifest viejo (el writer ya mergeó y borró): releer y reintentar
+                    if attempt == REFRESH_RETRIES - 1:
+                        raise
+                    continue
+                self._install(manifest, segments)
+                self._manifest_key = key
+                return True
+        return False
+
+    def _install(self, manifest: Dict, segments: List[Segment]) -> None:
+        old = {s.name for s in self._segments}
+        names = {s.name for s in segments}
+        added = [s for s in segments if s.name not in old]
+        removed = sum(len(s) for s in self._segments if s.name not in names)
+        if removed and removed == sum(len(s) for s in added):
+            added = []  # merge: mismos docs y términos, df no cambia
+        elif removed:
+            self._df, added = {}, segments  # otro layout (índice reconstruido): recalcular
+        for seg in added:
+            counts = np.diff(seg.offsets)
+            for t, c in zip(seg.terms.tolist(), counts.tolist()):
+                if t not in self._df:
+                    for g in _trigrams(t):
+                        self._tri[g].add(t)
+                self._df[t] = self._df.get(t, 0) + c
+        self.manifest = manifest
+        self._segments = segments
+        self._lengths = (np.concatenate([s.lengths for s in segments]) if segments
+                         else np.empty(0, dtype=np.int32))
+        self._ids = np.concatenate([s.ids for s in segments]) if segments else np.empty(0, dtype=str)
+        self._id_set = None
+
+    def _expand(self, q: str) -> List[Tuple[str, float]]:
+        """Indexed terms matching query term `q` with their weight."""
+        out: Dict[str, float] = {}
+        if q in self._df:
+            out[q] = W_EXACT
+        if len(q) >= SEARCH_MIN_PARTIAL:
+            grams = sorted(_trigrams(q), key=lambda g: len(self._tri.get(g, ())))
+            cands = set(self._tri.get(grams[0], ())) if grams else set()
+            for g in grams[1:]:
+                cands &= self._tri.get(g, set())
+                if not cands:
+                    break
+            for t in cands:
+                if t != q and t in self._df:
+                    out[t] = W_PREFIX if t.startswith(q) else W_SUBSTR
+        if len(out) > SEARCH_MAX_EXPANSIONS:
+            # exacto primero, después prefijos, después los más cortos (más parecidos)
+            keep = sorted(out, key=lambda t: (-out[t], len(t), t))[:SEARCH_MAX_EXPANSIONS]
+            out = {t: out[t] for t in keep}
+        return list(out.items())
+
+    def _postings(self, segments: List[Segment], term: str) -> Tuple[np.ndarray, np.ndarray]:
+        parts = [p for p in (s.postings(term) for s in segments) if p is not None]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint16)
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def search(self, query: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> Dict:
+        """Ranked ids for `query`: {"total", "results": [{"id", "score"}]} (page at `offset`)."""
+        self.refresh()
+        terms = list(dict.fromkeys(normalize(query or "").tokens))
+        with self._lock:
+            segments, lengths, ids = self._segments, self._lengths, self._ids
+            expansions = [(q, self._expand(q)) for q in terms]
+            df = {t: self._df[t] for _, exps in expansions for t, _ in exps}
+        empty = {"total": 0, "results": []}
+        if not terms or not len(ids) or any(not exps for _, exps in expansions):
+            return empty
+        n_docs = len(ids)
+        avgdl = float(lengths.mean()) or 1.0
+
+        acc_docs = acc_scores = None
+        for q, exps in expansions:
+            docs_l, scores_l = [], []
+            for t, w in exps:
+                d, tf = self._postings(segments, t)
+                idf = np.log1p((n_docs - df[t] + 0.5) / (df[t] + 0.5))
+                tf = tf.astype(np.float64)
+                norm = K1 * (1 - B + B * lengths[d] / avgdl)
+                docs_l.append(d)
+                scores_l.append(w * idf * tf * (K1 + 1) / (tf + norm))
+            docs = np.concatenate(docs_l)
+            scores = np.concatenate(scores_l)
+            # OR entre expansiones del mismo término: el mejor match por doc
+            order = np.argsort(docs, kind="stable")
+            docs, scores = docs[order], scores[order]
+            starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+            docs, scores = docs[starts], np.maximum.reduceat(scores, starts)
+            if acc_docs is None:
+                acc_docs, acc_scores = docs, scores
+            else:
+                acc_docs, i1, i2 = np.intersect1d(acc_docs, docs, assume_unique=True, return_indices=True)
+                acc_scores = acc_scores[i1] + scores[i2]
+            if not len(acc_docs):
+                return empty
+
+        total = len(acc_docs)
+        offset, limit = max(0, offset), max(1, limit)
+        top = min(total, offset + limit)
+        if top < total:
+            cut = np.argpartition(-acc_scores, top - 1)[:top]
+        else:
+            cut = np.arange(total)
+        ranked = cut[np.lexsort((-acc_docs[cut], -acc_scores[cut]))][offset:top]
+        return {"total": total, "results": [{"id": str(ids[acc_docs[i]]), "score": round(float(acc_scores[i]), 4)}
+                                            for i in ranked]}
+
+    def stats(self) -> Dict:
+        return {"docs": len(self._ids), "segments": len(self._segments), "terms": len(self._df)}
+
+    # --------------------- Escritura (job) ---------------------
+    def _ensure_ids(self) -> Set[str]:
+        if self._id_set is None:
+            self._id_set = set(self._ids.tolist())
+        return self._id_set
+
+    def _write_segment(self, name: str, arrays: Dict[str, np.ndarray]) -> None:
+        atomic_write(self.path / name, lambda f: np.savez(f, **arrays), mode="wb")
+
+    def _save_manifest(self) -> None:
+        atomic_write(self.path / "manifest.json", lambda f: json.dump(self.manifest, f))
+        self._manifest_key = self._read_manifest()[0]
+
+    def add(self, rows: Iterable[Dict]) -> int:
+        """Index rows not indexed yet as a new segment (+ tail merges). Returns how many."""
+        self.refresh()
+        known = self._ensure_ids()
+        batch, seen = [], set()
+        for r in rows:
+            rid = str(r.get("id"))
+            if rid and rid not in known and rid not in seen:
+                seen.add(rid)
+                batch.append((rid, doc_terms(r)))
+        if not batch:
+            return 0
+
+        terms, docs, tfs, lengths = [], [], [], []
+        for local, (_, tf) in enumerate(batch):
+            terms.extend(tf.keys())
+            tfs.extend(tf.values())
+            docs.extend([local] * len(tf))
+            lengths.append(sum(tf.values()))
+        vocab, tid = np.unique(np.asarray(terms, dtype=str), return_inverse=True)
+        arrays = _build(vocab, tid, np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.int64))
+        arrays["ids"] = np.asarray([rid for rid, _ in batch], dtype=str)
+        arrays["lengths"] = np.asarray(lengths, dtype=np.int32)
+
+        seq = self.manifest.get("next_seq", 1)
+        name = f"seg-{seq:06d}.npz"
+        base = len(self._ids)
+        self._write_segment(name, arrays)
+        manifest = {"segments": self.manifest["segments"] + [{"name": name, "base": base, "docs": len(batch)}],
+                    "next_seq": seq + 1, "retired": self._collect_retired()}
+        segments = self._segments + [Segment(name, base, arrays)]
+        with self._lock:
+            self._install(manifest, segments)
+        self._save_manifest()
+        self._merge_tail()
+        known.update(seen)
+        self._id_set = known
+        return len(batch)
+
+    def _merge_tail(self) -> None:
+        segs = self.manifest["segments"]
+        k = len(segs)
+        while k >= 2 and segs[k - 2]["docs"] <= segs[-1]["docs"] + sum(s["docs"] for s in segs[k - 1:-1]):
+            k -= 1
+        if k == len(segs):
+            return
+        tail = self._segments[k - 1:]
+        base = tail[0].base
+        # vocabulario unido (chico) y los postings como ids enteros: sin ordenar strings
+        vocab = np.unique(np.concatenate([s.terms for s in tail]))
+        tid = np.concatenate([np.repeat(np.searchsorted(vocab, s.terms), np.diff(s.offsets)) for s in tail])
+        docs = np.concatenate([s.docs.astype(np.int64) + (s.base - base) for s in tail])
+        tfs = np.concatenate([s.tfs for s in tail]).astype(np.int64)
+        arrays = _build(vocab, tid, docs, tfs)
+        arrays["ids"] = np.concatenate([s.ids for s in tail])
+        arrays["lengths"] = np.concatenate([s.lengths for s in tail])
+
+        seq = self.manifest["next_seq"]
+        name = f"seg-{seq:06d}.npz"
+        self._write_segment(name, arrays)
+        # Los mergeados no se borran acá: un lector con el manifest anterior todavía
+        # puede necesitarlos. Quedan retirados hasta que venza la gracia.
+        now = time.time()
+        retired = self.manifest.get("retired", []) + [{"name": s.name, "at": now} for s in tail]
+        manifest = {"segments": segs[:k - 1] + [{"name": name, "base": base, "docs": len(arrays["ids"])}],
+                    "next_seq": seq + 1, "retired": retired}
+        with self._lock:
+            self._install(manifest, self._segments[:k - 1] + [Segment(name, base, arrays)])
+        self._save_manifest()
+
+    def _collect_retired(self) -> List[Dict]:
+        """Delete retired segments past the grace period; returns the ones kept."""
+        keep = []
+        cutoff = time.time() - SEARCH_SEGMENT_GRACE_SEC
+        live = {e["name"] for e in self.manifest["segments"]}
+        for entry in self.manifest.get("retired", []):
+            if entry["name"] in live:
+                continue
+            if entry["at"] > cutoff:
+                keep.append(entry)
+                continue
+            try:
+                os.unlink(self.path / entry["name"])
+            except FileNotFoundError:
+                pass
+        return keep
+
+    def catch_up(self, rows: List[Dict]) -> int:
+        """Index output rows missing from the index (first run, or index deleted)."""
+        if len(self) >= len(rows):
+            return 0
+        return self.add(rows)
+
+
+_SHARED: Optional[SearchIndex] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def get_search_index() -> SearchIndex:
+    """Process-wide reader (API / dashboard); refreshed on every search."""
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = SearchIndex.open(SEARCH_INDEX_DIR)
+        return _SHARED
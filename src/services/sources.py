@@ -0,0 +1,454 @@
+# src/services/sources.py
+"""
+Ingestion sources for the job (INGEST_SOURCE=csv|sheets).
+
+The job always works on a local tickets CSV (`source.path`): `load()` brings it
+up to date and reads it, `read_new()` returns the rows added since the last
+call (watch mode), `wait()` blocks until there may be something new.
+
+- CsvSource: LOCAL_INPUT_CSV as-is (tail reads + file watcher, as before).
+- SheetsSource: Google Sheets (Sheets API v4) mirrored into SHEETS_MIRROR_CSV,
+  append-only, so nothing downstream changes (dedup by id, sharded mode, tenant
+  by file stem). Each sync:
+    1. Drive `files/{id}?fields=version`: same version as the last sync -> no
+       values request at all.
+    2. `values:batchGet` for the rows after the last one read only, in ranges of
+       SHEETS_BATCH_ROWS rows, SHEETS_BATCH_RANGES ranges per request; the same
+       request re-reads the last row seen to detect a rewritten sheet (then it
+       starts over from the header).
+    3. Append to the mirror (fsync), then state file (atomic): last row, its id,
+       header, version, mirror size. A crash between both is undone on the next
+       sync by cutting the mirror back to the recorded size.
+  Each sync holds a FileLease on `<mirror>.sync.lease` and re-reads the state
+  file under it: several processes (sharded workers, job + watch) can sync the
+  same mirror without appending a row twice or cutting someone's append.
+  Cost per sync is one metadata call + ceil(new rows / batch) requests, not the
+  sheet size. One pooled session (keep-alive) for both APIs, wrapped in the
+  "sheets" circuit breaker. SHEETS_API_BASE / DRIVE_API_BASE point it at a
+  local stand-in server for tests.
+
+Auth: GOOGLE_SHEETS_CREDENTIALS_JSON (service account, needs `pip install
+google-auth`), or a ready bearer token in SHEETS_ACCESS_TOKEN, or
+SHEETS_API_KEY (public sheets; no Drive version check then).
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.config import env_float, env_int, env_str
+from src.utils.io import atomic_write, ensure_parent, truncate
+from src.utils.lease import FileLease
+from src.utils.logger import get_logger
+from src.utils.resilience import Deadline, NonRetryableError, call_with_resilience, get_breaker
+from src.utils.schema import TICKET_COLUMNS, read_tickets
+
+INGEST_SOURCE = env_str("INGEST_SOURCE", "csv").strip().lower()
+LOCAL_INPUT_CSV = env_str("LOCAL_INPUT_CSV", "data/sample_tickets.csv")
+
+GOOGLE_SHEETS_CREDENTIALS_JSON = env_str("GOOGLE_SHEETS_CREDENTIALS_JSON", "")
+GOOGLE_SHEETS_SPREADSHEET_ID = env_str("GOOGLE_SHEETS_SPREADSHEET_ID", "")
+GOOGLE_SHEETS_INPUT_RANGE = env_str("GOOGLE_SHEETS_INPUT_RANGE", "FormResponses!A:Z")
+SHEETS_ACCESS_TOKEN = env_str("SHEETS_ACCESS_TOKEN", "")
+SHEETS_API_KEY = env_str("SHEETS_API_KEY", "")
+SHEETS_API_BASE = env_str("SHEETS_API_BASE", "https://sheets.googleapis.com").rstrip("/")
+DRIVE_API_BASE = env_str("DRIVE_API_BASE", "https://www.googleapis.com").rstrip("/")
+SHEETS_MIRROR_CSV = env_str("SHEETS_MIRROR_CSV", "data/inputs/sheets_tickets.csv")
+SHEETS_STATE_PATH = env_str("SHEETS_STATE_PATH", "") or SHEETS_MIRROR_CSV + ".state.json"
+SHEETS_BATCH_ROWS = max(1, env_int("SHEETS_BATCH_ROWS", 1000))
+SHEETS_BATCH_RANGES = max(1, env_int("SHEETS_BATCH_RANGES", 10))
+SHEETS_POOL_SIZE = max(1, env_int("SHEETS_POOL_SIZE", 4))
+SHEETS_TIMEOUT_SEC = env_float("SHEETS_TIMEOUT_SEC", 15.0)
+SHEETS_DEADLINE_SEC = env_float("SHEETS_DEADLINE_SEC", 60.0)
+SHEETS_MAX_ATTEMPTS = env_int("SHEETS_MAX_ATTEMPTS", 3)
+SHEETS_POLL_SEC = env_float("SHEETS_POLL_SEC", 5.0)
+SHEETS_LOCK_POLL_SEC = 0.2
+
+logger = get_logger("sources")
+
+SCOPES = ("https://www.googleapis.com/auth/spreadsheets.readonly",
+          "https://www.googleapis.com/auth/drive.metadata.readonly")
+
+_RANGE_RE = re.compile(r"^(?P<sheet>.+?)(?:!(?P<c0>[A-Za-z]+)\d*(?::(?P<c1>[A-Za-z]+)\d*)?)?$")
+
+
+def parse_range(a1: str) -> Tuple[str, str, str]:
+    """'FormResponses!A:Z' -> ('FormResponses', 'A', 'Z'). Row numbers are ignored (the header is row 1)."""
+    m = _RANGE_RE.match(a1.strip())
+    if not m:
+        raise ValueError(f"invalid sheet range {a1!r}")
+    c0 = (m.group("c0") or "A").upper()
+    return m.group("sheet"), c0, (m.group("c1") or ("Z" if not m.group("c0") else c0)).upper()
+
+
+def _column(name: str) -> str:
+    # "Created At" -> "created_at" (encabezados de un Google Form)
+    return re.sub(r"\s+", "_", str(name).strip().lower())
+
+
+# --------------------- Interfaz ---------------------
+class TicketSource:
+    """Base: a local tickets CSV at `path`, kept up to date by `sync()`."""
+    name = "source"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def sync(self) -> List[Dict]:
+        """Bring `path` up to date; returns the rows it gained (as str dicts)."""
+        return []
+
+    def load(self) -> pd.DataFrame:
+        self.sync()
+        p = Path(self.path)
+        if not p.exists():
+            raise FileNotFoundError(f"Input CSV not found: {self.path}")
+        return read_tickets(p)
+
+    def seek_end(self) -> None:
+        """Next `read_new()` returns only rows added from now on."""
+
+    def read_new(self) -> List[Dict]:
+        raise NotImplementedError
+
+    def wait(self, debounce: float, max_delay: float, timeout: Optional[float] = None) -> bool:
+        """Block until there may be new rows, at most `timeout` s (False = nothing yet, call again)."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict:
+        return {"source": self.name, "path": self.path}
+
+
+class CsvSource(TicketSource):
+    name = "csv"
+
+    def __init__(self, path: str = LOCAL_INPUT_CSV):
+        super().__init__(path)
+        self._tail = None
+        self._watcher = None
+
+    def seek_end(self) -> None:
+        from src.utils.file_watch import watch_file
+        from src.utils.io import CsvTailReader
+
+        if self._watcher is None:
+            self._watcher = watch_file(self.path)  # antes del seek: no perder un append en el medio
+        self._tail = CsvTailReader(self.path)
+        self._tail.seek_end()
+
+    def read_new(self) -> List[Dict]:
+        if self._tail is None:
+            self.seek_end()
+            return []
+        return self._tail.read_new()
+
+    def wait(self, debounce: float, max_delay: float, timeout: Optional[float] = None) -> bool:
+        from src.utils.file_watch import wait_debounced
+
+        if self._watcher is None:
+            self.seek_end()
+        return wait_debounced(self._watcher, debounce, max_delay, timeout)
+
+    def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+
+# --------------------- Google Sheets ---------------------
+class SheetsClient:
+    """Sheets v4 values + Drive v3 file version over one pooled, authenticated session."""
+
+    def __init__(self, spreadsheet_id: str = GOOGLE_SHEETS_SPREADSHEET_ID,
+                 sheets_base: str = SHEETS_API_BASE, drive_base: str = DRIVE_API_BASE,
+                 credentials: str = GOOGLE_SHEETS_CREDENTIALS_JSON, token: str = SHEETS_ACCESS_TOKEN,
+                 api_key: str = SHEETS_API_KEY, pool_size: int = SHEETS_POOL_SIZE):
+        if not spreadsheet_id:
+            raise ValueError("GOOGLE_SHEETS_SPREADSHEET_ID is not set")
+        self.spreadsheet_id = spreadsheet_id
+        self.sheets_base = sheets_base.rstrip("/")
+        self.drive_base = drive_base.rstrip("/")
+        self.credentials = credentials
+        self.token = token
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+        self.breaker = get_breaker("sheets")
+        self._versioned = not (api_key and not token)  # con API key sola no hay Drive metadata
+        self.counters = {"requests": 0, "version_checks": 0}
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = self._new_session()
+            return self._session
+
+    def _new_session(self):
+        import requests  # diferido: solo con INGEST_SOURCE=sheets
+        from requests.adapters import HTTPAdapter
+
+        if self.token or self.api_key or not self.credentials:
+            s = requests.Session()
+            if self.token:
+                s.headers["Authorization"] = f"Bearer {self.token}"
+        else:
+            try:
+                from google.auth.transport.requests import AuthorizedSession
+                from google.oauth2 import service_account
+            except ImportError as e:
+                raise RuntimeError("GOOGLE_SHEETS_CREDENTIALS_JSON needs google-auth (pip install google-auth), "
+                                   "or set SHEETS_ACCESS_TOKEN") from e
+            creds = service_account.Credentials.from_service_account_file(self.credentials, scopes=list(SCOPES))
+            s = AuthorizedSession(creds)  # renueva el token solo; misma conexión keep-alive
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=0)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        return s
+
+    def _get(self, url: str, params: List[Tuple[str, str]]) -> Dict:
+        if self.api_key:
+            params = params + [("key", self.api_key)]
+
+        def _call(timeout: float) -> Dict:
+            self.counters["requests"] += 1
+            r = self.session.get(url, params=params, timeout=(min(5.0, timeout), timeout))
+            if 400 <= r.status_code < 500 and r.status_code != 429:
+                raise NonRetryableError(f"Sheets HTTP {r.status_code}: {r.text[:200]}")
+            r.raise_for_status()
+            return r.json()
+
+        result, _ = call_with_resilience(_call, self.breaker, Deadline(SHEETS_DEADLINE_SEC),
+                                         max_attempts=SHEETS_MAX_ATTEMPTS, attempt_timeout=SHEETS_TIMEOUT_SEC)
+        return result
+
+    def version(self) -> Optional[str]:
+        """Drive file version (changes on every edit); None if it can't be read (API key, no scope)."""
+        if not self._versioned:
+            return None
+        self.counters["version_checks"] += 1
+        try:
+            obj = self._get(f"{self.drive_base}/drive/v3/files/{self.spreadsheet_id}",
+                            [("fields", "version"), ("supportsAllDrives", "true")])
+        except NonRetryableError as e:
+            print(f"[sheets] version check unavailable, reading values every sync: {e}")
+            self._versioned = False  # no volver a intentar en este proceso
+            return None
+        v = obj.get("version")
+        return None if v is None else str(v)
+
+    def batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        """Values of each range (rows of str; trailing empty rows/cells are omitted by the API)."""
+        obj = self._get(f"{self.sheets_base}/v4/spreadsheets/{self.spreadsheet_id}/values:batchGet",
+                        [("ranges", r) for r in ranges]
+                        + [("majorDimension", "ROWS"), ("valueRenderOption", "FORMATTED_VALUE")])
+        values = [vr.get("values", []) for vr in obj.get("valueRanges", [])]
+        return values + [[] for _ in range(len(ranges) - len(values))]
+
+
+class SheetsSource(TicketSource):
+    """
+    Append-only mirror of a sheet range. Rows are read once, in sheet order:
+    a row edited after it was read is not picked up again (same as the CSV tail).
+    """
+    name = "sheets"
+
+    def __init__(self, client: Optional[SheetsClient] = None, input_range: str = GOOGLE_SHEETS_INPUT_RANGE,
+                 mirror: str = SHEETS_MIRROR_CSV, state_path: str = SHEETS_STATE_PATH,
+                 batch_rows: int = SHEETS_BATCH_ROWS, batch_ranges: int = SHEETS_BATCH_RANGES,
+                 poll: float = SHEETS_POLL_SEC):
+        super().__init__(mirror)
+        self._client = client
+        self.input_range = input_range
+        self.sheet, self.c0, self.c1 = parse_range(input_range)
+        self.state_path = Path(state_path)
+        self.batch_rows = max(1, batch_rows)
+        self.batch_ranges = max(1, batch_ranges)
+        self.poll = poll
+        self.state: Dict = self._load_state()
+        self._lock = threading.Lock()
+        self.counters = {"syncs": 0, "skipped_unchanged": 0, "batch_requests": 0, "rows": 0, "resets": 0}
+
+    @property
+    def client(self) -> SheetsClient:
+        if self._client is None:
+            self._client = SheetsClient()
+        return self._client
+
+    # --------------------- Estado ---------------------
+    def _load_state(self) -> Dict:
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[sheets] unreadable state {self.state_path}, starting over: {e}")
+            return {}
+        # Otra planilla/rango: el estado no aplica
+        if state.get("spreadsheet") != getattr(self._client, "spreadsheet_id", GOOGLE_SHEETS_SPREADSHEET_ID) \
+                or state.get("range") != self.input_range:
+            return {}
+        return state
+
+    def _save_state(self) -> None:
+        self.state.update(spreadsheet=self.client.spreadsheet_id, range=self.input_range)
+        atomic_write(self.state_path, lambda f: json.dump(self.state, f, ensure_ascii=False))
+
+    def _recover(self) -> None:
+        # Solo bajo el lease de sync: otro proceso no puede estar appendeando.
+        p = Path(self.path)
+        if not p.exists() or not p.stat().st_size:
+            return
+        if not self.state:
+            # Sin estado de esta planilla/rango (borrado, ilegible o GOOGLE_SHEETS_INPUT_RANGE
+            # cambiado): no es un append a medias, es otro espejo. Se aparta, no se borra.
+            aside = p.with_name(f"{p.name}.{int(time.time())}.orphan")
+            os.replace(p, aside)
+            logger.warning(f"Mirror {p} has no saved state for {self.input_range}; moved to {aside.name}, "
+                           f"reading the range from the start", extra={"stage": "sheets"})
+            return
+        # Append al mirror sin estado guardado (proceso muerto en el medio): recortarlo
+        size = int(self.state.get("mirror_bytes", 0))
+        if truncate(p, size):
+            logger.warning(f"Cut {p} back to {size} bytes (append without saved state)", extra={"stage": "sheets"})
+
+    def _reset(self) -> None:
+        self.state = {}
+        truncate(self.path, 0)
+        self.counters["resets"] += 1
+
+    # --------------------- Lectura ---------------------
+    def _range(self, first: int, last: int) -> str:
+        return f"{self.sheet}!{self.c0}{first}:{self.c1}{last}"
+
+    def _fetch(self, after: int, header: Optional[List[str]]) -> Tuple[List[Tuple[int, List[str]]], Optional[bool]]:
+        """
+        Rows after sheet row `after` as (row number, values), in batches of ranges.
+        Second value: does row `after` still hold the last id seen (None = not checked).
+        """
+        rows: List[Tuple[int, List[str]]] = []
+        check = None
+        last_id = self.state.get("last_id")
+        probe = after > 1 and last_id is not None and header is not None
+        start = after + 1
+        while True:
+            starts = [start + k * self.batch_rows for k in range(self.batch_ranges)]
+            ranges = [self._range(s, s + self.batch_rows - 1) for s in starts]
+            if probe:
+                ranges.insert(0, self._range(after, after))
+            values = self.client.batch_get(ranges)
+            self.counters["batch_requests"] += 1
+            if probe:
+                probe_rows = values.pop(0)
+                idx = header.index("id")
+                got = probe_rows[0][idx] if probe_rows and len(probe_rows[0]) > idx else None
+                check = got == last_id
+                if not check:
+                    return [], False
+                probe = False
+            for s, vals in zip(starts, values):
+                rows.extend((s + i, v) for i, v in enumerate(vals))
+            if len(values[-1]) < self.batch_rows:
+                return rows, check  # el último rango no se llenó: no hay más filas
+            start = starts[-1] + self.batch_rows
+
+    def _append_mirror(self, rows: List[Dict]) -> int:
+        p = Path(self.path)
+        ensure_parent(p)
+        new_file = not p.exists() or p.stat().st_size == 0
+        with p.open("a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=TICKET_COLUMNS, extrasaction="ignore")
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def _sync_lease(self) -> FileLease:
+        lease = FileLease(self.path + ".sync.lease")
+        while not lease.acquire():  # otro proceso sincronizando (o muerto: su lease vence)
+            time.sleep(SHEETS_LOCK_POLL_SEC)
+        return lease
+
+    def sync(self) -> List[Dict]:
+        with self._lock:
+            lease = self._sync_lease()
+            try:
+                return self._sync()
+            finally:
+                lease.release()
+
+    def _sync(self) -> List[Dict]:
+        # Estado fresco: otro proceso pudo avanzar el espejo desde nuestra última lectura
+        self.state = self._load_state()
+        self._recover()
+        self.counters["syncs"] += 1
+        version = self.client.version()
+        if version is not None and version == self.state.get("version") and Path(self.path).exists():
+            self.counters["skipped_unchanged"] += 1
+            return []
+
+        header = self.state.get("header")
+        raw, same = self._fetch(int(self.state.get("last_row", 0)), header)
+        if same is False:
+            print(f"[sheets] {self.input_range} was rewritten (row {self.state.get('last_row')} changed), "
+                  f"reading it again")
+            self._reset()
+            header = None
+            raw, _ = self._fetch(0, None)
+
+        last_row = int(self.state.get("last_row", 0))
+        if header is None and raw:
+            header = [_column(h) for h in raw[0][1]]
+            if "id" not in header:
+                raise ValueError(f"{self.input_range}: header row has no 'id' column ({raw[0][1]})")
+            raw = raw[1:]
+            last_row = 1
+        new: List[Dict] = []
+        for row_no, vals in raw:
+            last_row = row_no
+            rec = {c: (vals[i] if i < len(vals) else "") for i, c in enumerate(header) if c in TICKET_COLUMNS}
+            if rec.get("id"):
+                new.append(rec)
+                self.state["last_id"] = rec["id"]
+        if new:
+            self.state["mirror_bytes"] = self._append_mirror(new)
+        elif not Path(self.path).exists():
+            self.state["mirror_bytes"] = self._append_mirror([])  # solo el header
+        self.state.update(header=header, last_row=last_row, version=version, synced_at=time.time())
+        self._save_state()
+        self.counters["rows"] += len(new)
+        return new
+
+    def read_new(self) -> List[Dict]:
+        return self.sync()
+
+    def wait(self, debounce: float, max_delay: float, timeout: Optional[float] = None) -> bool:
+        time.sleep(self.poll if timeout is None else min(self.poll, timeout))
+        return True
+
+    def stats(self) -> Dict:
+        return {"source": self.name, "path": self.path, "range": self.input_range,
+                "last_row": self.state.get("last_row", 0), "version": self.state.get("version"),
+                **self.counters, **(self._client.counters if self._client else {})}
+
+
+def get_source(kind: str = INGEST_SOURCE) -> TicketSource:
+    if kind == "csv":
+        return CsvSource()
+    if kind == "sheets":
+        return SheetsSource()
+    raise ValueError(f"unknown INGEST_SOURCE {kind!r} (expected csv or sheets)")
@@ -0,0 +1,244 @@
+# src/services/surge.py
+"""
+Streaming surge detection (per topic / per channel) + keyword heavy hitters.
+
+Fed by the pipeline after classification (SurgeStage, between route and notify:
+it sees every classified ticket, even if its P1 alert fails). Only long-lived
+pipelines run it (API, job --watch): the detector's state is in memory, so the
+one-shot batch job would start from an empty baseline on every run.
+O(1) work per ticket, fixed memory:
+
+- Per key ("topic:login", "channel:web"): two exponentially decayed counters,
+  a short window (SURGE_WINDOW_SEC) and a long baseline (SURGE_BASELINE_SEC).
+  The baseline gives the expected count in the short window; a surge is a
+  short count above max(SURGE_MIN_COUNT, expected * SURGE_MIN_FACTOR,
+  expected + SURGE_Z * sqrt(expected)) (Poisson-ish, adapts to each key's
+  usual volume). One alert per key per SURGE_COOLDOWN_SEC, through the notifier.
+- Keywords: decayed count-min sketch (SKETCH_DEPTH x SKETCH_WIDTH, forward decay
+  so the table is never rescanned per update) + top-k candidates = current
+  heavy hitters, exposed in /metrics -> surge.
+
+Time is processing time: rows whose created_at is older than SURGE_MAX_LAG_SEC
+(backlog catch-up, re-imports) are not counted, so a bulk load is not a surge.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.config import env_bool, env_float, env_int
+from src.metrics import METRICS
+from src.services.pipeline import Item, Stage
+from src.services.text_norm import normalize_ticket
+from src.utils.logger import get_logger
+
+logger = get_logger("surge")
+
+SURGE_ENABLED = env_bool("SURGE_ENABLED", True)
+SURGE_WINDOW_SEC = env_float("SURGE_WINDOW_SEC", 300.0)
+SURGE_BASELINE_SEC = env_float("SURGE_BASELINE_SEC", 6 * 3600.0)
+SURGE_Z = env_float("SURGE_Z", 4.0)
+SURGE_MIN_FACTOR = env_float("SURGE_MIN_FACTOR", 3.0)
+SURGE_MIN_COUNT = env_int("SURGE_MIN_COUNT", 20)
+SURGE_COOLDOWN_SEC = env_float("SURGE_COOLDOWN_SEC", 1800.0)
+SURGE_MAX_LAG_SEC = env_float("SURGE_MAX_LAG_SEC", 3600.0)
+SURGE_MAX_KEYS = env_int("SURGE_MAX_KEYS", 256)
+SURGE_TOP_K = env_int("SURGE_TOP_K", 20)
+
+KEY_FIELDS = ("topic", "channel")
+SKETCH_DEPTH, SKETCH_WIDTH = 4, 2048
+_P = (1 << 31) - 1
+
+STOPWORDS = frozenset("""
+the and for with that this from have not can cant dont does doesnt was were are you your its
+but when after again still there their what how all any our out get got one too
+los las del que con por para una uno unos unas como pero mas muy sin sobre esta este esto
+hay tengo puedo cuando donde desde hasta nos les mis sus
+""".split())
+
+
+def _keywords(row: Dict) -> List[str]:
+    return [t for t in normalize_ticket(row).tokens
+            if len(t) > 2 and not t.isdigit() and t not in STOPWORDS]
+
+
+def _event_age(row: Dict, now: float) -> float:
+    v = row.get("created_at")
+    if v is None or v == "":
+        return 0.0
+    try:
+        ts = v.timestamp() if isinstance(v, datetime) else datetime.fromisoformat(str(v)).timestamp()
+    except (ValueError, TypeError, OverflowError):
+        return 0.0
+    return now - ts
+
+
+class KeywordSketch:
+    """Count-min sketch with forward exponential decay + top-k candidates."""
+
+    def __init__(self, tau: float = SURGE_WINDOW_SEC, k: int = SURGE_TOP_K):
+        import numpy as np  # diferido: la API no carga numpy al arrancar
+
+        self.np = np
+        self.tau = tau
+        self.k = k
+        self.table = np.zeros((SKETCH_DEPTH, SKETCH_WIDTH), dtype=np.float64)
+        rng = np.random.default_rng(20250917)  # semilla fija: mismos buckets entre procesos
+        self._ha = rng.integers(1, _P, size=(SKETCH_DEPTH, 1), dtype=np.int64)
+        self._hb = rng.integers(0, _P, size=(SKETCH_DEPTH, 1), dtype=np.int64)
+        self.landmark = time.time()
+        self.top: Dict[str, float] = {}  # en unidades del landmark (comparables entre sí)
+
+    def _rescale(self, now: float) -> None:
+        f = math.exp(-(now - self.landmark) / self.tau)
+        self.table *= f
+        self.top = {t: v * f for t, v in self.top.items()}
+        self.landmark = now
+
+    def add(self, tokens: List[str], now: float) -> None:
+        if not tokens:
+            return
+        if (now - self.landmark) / self.tau > 30:  # evitar overflow del peso
+            self._rescale(now)
+        np = self.np
+        w = math.exp((now - self.landmark) / self.tau)
+        uniq, counts = np.unique(np.asarray(tokens), return_counts=True)
+        h = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in uniq.tolist()), dtype=np.int64, count=len(uniq))
+        cols = (self._ha * h[None, :] + self._hb) % _P % SKETCH_WIDTH
+        for d in range(SKETCH_DEPTH):
+            np.add.at(self.table[d], cols[d], counts * w)
+        est = self.table[np.arange(SKETCH_DEPTH)[:, None], cols].min(axis=0)
+        floor = min(self.top.values()) if len(self.top) >= self.k else 0.0
+        for t, e in zip(uniq.tolist(), est.tolist()):
+            if t in self.top or len(self.top) < self.k:
+                self.top[t] = e
+            elif e > floor:
+                del self.top[min(self.top, key=self.top.get)]
+                self.top[t] = e
+                floor = min(self.top.values())
+
+    def heavy_hitters(self, now: float, n: Optional[int] = None) -> List[Dict]:
+        f = math.exp(-(now - self.landmark) / self.tau)
+        top = sorted(self.top.items(), key=lambda kv: -kv[1])[: n or self.k]
+        return [{"keyword": t, "count": round(v * f, 1)} for t, v in top if v * f >= 0.5]
+
+
+class SurgeDetector:
+    def __init__(self, window: float = SURGE_WINDOW_SEC, baseline: float = SURGE_BASELINE_SEC):
+        self.window = window
+        self.baseline = baseline
+        self.started = time.time()
+        self._keys: Dict[str, List[float]] = {}  # key -> [count corto, count largo, last_ts, last_alert]
+        self._sketch: Optional[KeywordSketch] = None
+        self.alerts: deque = deque(maxlen=20)
+        self.skipped_stale = 0
+        self._lock = threading.Lock()
+
+    @property
+    def sketch(self) -> KeywordSketch:
+        if self._sketch is None:
+            self._sketch = KeywordSketch(self.window)
+        return self._sketch
+
+    def _decay(self, st: List[float], now: float) -> None:
+        dt = max(0.0, now - st[2])
+        if dt:
+            st[0] *= math.exp(-dt / self.window)
+            st[1] *= math.exp(-dt / self.baseline)
+            st[2] = now
+
+    def _expected(self, st: List[float], now: float) -> float:
+        """Count expected in the short window at the baseline rate."""
+        age = max(1e-6, now - self.started)
+        rate = st[1] / (self.baseline * -math.expm1(-age / self.baseline))
+        return rate * self.window * -math.expm1(-age / self.window)
+
+    def _threshold(self, expected: float) -> float:
+        return max(SURGE_MIN_COUNT, expected * SURGE_MIN_FACTOR, expected + SURGE_Z * math.sqrt(expected))
+
+    def observe(self, rows: List[Dict], now: Optional[float] = None) -> List[Dict]:
+        """Count a batch of classified rows; returns the surges that fired (to alert)."""
+        now = now or time.time()
+        fresh = [r for r in rows if _event_age(r, now) <= SURGE_MAX_LAG_SEC]
+        keywords = [t for r in fresh for t in _keywords(r)]
+        fired = []
+        with self._lock:
+            self.skipped_stale += len(rows) - len(fresh)
+            touched = set()
+            for r in fresh:
+                for field in KEY_FIELDS:
+                    v = r.get(field)
+                    if v is None or v != v or v == "":  # None / NaN
+                        continue
+                    key = f"{field}:{v}"
+                    st = self._keys.get(key)
+                    if st is None:
+                        if len(self._keys) >= SURGE_MAX_KEYS:
+                            continue  # memoria fija: claves nuevas más allá del tope se ignoran
+                        st = self._keys[key] = [0.0, 0.0, now, 0.0]
+                    self._decay(st, now)
+                    st[0] += 1
+                    st[1] += 1
+                    touched.add(key)
+            self.sketch.add(keywords, now)
+            for key in touched:
+                st = self._keys[key]
+                expected = self._expected(st, now)
+                if st[0] > self._threshold(expected) and now - st[3] >= SURGE_COOLDOWN_SEC:
+                    st[3] = now
+                    surge = {"key": key, "count": round(st[0], 1), "expected": round(expected, 2),
+                             "window_sec": self.window, "ts": now,
+                             "keywords": [h["keyword"] for h in self.sketch.heavy_hitters(now, 5)]}
+                    self.alerts.append(surge)
+                    fired.append(surge)
+        return fired
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            rates = []
+            for key, st in self._keys.items():
+                dt = max(0.0, now - st[2])
+                short = st[0] * math.exp(-dt / self.window)
+                long_ = st[1] * math.exp(-dt / self.baseline)
+                expected = self._expected([short, long_, now, 0.0], now)
+                rates.append({"key": key, "recent": round(short, 1), "expected": round(expected, 2),
+                              "threshold": round(self._threshold(expected), 1),
+                              "surging": short > self._threshold(expected)})
+            rates.sort(key=lambda r: -r["recent"])
+            return {
+                "enabled": SURGE_ENABLED,
+                "window_sec": self.window,
+                "baseline_sec": self.baseline,
+                "rates": rates,
+                "heavy_hitters": self.sketch.heavy_hitters(now),
+                "recent_alerts": list(self.alerts),
+                "skipped_stale": self.skipped_stale,
+            }
+
+
+DETECTOR = SurgeDetector()
+
+
+class SurgeStage(Stage):
+    """Feeds the detector with the batch's classified tickets; alerts surges via the notifier."""
+    name = "surge"
+
+    def __init__(self, detector: SurgeDetector = DETECTOR, concurrency: Optional[int] = None):
+        super().__init__(concurrency)
+        self.detector = detector
+
+    def process(self, items: List[Item], ctx) -> None:
+        if not SURGE_ENABLED:
+            return
+        for surge in self.detector.observe([it.out for it in items]):
+            from src.services.notifier import notify_surge  # diferido (arranque rápido)
+
+            ok = notify_surge(surge)
+            METRICS["surge_alerts" if ok else "surge_alerts_failed"] += 1
+            logger.warning(f"Surge detected: {surge['key']}", extra={"stage": "surge", "extra": {**surge, "sent": ok}})
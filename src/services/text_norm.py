@@ -0,0 +1,111 @@
+# src/services/text_norm.py
+"""
+Shared text normalization for every classifier.
+
+One normalized form per ticket: casefold + NFKD accent folding + typographic
+quote folding + whitespace collapsing ("Contraseña  INVÁLIDA" -> "contrasena invalida").
+Results are memoized in a bounded LRU keyed by a content hash, so duplicate-heavy
+streams (template descriptions) normalize each distinct text only once.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+TEXT_NORM_CACHE_SIZE = int(os.getenv("TEXT_NORM_CACHE_SIZE", "50000"))
+
+_WS_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"\w+")
+_QUOTES = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"'})
+
+
+def fold(text: str) -> str:
+    """Normalize a raw string (no caching). Also used to compile rule keywords."""
+    t = unicodedata.normalize("NFKD", text.casefold().translate(_QUOTES))
+    if not t.isascii():
+        t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    return _WS_RE.sub(" ", t).strip()
+
+
+class NormText:
+    """Normalized ticket text; tokens are computed lazily and kept."""
+
+    __slots__ = ("text", "_tokens")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._tokens: Optional[Tuple[str, ...]] = None
+
+    @property
+    def tokens(self) -> Tuple[str, ...]:
+        if self._tokens is None:
+            self._tokens = tuple(_TOKEN_RE.findall(self.text))
+        return self._tokens
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"NormText({self.text!r})"
+
+
+class _NormCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[bytes, NormText]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, raw: str) -> NormText:
+        key = hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return hit
+        nt = NormText(fold(raw))
+        with self._lock:
+            self.misses += 1
+            self._data[key] = nt
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return nt
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+_CACHE = _NormCache(TEXT_NORM_CACHE_SIZE)
+
+
+def normalize(text: str | NormText) -> NormText:
+    if isinstance(text, NormText):
+        return text
+    return _CACHE.get(text)
+
+
+def ticket_text(r: Dict) -> str:
+    """Raw subject/title + description, as the classifiers see it."""
+    subj = str(r.get("subject") or r.get("title") or "")
+    desc = str(r.get("description") or "")
+    return (subj + " " + desc).strip()
+
+
+def normalize_ticket(r: Dict) -> NormText:
+    return _CACHE.get(ticket_text(r))
+
+
+def cache_stats() -> Dict[str, int]:
+    return _CACHE.stats()
@@ -0,0 +1,238 @@
+# src/services/ticket_query.py
+"""
+Read API over the classified output (GET /tickets).
+
+- Frame: TicketFrameCache over LOCAL_OUTPUT_CSV (if the job only appended, only
+  the new bytes are parsed).
+- Index: per filter column (topic/priority/sentiment/owner_suggested), value ->
+  sorted row positions; extended incrementally with the appended rows, rebuilt
+  when the file is rewritten. A query intersects the postings and only looks at
+  positions after the cursor.
+- Order: file order (append-only), so a cursor is "after row N". The cursor also
+  carries the id of row N: if the file was rewritten, the position is found
+  again by id. At the end of the data `next_cursor` is still returned, so a
+  client polling with it only gets the rows appended since.
+- ETag: hash of the rows in the page (generation + positions) plus the query;
+  with If-None-Match the API answers 304 without serializing anything.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.config import env_int, env_str
+from src.utils.schema import OUTPUT_COLUMNS, TicketFrameCache
+
+TICKETS_CSV = env_str("LOCAL_OUTPUT_CSV", "data/outputs/classified.csv")
+TICKETS_PAGE_SIZE = env_int("TICKETS_PAGE_SIZE", 100)
+TICKETS_MAX_PAGE_SIZE = env_int("TICKETS_MAX_PAGE_SIZE", 1000)
+
+FILTER_COLUMNS = ("topic", "priority", "sentiment", "owner_suggested")
+
+
+class QueryError(ValueError):
+    """Bad filter/cursor/fields: the API answers 400."""
+
+
+def _parse_ts(value: Optional[str], end: bool = False) -> Optional[np.datetime64]:
+    if not value:
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise QueryError(f"invalid date {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)  # created_at se guarda naive
+    if end and len(value.strip()) == 10:
+        ts += pd.Timedelta(days=1) - pd.Timedelta(1, "ns")  # "2025-08-15" como fin: el día entero
+    return np.datetime64(ts.to_datetime64(), "ns")
+
+
+def _records(frame: pd.DataFrame, positions: np.ndarray, fields: List[str]) -> List[Dict]:
+    """Rows at `positions` as JSON-ready dicts (only `fields`)."""
+    sub = frame.iloc[positions]
+    cols = {}
+    for c in fields:
+        s = sub[c]
+        if c == "created_at":
+            cols[c] = [None if pd.isna(t) else t.isoformat() for t in s]
+        elif c == "is_new":
+            cols[c] = [bool(v) for v in s]
+        else:
+            cols[c] = [None if pd.isna(v) else v for v in s.astype(object)]
+    return [dict(zip(fields, row)) for row in zip(*(cols[c] for c in fields))]
+
+
+def _fields(fields: Optional[Iterable[str]]) -> List[str]:
+    cols = list(dict.fromkeys(fields)) if fields else list(OUTPUT_COLUMNS)
+    unknown = [c for c in cols if c not in OUTPUT_COLUMNS]
+    if unknown:
+        raise QueryError(f"unknown fields {unknown}; expected a subset of {OUTPUT_COLUMNS}")
+    return cols
+
+
+@dataclass
+class TicketPage:
+    etag: str
+    has_more: bool
+    next_cursor: Optional[str]
+    frame: pd.DataFrame
+    positions: np.ndarray
+    fields: List[str]
+
+    def body(self) -> Dict:
+        """JSON body (only built when the client's ETag did not match)."""
+        items = _records(self.frame, self.positions, self.fields)
+        return {"count": len(items), "has_more": self.has_more, "next_cursor": self.next_cursor, "items": items}
+
+
+class TicketIndex:
+    def __init__(self, path: str = TICKETS_CSV):
+        self.path = path
+        self._cache = TicketFrameCache(path, OUTPUT_COLUMNS)
+        self._df: Optional[pd.DataFrame] = None
+        self._gen = -1
+        self._rows = 0
+        self._postings: Dict[str, Dict[str, np.ndarray]] = {}
+        self._pos_by_id: Dict[str, int] = {}
+        self._created = np.empty(0, dtype="datetime64[ns]")
+        self._lock = threading.Lock()
+
+    # --------------------- Índice ---------------------
+    def _extend(self, df: pd.DataFrame, start: int) -> None:
+        new = df.iloc[start:]
+        for col in FILTER_COLUMNS:
+            codes = new[col].cat.codes.to_numpy()
+            cats = new[col].cat.categories
+            post = self._postings.setdefault(col, {})
+            for c in np.unique(codes[codes >= 0]):
+                pos = np.flatnonzero(codes == c) + start
+                key = str(cats[c])
+                post[key] = np.concatenate([post[key], pos]) if key in post else pos
+        self._pos_by_id.update(zip(new["id"], range(start, len(df))))
+        self._created = df["created_at"].to_numpy(dtype="datetime64[ns]")
+
+    def _refresh(self) -> Tuple[pd.DataFrame, int]:
+        # llamado con self._lock tomado
+        try:
+            df = self._cache.load()
+        except FileNotFoundError:
+            df = pd.DataFrame(columns=OUTPUT_COLUMNS)
+        if df is self._df:
+            return df, self._gen
+        if self._cache.generation != self._gen or len(df) < self._rows:
+            self._postings, self._pos_by_id, self._rows = {}, {}, 0
+        if len(df) and "id" in df:
+            self._extend(df, self._rows)
+        self._df, self._gen, self._rows = df, self._cache.generation, len(df)
+        return df, self._gen
+
+    def _candidates(self, filters: Dict[str, Sequence[str]]) -> Optional[np.ndarray]:
+        """Sorted positions matching every filter (None = no filter)."""
+        result: Optional[np.ndarray] = None
+        for col, wanted in filters.items():
+            post = self._postings.get(col, {})
+            by_lower = {k.lower(): k for k in post}
+            lists = [post[by_lower[w.lower()]] for w in wanted if w.lower() in by_lower]
+            pos = np.unique(np.concatenate(lists)) if lists else np.empty(0, dtype=np.int64)
+            result = pos if result is None else np.intersect1d(result, pos, assume_unique=True)
+        return result
+
+    # --------------------- Cursor ---------------------
+    @staticmethod
+    def encode_cursor(gen: int, pos: int, ticket_id: Optional[str]) -> str:
+        raw = json.dumps({"g": gen, "p": pos, "id": ticket_id}, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _resolve_cursor(self, cursor: Optional[str], gen: int, df: pd.DataFrame) -> int:
+        """Last position already seen (-1 = from the start)."""
+        if not cursor:
+            return -1
+        try:
+            c = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            pos, ticket_id = int(c["p"]), c.get("id")
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            raise QueryError("invalid cursor")
+        if pos < 0 or ticket_id is None:
+            return -1
+        if c.get("g") == gen and pos < len(df) and df["id"].iat[pos] == ticket_id:
+            return pos
+        if ticket_id in self._pos_by_id:  # archivo reescrito: ubicar por id
+            return self._pos_by_id[ticket_id]
+        raise QueryError("stale cursor (row no longer in the output); restart without cursor")
+
+    # --------------------- Query ---------------------
+    def query(self, filters: Optional[Dict[str, Sequence[str]]] = None, created_from: Optional[str] = None,
+              created_to: Optional[str] = None, cursor: Optional[str] = None, limit: int = TICKETS_PAGE_SIZE,
+              fields: Optional[Iterable[str]] = None) -> TicketPage:
+        """One page after `cursor` (raises QueryError on bad input)."""
+        filters = {k: [v for v in vals if v] for k, vals in (filters or {}).items() if k in FILTER_COLUMNS}
+        filters = {k: v for k, v in filters.items() if v}
+        cols = _fields(fields)
+        limit = max(1, min(int(limit), TICKETS_MAX_PAGE_SIZE))
+        lo, hi = _parse_ts(created_from), _parse_ts(created_to, end=True)
+
+        with self._lock:  # índice y frame del mismo snapshot
+            df, gen = self._refresh()
+            n = len(df)
+            after = self._resolve_cursor(cursor, gen, df)
+            cand = self._candidates(filters)
+            if cand is None:
+                cand = np.arange(after + 1, n)
+            else:
+                cand = cand[np.searchsorted(cand, after, side="right"):]
+            if lo is not None or hi is not None:
+                ts = self._created[cand]
+                mask = np.ones(len(cand), dtype=bool)
+                if lo is not None:
+                    mask &= ts >= lo
+                if hi is not None:
+                    mask &= ts <= hi
+                cand = cand[mask]
+
+        page = cand[:limit]
+        has_more = len(cand) > limit
+        # Fin de datos: el cursor queda después de la última fila leída (el poll solo ve filas nuevas)
+        last = int(page[-1]) if has_more else n - 1
+        next_cursor = (self.encode_cursor(gen, last, df["id"].iat[last]) if last >= 0
+                       else cursor)
+
+        h = hashlib.sha1()
+        h.update(json.dumps([gen, sorted(filters.items()), created_from, created_to, cols, next_cursor],
+                            default=str).encode())
+        h.update(page.astype(np.int64).tobytes())
+        etag = f'"{h.hexdigest()[:20]}"'
+
+        return TicketPage(etag, has_more, next_cursor, df, page, cols)
+
+    def records(self, ids: Sequence[str], fields: Optional[Iterable[str]] = None) -> List[Optional[Dict]]:
+        """Rows for `ids`, aligned with them (None for an id not in the output)."""
+        cols = _fields(fields)
+        with self._lock:
+            df, _ = self._refresh()
+            pos = [self._pos_by_id.get(str(i)) for i in ids]
+        found = iter(_records(df, np.asarray([p for p in pos if p is not None], dtype=np.int64), cols))
+        return [None if p is None else next(found) for p in pos]
+
+    def stats(self) -> Dict:
+        return {"rows": self._rows, "generation": self._gen, **self._cache.stats}
+
+
+_INDEX: Optional[TicketIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_index() -> TicketIndex:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = TicketIndex()
+        return _INDEX
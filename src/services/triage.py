@@ -0,0 +1,32 @@
+# src/services/triage.py
+"""
+Priority-aware ordering for the job and /process.
+
+A cheap pre-pass (client-sent priority, else the rule set's priority regexes
+over the cached normalized text) picks the likely-P1 tickets so they can be
+classified and alerted before the bulk rows, whatever the batch size.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from src.services.rules_engine import RuleSet
+from src.services.text_norm import normalize_ticket
+
+URGENT = "P1"
+
+
+def is_urgent(row: Dict, ruleset: RuleSet) -> bool:
+    client = row.get("priority")
+    if isinstance(client, str) and client.strip():
+        return client.strip().upper() == URGENT  # prioridad del cliente tiene precedencia
+    return ruleset.priority(normalize_ticket(row).text) == URGENT
+
+
+def split_urgent(rows: List[Dict], ruleset: RuleSet) -> Tuple[List[int], List[int]]:
+    """Indices of likely-P1 rows and of the rest, each in input order."""
+    urgent: List[int] = []
+    bulk: List[int] = []
+    for i, r in enumerate(rows):
+        (urgent if is_urgent(r, ruleset) else bulk).append(i)
+    return urgent, bulk
@@ -1,5 +1,6 @@
 import json
 import os
+import threading
 import uuid
 import time
 from pathlib import Path
@@ -24,7 +25,7 @@ def write_to_dlq(ticket: dict, error_reason: str, stage: str) -> str:
         "ts": ts,
     }
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+        json.dump(payload, f, ensure_ascii=False, indent=2, default=str)  # Timestamps del job
 
     logger.error(
         f"Ticket derivado a DLQ: {fname}",
@@ -45,4 +46,19 @@ def prune_dlq_older_than(days: int = 7):
                 removed += 1
         except Exception:
             pass
-    return removed
\ No newline at end of file
+    return removed
+
+def start_prune_worker(days: int = 7, interval: float = 3600.0) -> threading.Thread:
+    """Prune en un thread daemon: primera pasada inmediata (sin bloquear el arranque), luego cada `interval` s."""
+    def _loop():
+        while True:
+            try:
+                removed = prune_dlq_older_than(days=days)
+                logger.info(f"DLQ pruned: {removed} files", extra={"stage": "dlq_prune"})
+            except Exception as e:
+                logger.warning(f"DLQ prune failed: {e}", extra={"stage": "dlq_prune"})
+            time.sleep(interval)
+
+    t = threading.Thread(target=_loop, name="dlq-prune", daemon=True)
+    t.start()
+    return t
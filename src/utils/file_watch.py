@@ -0,0 +1,119 @@
+"""
+Watcher de un archivo: inotify (Linux, vía ctypes) con fallback a polling de stat().
+
+Se observa el directorio padre para seguir también reemplazos atómicos
+(rename sobre el archivo) y creaciones; solo cuentan eventos con el nombre del archivo.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Optional
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class PollingWatcher:
+    def __init__(self, path: str | Path, interval: float = 0.1):
+        self.path = Path(path)
+        self.interval = interval
+        self._last = self._stat()
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+            return (st.st_size, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            return None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True si el archivo cambió dentro de `timeout` segundos (None = sin límite)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            cur = self._stat()
+            if cur != self._last:
+                self._last = cur
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    def __init__(self, path: str | Path):
+        self.path = Path(path).resolve()
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        wd = libc.inotify_add_watch(self._fd, str(self.path.parent).encode(), mask)
+        if wd < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {self.path.parent}")
+        self._name = self.path.name.encode()
+
+    def _drain(self) -> bool:
+        hit = False
+        while True:
+            try:
+                buf = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return hit
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(buf):
+                _wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, pos)
+                name = buf[pos + _EVENT_HEADER.size:pos + _EVENT_HEADER.size + length].rstrip(b"\0")
+                if name == self._name:
+                    hit = True
+                pos += _EVENT_HEADER.size + length
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if ready and self._drain():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def watch_file(path: str | Path, poll_interval: float = 0.1):
+    """inotify si está disponible; si no (macOS/Windows/contenedores raros), polling."""
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError):
+        return PollingWatcher(path, interval=poll_interval)
+
+
+def wait_debounced(watcher, debounce: float, max_delay: float, timeout: Optional[float] = None) -> bool:
+    """
+    Espera un cambio y luego absorbe la ráfaga: retorna cuando pasan `debounce`
+    segundos sin eventos o `max_delay` desde el primero (lo que ocurra antes).
+    """
+    if not watcher.wait(timeout):
+        return False
+    first = time.monotonic()
+    while True:
+        remaining = max_delay - (time.monotonic() - first)
+        if remaining <= 0 or not watcher.wait(min(debounce, remaining)):
+            return True
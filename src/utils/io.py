@@ -1,14 +1,139 @@
 from __future__ import annotations
+import csv
+import io
+import os
+import tempfile
 import pandas as pd
 from pathlib import Path
+from typing import Callable, IO
 
 def ensure_parent(path: str | Path) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
 
+def fsync_dir(path: str | Path) -> None:
+    """Persist a rename/create in `path`'s directory (no-op where dirs can't be opened, e.g. Windows)."""
+    try:
+        fd = os.open(str(Path(path).parent), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write(path: str | Path, write: Callable[[IO], None], mode: str = "w") -> None:
+    """
+    Write via a temp file in the same directory + fsync + os.replace: readers (and a
+    crash) see either the old file or the complete new one, never a half-written one.
+    """
+    p = Path(path)
+    ensure_parent(p)
+    text = "b" not in mode
+    fd, tmp = tempfile.mkstemp(dir=p.parent, prefix=p.name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **({"newline": "", "encoding": "utf-8"} if text else {})) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, p)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    fsync_dir(p)
+
+def truncate(path: str | Path, size: int) -> bool:
+    """Cut a file back to `size` bytes (drop a partially appended tail). True if it was longer."""
+    p = Path(path)
+    if not p.exists() or p.stat().st_size <= size:
+        return False
+    with p.open("r+b") as f:
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
 def read_csv(path: str | Path) -> pd.DataFrame:
     return pd.read_csv(path)
 
 def write_csv(df, path: str | Path) -> None:
-    ensure_parent(path)
-    df.to_csv(path, index=False)
\ No newline at end of file
+    atomic_write(path, lambda f: df.to_csv(f, index=False))
+
+def append_rows(path: str | Path, rows: list[dict], columns: list[str]) -> None:
+    """Append dict rows to a CSV (header only if the file is new/empty). Missing keys -> empty."""
+    p = Path(path)
+    ensure_parent(p)
+    new_file = not p.exists() or p.stat().st_size == 0
+    with p.open("a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
+
+def read_header(path: str | Path) -> list[str]:
+    p = Path(path)
+    if not p.exists():
+        return []
+    with p.open("r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def complete_records(chunk: bytes) -> bytes:
+    """Longest prefix ending in '\\n' outside quotes (a quoted field may span lines)."""
+    end = chunk.rfind(b"\n")
+    while end != -1 and chunk.count(b'"', 0, end) % 2:
+        end = chunk.rfind(b"\n", 0, end)
+    return chunk[: end + 1] if end != -1 else b""
+
+
+class CsvTailReader:
+    """
+    Lee solo las filas agregadas a un CSV desde la última lectura (offset en bytes).
+    Procesa hasta el último registro completo ('\\n' fuera de comillas: un campo
+    entre comillas puede tener saltos de línea); si el archivo se achica o se reemplaza,
+    vuelve a empezar desde el header.
+    """
+
+    def __init__(self, path: str | Path, offset: int | None = None):
+        self.path = Path(path)
+        self.header: list[str] = []
+        self.offset = 0
+        self._ino = None
+        if offset is not None:
+            self._open_header()
+            self.offset = max(offset, self.offset)
+
+    def _open_header(self) -> None:
+        with self.path.open("rb") as f:
+            line = f.readline()
+            self.header = next(csv.reader([line.decode("utf-8-sig")]), [])
+            self.offset = len(line)
+        self._ino = self.path.stat().st_ino
+
+    def seek_end(self) -> None:
+        self._open_header()
+        self.offset = max(self.offset, self.path.stat().st_size)
+
+    def read_new(self) -> list[dict]:
+        if not self.path.exists():
+            return []
+        st = self.path.stat()
+        if not self.header or st.st_ino != self._ino or st.st_size < self.offset:
+            self._open_header()
+        if st.st_size <= self.offset:
+            return []
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+        chunk = complete_records(chunk)
+        if not chunk:
+            return []  # registro a medio escribir: esperar al próximo evento
+        self.offset += len(chunk)
+        text = chunk.decode("utf-8")
+        return [r for r in csv.DictReader(io.StringIO(text), fieldnames=self.header) if any(r.values())]
@@ -0,0 +1,135 @@
+# src/utils/journal.py
+"""
+Journal de ejecución del job + ledger de alertas (crash-safe).
+
+- JobJournal: un JSON chico junto al output, reescrito atómicamente después de
+  cada chunk (ya escrito y alertado). Guarda hasta qué byte del output está
+  confirmado (`output_bytes`), los clusters ya alertados y las alertas P1 cuyo
+  envío falló (`pending_alerts`, se reintentan en la próxima corrida). Si el
+  proceso muere, la próxima corrida recorta el append a medias y rehace solo ese chunk.
+- Fencing (modo sharded): con `token` (el del lease de la partición) cada
+  escritura del journal guarda `lease_token` y `fence()` falla con LeaseLost si
+  el journal en disco ya tiene un token más nuevo (otro worker retomó la partición).
+- AlertLedger: append-only, una línea por ticket P1 cubierto por una alerta
+  enviada (fsync por alerta). Un ticket en el ledger no se vuelve a alertar.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+from src.utils.io import atomic_write, ensure_parent
+from src.utils.lease import LeaseLost
+
+
+class JobJournal:
+    RUNNING, DONE = "running", "done"
+
+    def __init__(self, path: str | Path, token: Optional[int] = None):
+        self.path = Path(path)
+        self.token = token  # fencing token (lease); None = sin fencing
+        self.state: Dict = {}
+
+    @classmethod
+    def load(cls, path: str | Path, token: Optional[int] = None) -> "JobJournal":
+        j = cls(path, token)
+        j.state = j._read()
+        return j
+
+    def _read(self) -> Dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[journal] unreadable journal {self.path}, ignoring: {e}")
+            return {}
+
+    def fence(self) -> None:
+        """Raise LeaseLost if the on-disk journal was written with a newer lease token."""
+        if self.token is None:
+            return
+        on_disk = self._read().get("lease_token", 0)
+        if on_disk > self.token:
+            raise LeaseLost(f"journal {self.path.name} fenced: token {on_disk} > {self.token}")
+
+    def claim(self) -> None:
+        """Stamp our token on disk (taking over): older owners' writes are refused from now on."""
+        self._save()
+
+    @property
+    def interrupted(self) -> bool:
+        return self.state.get("status") == self.RUNNING
+
+    def begin(self, output_bytes: int, **extra) -> None:
+        # Las alertas pendientes sobreviven a la corrida (sus filas ya están en el output)
+        pending = self.state.get("pending_alerts") or {}
+        self.state = {
+            "status": self.RUNNING,
+            "started_at": time.time(),
+            "output_bytes": output_bytes,
+            "chunks_done": 0,
+            "rows_done": 0,
+            "alerted_clusters": [],
+            "pending_alerts": pending,
+            **extra,
+        }
+        self._save()
+
+    def checkpoint(self, output_bytes: int, rows: int, alerted_clusters: Iterable[str], **extra) -> None:
+        """Chunk committed: its rows are durable in the output up to `output_bytes`."""
+        self.state.update(
+            output_bytes=output_bytes,
+            chunks_done=self.state.get("chunks_done", 0) + 1,
+            rows_done=self.state.get("rows_done", 0) + rows,
+            alerted_clusters=sorted(alerted_clusters),
+            updated_at=time.time(),
+            **extra,
+        )
+        self._save()
+
+    def finish(self, output_bytes: int, **extra) -> None:
+        self.state.update(status=self.DONE, output_bytes=output_bytes, finished_at=time.time(), **extra)
+        self._save()
+
+    def _save(self) -> None:
+        if self.token is not None:
+            self.fence()
+            self.state["lease_token"] = self.token
+        atomic_write(self.path, lambda f: json.dump(self.state, f))
+
+
+class AlertLedger:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._ids: Set[str] = set()
+        self._lock = threading.Lock()  # notify manda clusters en paralelo
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    ticket_id = line.split("\t", 1)[0].strip()
+                    if ticket_id:
+                        self._ids.add(ticket_id)
+
+    def __contains__(self, ticket_id: str) -> bool:
+        return str(ticket_id) in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def record(self, ticket_ids: Iterable[str], cluster: str) -> None:
+        with self._lock:
+            new = [str(t) for t in ticket_ids if str(t) not in self._ids]
+            if not new:
+                return
+            ensure_parent(self.path)
+            ts = int(time.time())
+            with self.path.open("a", encoding="utf-8") as f:
+                f.writelines(f"{t}\t{cluster}\t{ts}\n" for t in new)
+                f.flush()
+                os.fsync(f.fileno())
+            self._ids.update(new)
@@ -0,0 +1,174 @@
+# src/utils/lease.py
+"""
+Leases sobre un filesystem compartido (mismo host o NFS/SMB entre nodos).
+
+- Toda mutación del lease (adquirir, renovar, reclamar, liberar) y toda sección
+  "fenced" del dueño corren bajo un lock exclusivo del archivo `<lease>.lock`
+  (flock entre procesos/nodos + un lock por path dentro del proceso): leer el
+  lease y escribirlo es atómico respecto de los demás.
+- El dueño renueva `expires_at` cada ttl/3 desde un thread (heartbeat); si el
+  owner o el token cambiaron (otro lo reclamó) la renovación aborta sin escribir.
+- Un lease vencido (dueño muerto o colgado) se reclama con token+1. Liberar no
+  borra el archivo (solo lo marca vencido): `token` crece siempre y sirve de
+  fencing token en el journal de la partición.
+- `fenced()`: sección crítica del dueño (append + checkpoint, truncado al
+  retomar). Verifica el lease bajo el lock, así un reclamador no puede meterse
+  entre la verificación y la escritura.
+
+Los relojes de los nodos tienen que estar razonablemente sincronizados (NTP);
+el ttl debe ser mucho mayor que el skew.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from src.config import env_float
+from src.utils.io import atomic_write, ensure_parent
+
+LEASE_TTL_SEC = env_float("LEASE_TTL_SEC", 60.0)
+
+# flock no excluye entre threads del mismo proceso en todos los FS (NFS lo emula
+# con locks POSIX, que son por proceso): un lock local por path lo completa.
+_LOCAL_LOCKS: Dict[str, threading.Lock] = {}
+_LOCAL_GUARD = threading.Lock()
+
+
+class LeaseLost(RuntimeError):
+    """The lease expired and was reclaimed by another worker: stop writing."""
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def read_lease(path: str | Path) -> Optional[Dict]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Exclusive lock on `<lease>.lock` (blocking; held only for short sections)."""
+    lock_path = path.with_name(path.name + ".lock")
+    with _LOCAL_GUARD:
+        local = _LOCAL_LOCKS.setdefault(str(lock_path.resolve()), threading.Lock())
+    with local:
+        ensure_parent(lock_path)
+        fd = os.open(str(lock_path), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # libera el flock
+
+
+class FileLease:
+    def __init__(self, path: str | Path, owner: Optional[str] = None, ttl: float = LEASE_TTL_SEC):
+        self.path = Path(path)
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.token = 0
+        self._held = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _record(self, expires_at: Optional[float] = None) -> Dict:
+        return {"owner": self.owner, "token": self.token,
+                "expires_at": time.time() + self.ttl if expires_at is None else expires_at,
+                "host": socket.gethostname(), "pid": os.getpid()}
+
+    def _write(self, record: Dict) -> None:
+        atomic_write(self.path, lambda f: json.dump(record, f))
+
+    def _owned(self, current: Optional[Dict]) -> bool:
+        return (current is not None and current.get("owner") == self.owner
+                and current.get("token") == self.token)
+
+    def acquire(self) -> bool:
+        """Non-blocking (salvo el lock corto). Starts the heartbeat on success."""
+        if self._held:
+            return True
+        with _locked(self.path):
+            current = read_lease(self.path) or {}
+            if current.get("expires_at", 0) > time.time():
+                return False  # tomado y vigente
+            if current.get("owner"):
+                print(f"[lease] reclaimed {self.path} from {current.get('owner')} (expired)")
+            self.token = int(current.get("token", 0)) + 1
+            self._write(self._record())
+        self._held = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{self.path.name}", daemon=True)
+        self._thread.start()
+        return True
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self.renew()
+            except LeaseLost as e:
+                print(f"[lease] {e}")
+                return
+
+    def renew(self) -> None:
+        """Extend `expires_at`; aborts (LeaseLost, nothing written) if owner or token changed."""
+        with _locked(self.path):
+            if not self._held or not self._owned(read_lease(self.path)):
+                self._held = False
+                raise LeaseLost(f"lease {self.path.name} no longer held by {self.owner}")
+            self._write(self._record())
+
+    def _check(self) -> None:
+        current = read_lease(self.path)
+        if not self._held or not self._owned(current) or current.get("expires_at", 0) <= time.time():
+            self._held = False
+            raise LeaseLost(f"lease {self.path.name} lost by {self.owner}")
+
+    def check(self) -> None:
+        """Raise LeaseLost unless this worker still owns a non-expired lease."""
+        with _locked(self.path):
+            self._check()
+
+    @contextmanager
+    def fenced(self) -> Iterator[None]:
+        """
+        Critical section of the owner: checks the lease and holds the lock while the
+        body writes, so nobody can reclaim (and truncate) in between. Keep it short.
+        """
+        with _locked(self.path):
+            self._check()
+            yield
+
+    @property
+    def held(self) -> bool:
+        return self._held
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        if self._held:
+            with _locked(self.path):
+                if self._owned(read_lease(self.path)):
+                    # libre (sin owner); el token queda para que el próximo use token+1
+                    self._write({**self._record(expires_at=0), "owner": None})
+        self._held = False
+
+    def __enter__(self) -> "FileLease":
+        if not self.acquire():
+            raise LeaseLost(f"lease {self.path.name} is held by someone else")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
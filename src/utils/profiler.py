@@ -0,0 +1,264 @@
+"""
+Profiling opt-in para la API.
+
+Dos modos por request:
+  - "cprofile": cProfile determinístico sobre el handler.
+  - "sample":   muestreo estadístico del stack del thread que atiende el request
+                (salida en formato "folded", compatible con flamegraph.pl / speedscope).
+
+Desactivado (default) el costo es una lectura de ContextVar por request.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from src.config import env_bool, env_float, env_int, env_str
+
+MODES = ("cprofile", "sample")
+
+# Modo de profiling del request en curso (None = no se perfila)
+_profile_mode: ContextVar[str | None] = ContextVar("profile_mode", default=None)
+
+
+class _StackSampler:
+    """Toma muestras periódicas del stack de un thread y las acumula en formato folded."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            # folded: raíz primero, separado por ';'
+            self.stacks[";".join(reversed(parts))] += 1
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = env_bool("PROFILING_ENABLED", False)
+        self.mode = env_str("PROFILING_MODE", "cprofile").lower()
+        if self.mode not in MODES:
+            self.mode = "cprofile"
+        # Fracción de requests perfilados automáticamente (0 = solo por header)
+        self.sample_rate = env_float("PROFILING_SAMPLE_RATE", 0.0)
+        self.allow_header = env_bool("PROFILING_ALLOW_HEADER", True)
+        self.interval = env_float("PROFILING_SAMPLE_INTERVAL_MS", 5.0) / 1000.0
+        self.window = env_int("PROFILING_WINDOW", 50)
+        self._lock = threading.Lock()
+        self._profiles: deque[dict] = deque(maxlen=self.window)
+
+    # --------------------- Configuración ---------------------
+    def configure(self, enabled: bool | None = None, mode: str | None = None,
+                  sample_rate: float | None = None) -> dict:
+        if mode is not None:
+            if mode not in MODES:
+                raise ValueError(f"mode must be one of {MODES}")
+            self.mode = mode
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        return self.status()
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "allow_header": self.allow_header,
+            "window": self.window,
+            "profiles_stored": len(self._profiles),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+    def mode_for_request(self, header_value: str | None) -> str | None:
+        """Decide si el request se perfila: header `x-profile` o muestreo por sample_rate."""
+        if not self.enabled:
+            return None
+        if header_value and self.allow_header:
+            hv = header_value.strip().lower()
+            if hv in MODES:
+                return hv
+            if hv in ("1", "true", "yes", "on"):
+                return self.mode
+            return None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.mode
+        return None
+
+    # --------------------- Captura ---------------------
+    def _record(self, label: str, mode: str, duration: float, payload) -> None:
+        with self._lock:
+            self._profiles.append({
+                "label": label,
+                "mode": mode,
+                "duration_ms": round(duration * 1000, 2),
+                "ts": time.time(),
+                "data": payload,
+            })
+
+    def _run_cprofile(self, label: str, fn, *args, **kwargs):
+        prof = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            return prof.runcall(fn, *args, **kwargs)
+        finally:
+            stats = pstats.Stats(prof, stream=io.StringIO())
+            self._record(label, "cprofile", time.perf_counter() - t0, stats)
+
+    def _run_sampled(self, label: str, fn, *args, **kwargs):
+        sampler = _StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._record(label, "sample", time.perf_counter() - t0, sampler.stop())
+
+    def run(self, label: str, mode: str, fn, *args, **kwargs):
+        if mode == "cprofile":
+            return self._run_cprofile(label, fn, *args, **kwargs)
+        return self._run_sampled(label, fn, *args, **kwargs)
+
+    # --------------------- Reportes ---------------------
+    def _snapshot(self, mode: str) -> list[dict]:
+        with self._lock:
+            return [p for p in self._profiles if p["mode"] == mode]
+
+    def _aggregate_pstats(self) -> pstats.Stats | None:
+        profiles = self._snapshot("cprofile")
+        if not profiles:
+            return None
+        agg = pstats.Stats(stream=io.StringIO())
+        for p in profiles:
+            agg.add(p["data"])
+        return agg
+
+    def top(self, n: int = 20, sort: str = "tottime") -> dict:
+        """Top-N funciones calientes sobre la ventana rodante de perfiles."""
+        out: dict = {"requests": [], "cprofile": [], "sample": []}
+        with self._lock:
+            out["requests"] = [
+                {"label": p["label"], "mode": p["mode"], "duration_ms": p["duration_ms"], "ts": p["ts"]}
+                for p in self._profiles
+            ]
+
+        agg = self._aggregate_pstats()
+        if agg is not None:
+            key = 3 if sort == "cumtime" else 2
+            rows = sorted(agg.stats.items(), key=lambda kv: kv[1][key], reverse=True)[:n]
+            for (filename, lineno, func), (cc, nc, tt, ct, _callers) in rows:
+                out["cprofile"].append({
+                    "function": f"{filename}:{lineno}({func})",
+                    "ncalls": nc,
+                    "tottime": round(tt, 6),
+                    "cumtime": round(ct, 6),
+                })
+
+        # Modo sample: "self time" = frame hoja de cada muestra
+        leaf: Counter[str] = Counter()
+        total = 0
+        for p in self._snapshot("sample"):
+            for stack, count in p["data"].items():
+                leaf[stack.rsplit(";", 1)[-1]] += count
+                total += count
+        for func, count in leaf.most_common(n):
+            out["sample"].append({"function": func, "samples": count, "pct": round(100 * count / total, 2)})
+        return out
+
+    def folded(self) -> str:
+        """Stacks agregados en formato folded (`frame;frame;frame count`)."""
+        merged: Counter[str] = Counter()
+        for p in self._snapshot("sample"):
+            merged.update(p["data"])
+        return "\n".join(f"{stack} {count}" for stack, count in merged.most_common())
+
+    def pstats_dump(self) -> bytes:
+        """Stats cProfile agregados en formato marshal (mismo que `Stats.dump_stats`)."""
+        agg = self._aggregate_pstats()
+        return marshal.dumps(agg.stats) if agg is not None else b""
+
+
+PROFILER = Profiler()
+
+
+def set_profile_mode(mode: str | None):
+    return _profile_mode.set(mode)
+
+
+def reset_profile_mode(token) -> None:
+    _profile_mode.reset(token)
+
+
+def profiled(fn):
+    """
+    Decorador para handlers: si el request actual fue marcado para profiling,
+    ejecuta el handler bajo el profiler; si no, lo llama directo.
+    """
+    label = fn.__name__
+
+    if iscoroutinefunction(fn):
+        @wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            mode = _profile_mode.get()
+            if mode is None:
+                return await fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            prof = cProfile.Profile() if mode == "cprofile" else None
+            sampler = None if prof else _StackSampler(threading.get_ident(), PROFILER.interval)
+            if prof:
+                prof.enable()
+            else:
+                sampler.start()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                if prof:
+                    prof.disable()
+                    payload = pstats.Stats(prof, stream=io.StringIO())
+                else:
+                    payload = sampler.stop()
+                PROFILER._record(label, mode, time.perf_counter() - t0, payload)
+        return async_wrapper
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        mode = _profile_mode.get()
+        if mode is None:
+            return fn(*args, **kwargs)
+        return PROFILER.run(label, mode, fn, *args, **kwargs)
+    return wrapper
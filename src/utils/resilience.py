@@ -0,0 +1,170 @@
+# src/utils/resilience.py
+"""
+Capa de resiliencia para llamadas salientes (Telegram, LLM).
+
+- CircuitBreaker por endpoint: closed -> open tras N fallas seguidas; después de
+  `reset_timeout` pasa a half-open y deja pasar un probe; éxito cierra, falla reabre.
+  Con el circuito abierto la llamada falla al instante (CircuitOpenError).
+- Deadline: presupuesto total por request; cada intento usa min(timeout, restante)
+  y no se reintenta si el backoff no entra en lo que queda.
+- Backoff exponencial con full jitter.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from src.config import env_float, env_int
+
+T = TypeVar("T")
+
+BREAKER_FAILURE_THRESHOLD = env_int("BREAKER_FAILURE_THRESHOLD", 5)
+BREAKER_RESET_TIMEOUT = env_float("BREAKER_RESET_TIMEOUT_SEC", 30.0)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class NonRetryableError(RuntimeError):
+    """The dependency answered (e.g. HTTP 400): don't retry and don't count it against the breaker."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            self.counters["calls"] += 1
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state, self._probing = HALF_OPEN, False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True  # un solo probe a la vez
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state, self._failures, self._probing = CLOSED, 0, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counters["failures"] += 1
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.counters["opened"] += 1
+                self.state, self._opened_at = OPEN, time.monotonic()
+
+    def release(self) -> None:
+        """Call ended without a verdict (non-retryable/local error): free the half-open probe."""
+        with self._lock:
+            self._probing = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == OPEN:
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "retry_in_sec": round(retry_in, 1),
+                **self.counters,
+            }
+
+
+class Deadline:
+    def __init__(self, budget: float):
+        self.expires = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def timeout(self, cap: float) -> float:
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded("deadline budget exhausted")
+        return min(cap, left)
+
+
+def backoff_delay(attempt: int, base: float, cap: float = 30.0) -> float:
+    """Full jitter: uniform(0, min(cap, base * 2^(attempt-1)))."""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def call_with_resilience(fn: Callable[[float], T], breaker: CircuitBreaker, deadline: Deadline,
+                         max_attempts: int = 3, attempt_timeout: float = 10.0,
+                         backoff_base: float = 0.5, backoff_cap: float = 5.0,
+                         is_failure: Optional[Callable[[BaseException], bool]] = None) -> Tuple[T, int]:
+    """
+    Run `fn(timeout)` with breaker + deadline + jittered retries. Returns (result, retries_used).
+    Raises CircuitOpenError (fail fast), NonRetryableError, or the last error.
+    `is_failure(exc)` False = local/expected error: re-raised without touching the breaker.
+    """
+    last: Optional[BaseException] = None
+    for attempt in range(1, max(1, max_attempts) + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit '{breaker.name}' is open") from last
+        try:
+            result = fn(deadline.timeout(attempt_timeout))
+        except NonRetryableError:
+            breaker.release()
+            raise
+        except DeadlineExceeded:
+            breaker.release()
+            raise
+        except Exception as e:
+            if is_failure is not None and not is_failure(e):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            last = e
+        else:
+            breaker.record_success()
+            return result, attempt - 1
+
+        if attempt < max_attempts:
+            delay = backoff_delay(attempt, backoff_base, backoff_cap)
+            if delay >= deadline.remaining():
+                break  # no entra otro intento en el presupuesto
+            time.sleep(delay)
+    raise last
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        if name not in _BREAKERS:
+            _BREAKERS[name] = CircuitBreaker(name)
+        return _BREAKERS[name]
+
+
+def breaker_stats() -> list:
+    return [b.snapshot() for b in list(_BREAKERS.values())]
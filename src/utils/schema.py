@@ -0,0 +1,196 @@
+"""
+Representación compacta de tickets clasificados (en memoria y en CSV).
+
+- Columnas de baja cardinalidad (channel/topic/priority/sentiment/owner, dup_cluster)
+  como `category`. Las categorías base van primero y en orden fijo, así los códigos
+  son estables entre corridas; valores desconocidos (otros tenants) se agregan
+  al final, ordenados.
+- `created_at` como datetime64 (`format="mixed"`: convive "2025-08-15" con
+  isoformat "2025-08-15T10:30:00" de add_test_p1).
+- `id` siempre str, internado (mismo objeto en input, output y sets de ids vistos).
+
+`read_tickets` / `write_tickets` hacen round-trip sin pérdida: read(write(df)) == df.
+"""
+from __future__ import annotations
+
+import io
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from src.utils.io import atomic_write, complete_records
+
+TICKET_COLUMNS: List[str] = [
+    "id", "created_at", "channel", "subject", "description",
+    "topic", "priority", "sentiment", "owner_suggested", "dup_cluster",
+]
+OUTPUT_COLUMNS: List[str] = TICKET_COLUMNS + ["is_new"]
+
+# Categorías base (ruleset builtin + canales del generador); el orden define los códigos
+CATEGORY_BASE: Dict[str, List[str]] = {
+    "channel": ["web", "email", "whatsapp", "app", "phone"],
+    "topic": ["login", "billing", "mobile", "security", "info", "other"],
+    "priority": ["P1", "P2", "P3"],
+    "sentiment": ["neg", "neu", "pos"],
+    "owner_suggested": ["L1 Support", "Finance Ops", "Mobile Squad", "SecOps", "Sales"],
+    "dup_cluster": [],
+}
+ORDERED = {"priority"}  # P1 < P2 < P3: sort/min/max por severidad
+
+
+def categorical(values: pd.Series, column: str) -> pd.Series:
+    base = CATEGORY_BASE.get(column, [])
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.map(lambda v: None if pd.isna(v) else str(v)).astype(object)
+    seen = set(values.dropna().unique())
+    extras = sorted(seen.difference(base))
+    dtype = pd.CategoricalDtype(base + extras, ordered=column in ORDERED)
+    return values.astype(dtype)
+
+
+def _intern_ids(values: pd.Series) -> pd.Series:
+    return values.map(lambda v: None if pd.isna(v) else sys.intern(str(v))).astype(object)
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format="mixed", errors="coerce")
+    except (ValueError, TypeError):
+        # naive + con zona en la misma columna: normalizar a UTC naive
+        return pd.to_datetime(values, format="mixed", errors="coerce", utc=True).dt.tz_localize(None)
+
+
+def _to_bool(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(values):
+        return values
+    mapped = values.map(lambda v: v if isinstance(v, bool) else str(v).strip().lower() == "true")
+    return mapped.where(values.notna(), False).astype(bool)
+
+
+def coerce(df: pd.DataFrame, columns: Sequence[str] = TICKET_COLUMNS) -> pd.DataFrame:
+    """Add missing columns and apply the compact dtypes (in place; returns df)."""
+    for c in columns:
+        if c not in df.columns:
+            df[c] = None
+    for c in df.columns:
+        if c == "id":
+            df[c] = _intern_ids(df[c])
+        elif c == "created_at":
+            df[c] = _to_datetime(df[c])
+        elif c == "is_new":
+            df[c] = _to_bool(df[c])
+        elif c in CATEGORY_BASE:
+            df[c] = categorical(df[c], c)
+    return df
+
+
+def read_tickets(path: str | Path, columns: Sequence[str] = TICKET_COLUMNS,
+                 usecols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    # Todo como str y solo "" es nulo: "NA"/"None" en un subject se preservan
+    df = pd.read_csv(path, dtype=str, keep_default_na=False, na_values=[""], usecols=usecols)
+    return coerce(df, columns if usecols is None else [c for c in columns if c in usecols])
+
+
+def write_tickets(df: pd.DataFrame, path: str | Path) -> None:
+    """Full rewrite, atomic (temp file + rename): a crash never leaves a truncated CSV."""
+    atomic_write(path, lambda f: df.to_csv(f, index=False))
+
+
+def append_tickets(df: pd.DataFrame, path: str | Path) -> int:
+    """
+    Append rows to an existing tickets CSV (same columns/order as its header), fsynced.
+    Returns the file size after the append (the job's checkpoint offset).
+    """
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        df.to_csv(f, header=False, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def _align_categories(a: pd.DataFrame, b: pd.DataFrame) -> None:
+    # Categorías de `a` primero (sus códigos no cambian), extras de `b` al final
+    for c in a.columns.intersection(b.columns):
+        if isinstance(a[c].dtype, pd.CategoricalDtype) and isinstance(b[c].dtype, pd.CategoricalDtype):
+            cats = a[c].cat.categories
+            extra = b[c].cat.categories.difference(cats)
+            if len(extra):
+                a[c] = a[c].cat.add_categories(extra)
+            b[c] = b[c].cat.set_categories(a[c].cat.categories)
+
+
+class TicketFrameCache:
+    """
+    Tickets CSV -> DataFrame cached by (inode, size, mtime). If the file only grew
+    (same inode, same bytes before the old end), only the appended rows are parsed
+    and concatenated; any other change triggers a full read.
+    """
+
+    _GUARD = 4096  # bytes antes del offset que deben seguir iguales para confiar en el append
+
+    def __init__(self, path: str | Path, columns: Sequence[str] = TICKET_COLUMNS):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self._df: Optional[pd.DataFrame] = None
+        self._key = None
+        self._offset = 0
+        self._guard = b""
+        self._header = b""
+        self.stats = {"full_reads": 0, "incremental_reads": 0, "hits": 0}
+        self.generation = 0  # sube en cada lectura completa: posiciones de filas anteriores ya no valen
+        self._lock = threading.Lock()  # compartido entre sesiones del dashboard
+
+    def _tail_guard(self, f, offset: int) -> bytes:
+        start = max(len(self._header), offset - self._GUARD)
+        f.seek(start)
+        return f.read(offset - start)
+
+    def _full_read(self, st) -> pd.DataFrame:
+        with self.path.open("rb") as f:
+            data = complete_records(f.read(st.st_size))
+            self._header = data[: data.find(b"\n") + 1]
+            self._offset = len(data)
+            self._guard = self._tail_guard(f, self._offset)
+        self.stats["full_reads"] += 1
+        self.generation += 1
+        return read_tickets(io.BytesIO(data), self.columns)
+
+    def _append_read(self, st) -> Optional[pd.DataFrame]:
+        with self.path.open("rb") as f:
+            if not self._header or f.read(len(self._header)) != self._header:
+                return None
+            if self._tail_guard(f, self._offset) != self._guard:
+                return None  # reescrito con el mismo o mayor tamaño
+            f.seek(self._offset)
+            chunk = complete_records(f.read(st.st_size - self._offset))
+            if not chunk:
+                return self._df
+            new = read_tickets(io.BytesIO(self._header + chunk), self.columns)
+            self._offset += len(chunk)
+            self._guard = self._tail_guard(f, self._offset)
+        self.stats["incremental_reads"] += 1
+        old = self._df.copy(deep=False)
+        _align_categories(old, new)
+        return pd.concat([old, new], ignore_index=True)
+
+    def load(self) -> pd.DataFrame:
+        """Current frame; callers must not mutate it (it is shared), copy first."""
+        with self._lock:
+            st = self.path.stat()
+            key = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if self._df is not None and key == self._key:
+                self.stats["hits"] += 1
+                return self._df
+            df = None
+            if self._df is not None and self._key[0] == st.st_ino and st.st_size >= self._offset:
+                df = self._append_read(st)
+            if df is None:
+                df = self._full_read(st)
+            self._df, self._key = df, key
+            return df
@@ -0,0 +1,114 @@
+"""
+Parseo incremental de cuerpos NDJSON / CSV que llegan en chunks (request.stream()).
+
+Memoria acotada: solo se retiene el chunk actual más una línea incompleta
+(como máximo `max_line_bytes`). Los registros se entregan agrupados por chunk
+recibido, así el consumidor puede procesar apenas llegan datos en vez de
+esperar a llenar un batch fijo.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+# (número de registro, dict o None, error o None)
+Record = Tuple[int, Optional[Dict], Optional[str]]
+
+
+async def iter_line_batches(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[List[Tuple[bytes, Optional[str]]]]:
+    """Split a byte stream into complete lines; yields the lines completed by each chunk."""
+    buf = b""
+    skipping = False  # descartando el resto de una línea demasiado larga
+    too_long = f"line exceeds {max_line_bytes} bytes"
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        # Un solo split por chunk (lineal); el último pedazo es la línea incompleta
+        parts = (buf + chunk).split(b"\n")
+        buf = parts.pop()
+        if parts and skipping:
+            parts = parts[1:]  # fin de la línea demasiado larga
+            skipping = False
+        # Misma cota para las líneas completas (una larga puede llegar entera en un chunk)
+        lines: List[Tuple[bytes, Optional[str]]] = [
+            (b"", too_long) if len(line) > max_line_bytes else (line.rstrip(b"\r"), None) for line in parts
+        ]
+        if len(buf) > max_line_bytes and not skipping:
+            lines.append((b"", too_long))
+            skipping = True
+        if skipping:
+            buf = b""
+        if lines:
+            yield lines
+    if buf.strip() and not skipping:
+        yield [(buf.rstrip(b"\r"), None)]
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[List[Record]]:
+    n = 0
+    async for lines in iter_line_batches(chunks, max_line_bytes):
+        out: List[Record] = []
+        for line, err in lines:
+            if not err and not line.strip():
+                continue  # líneas vacías entre registros
+            n += 1
+            if err:
+                out.append((n, None, err))
+                continue
+            try:
+                obj = json.loads(line)
+            except (ValueError, UnicodeDecodeError) as e:
+                out.append((n, None, f"invalid JSON: {e}"))
+                continue
+            if not isinstance(obj, dict):
+                out.append((n, None, "expected a JSON object per line"))
+                continue
+            out.append((n, obj, None))
+        if out:
+            yield out
+
+
+async def iter_csv(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[List[Record]]:
+    """
+    CSV con encabezado. Un registro puede abarcar varias líneas si tiene campos
+    entre comillas con saltos de línea: se acumula hasta que las comillas cierran.
+    """
+    header: Optional[List[str]] = None
+    pending = ""
+    n = 0
+    async for lines in iter_line_batches(chunks, max_line_bytes):
+        out: List[Record] = []
+        for line, err in lines:
+            if err:
+                pending = ""
+                n += 1
+                out.append((n, None, err))
+                continue
+            try:
+                text = line.decode("utf-8-sig" if header is None and not pending else "utf-8")
+            except UnicodeDecodeError as e:
+                n += 1
+                out.append((n, None, f"invalid UTF-8: {e}"))
+                continue
+            pending = f"{pending}\n{text}" if pending else text
+            if pending.count('"') % 2:
+                if len(pending) > max_line_bytes:
+                    pending = ""
+                    n += 1
+                    out.append((n, None, f"record exceeds {max_line_bytes} bytes"))
+                continue
+            record, pending = pending, ""
+            if not record.strip():
+                continue
+            fields = next(csv.reader([record]))
+            if header is None:
+                header = [h.strip() for h in fields]
+                continue
+            n += 1
+            if len(fields) != len(header):
+                out.append((n, None, f"expected {len(header)} fields, got {len(fields)}"))
+                continue
+            out.append((n, dict(zip(header, fields)), None))
+        if out:
+            yield out
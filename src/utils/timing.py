@@ -0,0 +1,31 @@
+import time
+from typing import Callable, Dict, Optional
+
+
+class PhaseTimer:
+    """
+    Cronómetro por fases: `lap("load")` acumula el tiempo desde el lap anterior.
+    Evita re-indentar bloques largos con context managers.
+    `on_lap(timer)` se llama después de cada lap (ej: progreso de /runs/{id}).
+    """
+
+    def __init__(self, on_lap: Optional[Callable[["PhaseTimer"], None]] = None):
+        self.phases: Dict[str, float] = {}
+        self._t0 = time.perf_counter()
+        self._last = self._t0
+        self._on_lap = on_lap
+
+    def lap(self, name: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed
+        self._last = now
+        if self._on_lap is not None:
+            self._on_lap(self)
+        return elapsed
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milisegundos por fase + total."""
+        out = {k: round(v * 1000, 1) for k, v in self.phases.items()}
+        out["total"] = round((self._last - self._t0) * 1000, 1)
+        return out
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# `src` importable con `pytest` a secas (sin PYTHONPATH)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Antes de importar `src`: la config se lee al importar. Nada escribe en data/ ni logs/,
+# sin Telegram ni LLM reales.
+_TMP = Path(tempfile.mkdtemp(prefix="tickets-tests-"))
+for key, value in {
+    "LOG_PATH": _TMP / "logs" / "app.log",
+    "DLQ_DIR": _TMP / "dlq",
+    "LOCAL_OUTPUT_CSV": _TMP / "outputs" / "classified.csv",
+    "SEARCH_INDEX_DIR": _TMP / "outputs" / "search_index",
+    "DEDUP_INDEX_PATH": _TMP / "outputs" / "dedup_index.npz",
+    "ALERT_LEDGER_PATH": _TMP / "outputs" / "alert_ledger.tsv",
+    "SHARD_DIR": _TMP / "outputs" / "shards",
+    "CASCADE_CACHE_PATH": _TMP / "outputs" / "cascade_cache.jsonl",
+    "TELEGRAM_BOT_TOKEN": "",
+    "TELEGRAM_CHAT_ID": "",
+    "LLM_PROVIDER": "none",
+}.items():
+    os.environ[key] = str(value)
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from src.main import app
+
+    return TestClient(app)  # sin `with`: no corren los startup hooks (DLQ prune, warm-up)
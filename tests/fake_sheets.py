@@ -0,0 +1,108 @@
+# tests/fake_sheets.py
+"""
+Stand-in for the Sheets v4 / Drive v3 endpoints that SheetsSource uses
+(http.server, one thread per request). Point SheetsClient at `url` for both
+`sheets_base` and `drive_base`.
+
+- GET /drive/v3/files/{id}?fields=version -> {"version": "<n>"}
+- GET /v4/spreadsheets/{id}/values:batchGet?ranges=Sheet!A1:F10&... -> valueRanges
+  (trailing empty rows omitted, like the real API)
+
+`grid` is the sheet (row 1 = header); `add_rows`/`rewrite` bump the version.
+Every batchGet call is recorded in `batch_calls` (list of its ranges).
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+HEADER = ["ID", "Created At", "Channel", "Subject", "Description", "Extra"]
+_A1 = re.compile(r"^(?P<sheet>.+)!(?P<c0>[A-Z]+)(?P<r0>\d+):(?P<c1>[A-Z]+)(?P<r1>\d+)$")
+
+
+def _col(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def make_row(i: int) -> List[str]:
+    return [f"T{i}", "2025-08-15T10:00:00", "web", f"cannot login {i}", "help", "x"]
+
+
+class FakeSheets:
+    def __init__(self, token: str = "tok"):
+        self.token = token
+        self.grid: List[List[str]] = [list(HEADER)]
+        self.version = 1
+        self.version_calls = 0
+        self.batch_calls: List[List[str]] = []
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # --------------------- Datos ---------------------
+    def add_rows(self, n: int, start: int) -> None:
+        with self._lock:
+            self.grid.extend(make_row(i) for i in range(start, start + n))
+            self.version += 1
+
+    def rewrite(self, rows: List[List[str]]) -> None:
+        with self._lock:
+            self.grid = [list(HEADER)] + [list(r) for r in rows]
+            self.version += 1
+
+    def _values(self, a1: str) -> dict:
+        m = _A1.match(a1)
+        r0, r1 = int(m.group("r0")), int(m.group("r1"))
+        c0, c1 = _col(m.group("c0")), _col(m.group("c1"))
+        with self._lock:
+            rows = [row[c0:c1 + 1] for row in self.grid[r0 - 1:r1]]
+        while rows and not any(rows[-1]):
+            rows.pop()
+        return {"range": a1, "values": rows} if rows else {"range": a1}
+
+    # --------------------- Servidor ---------------------
+    def start(self) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como la API real
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _send(self, status: int, body: dict) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                if self.headers.get("Authorization") != f"Bearer {fake.token}":
+                    return self._send(401, {"error": "unauthenticated"})
+                u = urlparse(self.path)
+                q = parse_qs(u.query)
+                if u.path.startswith("/drive/v3/files/"):
+                    fake.version_calls += 1
+                    return self._send(200, {"version": str(fake.version)})
+                if u.path.endswith("/values:batchGet"):
+                    ranges = q.get("ranges", [])
+                    fake.batch_calls.append(ranges)
+                    return self._send(200, {"valueRanges": [fake._values(r) for r in ranges]})
+                return self._send(404, {"error": "not found"})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
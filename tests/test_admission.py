@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+import src.main as main
+from src.services.admission import AdmissionController, AdmissionRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_oversized_batch_and_body_are_413():
+    adm = AdmissionController(max_batch=10, max_body=100)
+    with pytest.raises(AdmissionRejected) as e:
+        adm.check_size(11)
+    assert e.value.status == 413
+    with pytest.raises(AdmissionRejected) as e:
+        adm.check_size(body_bytes=101)
+    assert e.value.status == 413
+    adm.check_size(10, body_bytes=100)
+    assert adm.stats["rejected_413"] == 2
+
+
+def test_full_queue_is_429():
+    async def scenario():
+        adm = AdmissionController(max_requests=1, max_queue=0)
+        await adm.acquire(1)
+        with pytest.raises(AdmissionRejected) as e:
+            await adm.acquire(1)
+        assert e.value.status == 429 and e.value.retry_after >= 1
+    run(scenario())
+
+
+def test_queue_wait_timeout_is_503():
+    async def scenario():
+        adm = AdmissionController(max_requests=1, max_queue=4, queue_timeout=0.05)
+        await adm.acquire(1)
+        with pytest.raises(AdmissionRejected) as e:
+            await adm.acquire(1)
+        assert e.value.status == 503
+        assert adm.stats["rejected_503"] == 1
+    run(scenario())
+
+
+def test_release_admits_waiters_urgent_first():
+    async def scenario():
+        adm = AdmissionController(max_requests=1, max_queue=4, queue_timeout=5)
+        await adm.acquire(1)
+        order = []
+
+        async def wait(name, urgent):
+            await adm.acquire(1, urgent)
+            order.append(name)
+            adm.release(1, 0.01)
+
+        bulk = asyncio.create_task(wait("bulk", False))
+        await asyncio.sleep(0)
+        urgent = asyncio.create_task(wait("urgent", True))
+        await asyncio.sleep(0)
+        adm.release(1, 0.01)
+        await asyncio.gather(bulk, urgent)
+        assert order == ["urgent", "bulk"]
+    run(scenario())
+
+
+def test_urgent_batch_sheds_queued_bulk_batch():
+    async def scenario():
+        adm = AdmissionController(max_requests=1, max_queue=1, queue_timeout=5)
+        await adm.acquire(1)
+        bulk = asyncio.create_task(adm.acquire(1, urgent=False))
+        await asyncio.sleep(0)
+        urgent = asyncio.create_task(adm.acquire(1, urgent=True))
+        with pytest.raises(AdmissionRejected) as e:
+            await bulk
+        assert e.value.status == 503 and adm.stats["shed"] == 1
+        adm.release(1, 0.01)
+        await urgent  # admitido
+    run(scenario())
+
+
+def test_p1_reserve_keeps_room_for_urgent():
+    async def scenario():
+        adm = AdmissionController(max_batch=10, max_inflight=100, max_requests=10, max_queue=0, p1_reserve=0.2)
+        for _ in range(8):
+            await adm.acquire(10)  # 80 = bulk_limit
+        with pytest.raises(AdmissionRejected):
+            await adm.acquire(10)
+        await adm.acquire(10, urgent=True)
+    run(scenario())
+
+
+# --------------------- API ---------------------
+def tickets(n):
+    return {"tickets": [{"id": f"T{i}", "title": "Question", "description": "How do I change plan?"}
+                        for i in range(n)]}
+
+
+def test_api_rejects_oversized_batch(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMISSION", AdmissionController(max_batch=2))
+    r = client.post("/process", json=tickets(3))
+    assert r.status_code == 413 and "Retry-After" not in r.headers
+
+
+def test_api_rejects_oversized_body_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMISSION", AdmissionController(max_body=50))
+    r = client.post("/process", content=b'{"tickets": [' + b" " * 100 + b"]}",
+                    headers={"content-type": "application/json"})
+    assert r.status_code == 413
+
+
+def test_api_saturated_is_429_with_retry_after(client, monkeypatch):
+    adm = AdmissionController(max_requests=1, max_queue=0)
+    adm.requests = 1  # un request ya en curso
+    monkeypatch.setattr(main, "ADMISSION", adm)
+    r = client.post("/process", json=tickets(1))
+    assert r.status_code == 429 and int(r.headers["Retry-After"]) >= 1
+    adm.requests = 0
+    assert client.post("/process", json=tickets(1)).status_code == 200
@@ -0,0 +1,54 @@
+from src.services.cascade import CascadeClassifier, LabelCache
+from src.services.rules_engine import get_ruleset
+
+
+class FakeLLM:
+    def __init__(self, labels=None, fail=False):
+        self.labels, self.fail, self.calls = labels, fail, 0
+
+    def classify_batch(self, texts, allowed):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("LLM down")
+        return [dict(self.labels) for _ in texts]
+
+
+def make(llm, **kw):
+    # min_confidence > 1: todo escala al LLM
+    return CascadeClassifier(llm=llm, min_confidence=1.1, min_interval=0, cache=LabelCache(None), **kw)
+
+
+P1 = {"subject": "Security breach", "description": "Someone accessed my account, data breach"}
+
+
+def test_llm_never_downgrades_rules_p1():
+    ruleset = get_ruleset()
+    assert ruleset.classify(f"{P1['subject']} {P1['description']}")["priority"] == "P1"
+    llm = FakeLLM({"topic": "account", "priority": "P3", "sentiment": "neutral"})
+    (res,) = make(llm).classify([P1], ruleset)
+    assert res["classified_by"] == "llm" and res["topic"] == "account"
+    assert res["priority"] == "P1"
+
+
+def test_llm_can_raise_priority():
+    llm = FakeLLM({"topic": "other", "priority": "P1", "sentiment": "negative"})
+    (res,) = make(llm).classify([{"subject": "Question", "description": "How do I change plan?"}], get_ruleset())
+    assert res["priority"] == "P1"
+
+
+def test_llm_failure_keeps_rule_labels():
+    ruleset = get_ruleset()
+    cascade = make(FakeLLM(fail=True))
+    (res,) = cascade.classify([P1], ruleset)
+    assert res["classified_by"] == "rules" and res["priority"] == "P1"
+    assert cascade.stats["llm_errors"] == 1
+
+
+def test_call_cap_keeps_rest_on_rules():
+    llm = FakeLLM({"topic": "other", "priority": "P3", "sentiment": "neutral"})
+    cascade = make(llm, batch_size=1, max_calls=2)
+    rows = [{"subject": f"Question {i}", "description": f"different text {i}"} for i in range(5)]
+    res = cascade.classify(rows, get_ruleset())
+    assert llm.calls == 2
+    assert [r["classified_by"] for r in res].count("llm") == 2
+    assert cascade.stats["over_budget"] == 3
@@ -0,0 +1,36 @@
+import pytest
+
+from src.jobs import process_new_rows as job
+from src.services import ml_classifier
+from src.services.classifiers import check_classifier
+
+TICKET = {"id": "T1", "title": "Cannot login", "description": "password reset fails"}
+
+
+@pytest.fixture
+def no_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_classifier, "CLASSIFIER_MODEL_PATH", str(tmp_path / "missing.npz"))
+
+
+def test_check_classifier(no_model):
+    assert check_classifier("rules") == "rules"
+    with pytest.raises(ValueError):
+        check_classifier("nope")
+    with pytest.raises(FileNotFoundError, match="train_classifier"):
+        check_classifier("ml")
+
+
+def test_api_ml_without_model_is_503(no_model, client):
+    r = client.post("/process?classifier=ml", json={"tickets": [TICKET]})
+    assert r.status_code == 503
+    assert r.json()["detail"] == "model not trained; run jobs/train_classifier"
+
+
+def test_api_unknown_classifier_is_400(client):
+    r = client.post("/process", json={"tickets": [TICKET]}, headers={"x-classifier": "nope"})
+    assert r.status_code == 400
+
+
+def test_job_ml_without_model_fails(no_model):
+    with pytest.raises(FileNotFoundError):
+        job.main(classifier="ml")
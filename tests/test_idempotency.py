@@ -0,0 +1,78 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import src.main as main
+from src.services.idempotency import IdempotencyStore, ticket_key
+
+RULESET = SimpleNamespace(name="default")
+
+
+def test_claim_hit_after_ok():
+    store = IdempotencyStore(db_path=None)
+    assert store.claim("k") == ("lead", None)
+    store.complete("k", {"ticket_id": "T1", "status": "OK"})
+    assert store.claim("k") == ("hit", {"ticket_id": "T1", "status": "OK"})
+
+
+def test_waiter_gets_leader_result():
+    store = IdempotencyStore(db_path=None)
+    store.claim("k")
+    claim, fut = store.claim("k")
+    assert claim == "wait"
+    store.complete("k", {"ticket_id": "T1", "status": "OK"})
+    assert fut.result(timeout=1)["status"] == "OK"
+
+
+@pytest.mark.parametrize("result", [None, {"ticket_id": "T1", "status": "DLQ"}])
+def test_failed_result_is_not_cached(result):
+    store = IdempotencyStore(db_path=None)
+    store.claim("k")
+    store.complete("k", result)
+    assert store.claim("k") == ("lead", None)  # se puede reintentar
+
+
+@pytest.fixture
+def store(monkeypatch):
+    s = IdempotencyStore(db_path=None)
+    monkeypatch.setattr(main, "IDEMPOTENCY", s)
+    monkeypatch.setattr(main, "IDEMPOTENCY_ENABLED", True)
+    return s
+
+
+def test_waiters_of_a_failed_request_process_once(store, monkeypatch):
+    runs = []
+
+    def run(tickets, ruleset, classifier, state):
+        if tickets:
+            runs.append(tickets[0]["id"])
+            time.sleep(0.05)  # los otros waiters llegan mientras este lidera
+        return [{"ticket_id": t["id"], "status": "OK"} for t in tickets]
+
+    monkeypatch.setattr(main, "_run_tickets", run)
+    key = ticket_key("T1", RULESET.name)
+    assert store.claim(key)[0] == "lead"  # request original en curso
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.extend(
+        main._process_tickets([{"id": "T1"}], RULESET, "rules"))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    store.complete(key, None)  # el original falla sin resultado
+    for t in threads:
+        t.join()
+
+    assert runs == ["T1"]
+    assert len(results) == 5 and all(r["status"] == "OK" for r in results)
+    assert sum(1 for r in results if r.get("idempotent")) == 4
+    assert store.claim(key)[0] == "hit"
+
+
+def test_waiter_times_out_in_progress(store, monkeypatch):
+    monkeypatch.setattr(main, "IDEMPOTENCY_WAIT_TIMEOUT", 0.05)
+    store.claim(ticket_key("T1", RULESET.name))
+    (res,) = main._process_tickets([{"id": "T1"}], RULESET, "rules")
+    assert res == {"ticket_id": "T1", "status": "IN_PROGRESS", "idempotent": False}
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from src.utils.journal import JobJournal
+from src.utils.lease import FileLease, LeaseLost, read_lease
+
+
+def pause(lease: FileLease) -> None:
+    """Simula un dueño colgado (GC, SIGSTOP): su heartbeat deja de renovar."""
+    lease._stop.set()
+    lease._thread.join()
+
+
+def test_acquire_is_exclusive(tmp_path):
+    path = tmp_path / "p0.lease"
+    a, b = FileLease(path, owner="a"), FileLease(path, owner="b")
+    assert a.acquire()
+    assert not b.acquire()
+    a.release()
+    assert b.acquire()
+    assert b.token == 2  # liberar no reinicia el token
+    b.release()
+    assert read_lease(path)["owner"] is None and read_lease(path)["token"] == 2
+
+
+def test_heartbeat_keeps_lease(tmp_path):
+    path = tmp_path / "p0.lease"
+    a = FileLease(path, owner="a", ttl=0.3)
+    assert a.acquire()
+    time.sleep(0.6)  # > ttl: solo sigue vigente por las renovaciones
+    assert not FileLease(path, owner="b", ttl=0.3).acquire()
+    a.check()
+    a.release()
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_fenced(tmp_path):
+    path = tmp_path / "p0.lease"
+    old = FileLease(path, owner="old", ttl=0.2)
+    assert old.acquire()
+    pause(old)
+    time.sleep(0.3)
+
+    new = FileLease(path, owner="new", ttl=5)
+    assert new.acquire()
+    assert new.token == old.token + 1
+
+    with pytest.raises(LeaseLost):
+        old.renew()
+    with pytest.raises(LeaseLost):
+        old.check()
+    with pytest.raises(LeaseLost):
+        with old.fenced():
+            pytest.fail("fenced body must not run")
+    old.release()  # no pisa el lease del nuevo dueño
+    assert read_lease(path)["owner"] == "new"
+    new.check()
+    new.release()
+
+
+def test_journal_refuses_older_token(tmp_path):
+    path = tmp_path / "p0.journal.json"
+    old, new = JobJournal.load(path, token=1), JobJournal.load(path, token=2)
+    old.begin(0)
+    new.claim()  # el nuevo dueño estampa su token
+    with pytest.raises(LeaseLost):
+        old.checkpoint(100, 10, [])
+    new.checkpoint(100, 10, [])
+    assert JobJournal.load(path).state["lease_token"] == 2
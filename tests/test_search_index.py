@@ -0,0 +1,91 @@
+import pytest
+
+from src.services import search_index
+from src.services.search_index import SearchIndex
+
+
+def row(i, subject, description="nothing else"):
+    return {"id": f"T{i}", "subject": subject, "description": description}
+
+
+ROWS = [row(i, f"invoice {i}" if i % 2 else f"password reset {i}", "customer cannot login" if i % 3 == 0 else "")
+        for i in range(40)]
+
+
+def hits(idx, q, limit=100):
+    return [r["id"] for r in idx.search(q, limit)["results"]]
+
+
+def test_incremental_adds_merge_into_log_segments(tmp_path):
+    one = SearchIndex.open(tmp_path / "one")
+    one.add(ROWS)
+    inc = SearchIndex.open(tmp_path / "inc")
+    for r in ROWS:
+        inc.add([r])
+    assert len(inc) == 40
+    assert len(inc.manifest["segments"]) <= 6  # contador binario: O(log N)
+    for q in ("invoice", "password login", "pass", "voic"):
+        assert sorted(hits(inc, q)) == sorted(hits(one, q))
+    assert inc.add(ROWS[:5]) == 0  # ids ya indexados
+
+
+def test_search_and_ranking(tmp_path):
+    idx = SearchIndex.open(tmp_path)
+    idx.add([row(1, "question", "refund invoice"), row(2, "refund invoice", "question"),
+             row(3, "other", "unrelated")])
+    assert hits(idx, "refund invoice") == ["T2", "T1"]  # subject pesa doble
+    assert hits(idx, "refund unrelated") == []  # AND
+    assert sorted(hits(idx, "refu")) == ["T1", "T2"]  # prefijo
+
+
+def test_reader_refresh_sees_writes_and_merges(tmp_path):
+    writer = SearchIndex.open(tmp_path)
+    reader = SearchIndex.open(tmp_path)
+    assert reader.search("invoice")["total"] == 0
+    for r in ROWS[:8]:
+        writer.add([r])  # varios merges
+        assert reader.refresh()
+        assert len(reader) == len(writer)
+    assert sorted(hits(reader, "invoice")) == sorted(hits(writer, "invoice"))
+    assert not reader.refresh()  # sin cambios
+
+
+def test_merged_segments_kept_for_grace_then_collected(tmp_path, monkeypatch):
+    writer = SearchIndex.open(tmp_path)
+    writer.add([ROWS[0]])
+    stale = SearchIndex(tmp_path)
+    stale_manifest = writer._read_manifest()[1]
+    writer.add([ROWS[1]])  # merge: seg-000001 (y el nuevo seg-000002) quedan retirados
+    assert "seg-000001.npz" in [e["name"] for e in writer.manifest["retired"]]
+    assert (tmp_path / "seg-000001.npz").exists()
+
+    # un lector que leyó el manifest anterior todavía puede cargar el segmento
+    monkeypatch.setattr(stale, "_read_manifest", lambda: (("old",), stale_manifest))
+    assert stale.refresh() and len(stale) == 1
+
+    monkeypatch.setattr(search_index, "SEARCH_SEGMENT_GRACE_SEC", 0.0)
+    writer.add([ROWS[2]])  # la próxima escritura borra lo vencido
+    assert not (tmp_path / "seg-000001.npz").exists()
+    assert "seg-000001.npz" not in [e["name"] for e in writer.manifest["retired"]]
+
+
+def test_refresh_retries_when_segment_was_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "SEARCH_SEGMENT_GRACE_SEC", 0.0)
+    writer = SearchIndex.open(tmp_path)
+    writer.add([ROWS[0]])
+    old_manifest = writer._read_manifest()[1]
+    writer.add([ROWS[1]])
+    writer.add([ROWS[2]])  # seg-000001 ya borrado
+    assert not (tmp_path / "seg-000001.npz").exists()
+
+    reader = SearchIndex(tmp_path)
+    real = reader._read_manifest
+    answers = iter([(("old",), old_manifest)])
+    monkeypatch.setattr(reader, "_read_manifest", lambda: next(answers, None) or real())
+    assert reader.refresh()  # manifest viejo -> FileNotFoundError -> releer
+    assert len(reader) == 3
+
+    reader2 = SearchIndex(tmp_path)
+    monkeypatch.setattr(reader2, "_read_manifest", lambda: (("old",), old_manifest))
+    with pytest.raises(FileNotFoundError):
+        reader2.refresh()  # agota los reintentos
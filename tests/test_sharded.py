@@ -0,0 +1,89 @@
+import csv
+import json
+import time
+
+import pytest
+
+from src.jobs import process_new_rows as job
+from src.jobs import sharded
+from src.utils.journal import JobJournal
+
+PARTITIONS = 4
+P1_SUBJECT, P1_TEXT = "Suspicious access", "I noticed an unfamiliar login from another country."
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """Input with 6 near-duplicate P1s spread over >= 2 partitions + some noise; paths under tmp_path."""
+    rows = [(f"dup{i}", P1_SUBJECT, P1_TEXT) for i in range(6)]
+    rows += [(f"q{i}", f"Question {i}", f"How do I change plan number {i}?") for i in range(10)]
+    inp = tmp_path / "tickets.csv"
+    with inp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id", "created_at", "channel", "subject", "description"])
+        for rid, subject, desc in rows:
+            w.writerow([rid, "2025-08-30", "web", subject, desc])
+    out = tmp_path / "classified.csv"
+    for mod, attr, value in (
+        (job, "INPUT_CSV", str(inp)), (job, "OUTPUT_CSV", str(out)),
+        (job, "JOB_JOURNAL_PATH", str(out) + ".journal.json"),
+        (job, "ALERT_LEDGER_PATH", str(tmp_path / "ledger.tsv")),
+        (sharded, "SHARD_DIR", str(tmp_path / "shards")),
+        (sharded, "DEDUP_INDEX_PATH", str(tmp_path / "dedup.npz")),
+        (sharded, "SEARCH_INDEX_DIR", str(tmp_path / "search")),
+    ):
+        monkeypatch.setattr(mod, attr, value)
+    sent = []
+    monkeypatch.setattr(job, "notify_p1_ticket", lambda t, similar=1: sent.append((t["id"], similar)) or True)
+    return {"out": out, "sent": sent, "dup_ids": [r[0] for r in rows[:6]], "monkeypatch": monkeypatch}
+
+
+def test_duplicate_p1s_across_partitions_alert_once(env):
+    parts = {sharded.partition_of(i, PARTITIONS) for i in env["dup_ids"]}
+    assert len(parts) >= 2
+
+    sharded.run_worker(PARTITIONS, owner="w1", sync=False, poll=0.01)
+    assert env["sent"] == []  # los workers no alertan
+    res = sharded.merge(PARTITIONS)
+
+    assert res["merged"] == 16
+    assert len(env["sent"]) == 1  # un cluster global -> una alerta
+    with env["out"].open(newline="", encoding="utf-8") as f:
+        out = {r["id"]: r for r in csv.DictReader(f)}
+    assert len({out[i]["dup_cluster"] for i in env["dup_ids"]}) == 1
+    assert all(out[i]["priority"] == "P1" for i in env["dup_ids"])
+
+
+def test_failed_alerts_are_retried_on_next_merge(env):
+    env["monkeypatch"].setattr(job, "notify_p1_ticket", lambda t, similar=1: False)
+    sharded.run_worker(PARTITIONS, owner="w1", sync=False, poll=0.01)
+    assert sharded.merge(PARTITIONS)["pending_alerts"] == 1
+
+    sent = []
+    env["monkeypatch"].setattr(job, "notify_p1_ticket", lambda t, similar=1: sent.append(similar) or True)
+    res = sharded.merge(PARTITIONS)  # nada nuevo que mergear: igual reintenta
+    assert res["merged"] == 0 and res["pending_alerts"] == 0
+    assert sent == [6]
+    assert JobJournal.load(job.JOB_JOURNAL_PATH).state["pending_alerts"] == {}
+
+
+def test_dead_worker_partitions_are_reclaimed(env):
+    # Un worker muerto dejó leases vencidos y un append a medias en cada partición
+    for p in range(PARTITIONS):
+        d = sharded._partition_dir(p, PARTITIONS)
+        d.mkdir(parents=True)
+        (d / "lease").write_text(json.dumps({"owner": "dead", "token": 5, "expires_at": time.time() - 1}))
+        JobJournal.load(d / "journal.json", token=5).begin(0)
+        (d / "classified.csv").write_text("partial,row,from,the,dead,worker\n")
+
+    sharded.run_worker(PARTITIONS, owner="w2", sync=False, poll=0.01)
+    for p in range(PARTITIONS):
+        d = sharded._partition_dir(p, PARTITIONS)
+        assert json.loads((d / "lease").read_text())["token"] == 6
+        assert JobJournal.load(d / "journal.json").state["lease_token"] == 6
+
+    res = sharded.merge(PARTITIONS)
+    assert res["merged"] == 16
+    with env["out"].open(newline="", encoding="utf-8") as f:
+        assert sorted(r["id"] for r in csv.DictReader(f)) == sorted(
+            env["dup_ids"] + [f"q{i}" for i in range(10)])
@@ -0,0 +1,120 @@
+import csv
+import threading
+
+import pytest
+
+from fake_sheets import FakeSheets, make_row
+from src.services.sources import SheetsClient, SheetsSource
+
+RANGE = "Tickets!A:F"
+
+
+@pytest.fixture
+def fake():
+    f = FakeSheets()
+    f.url = f.start()
+    yield f
+    f.stop()
+
+
+def make_source(fake, tmp_path, **kw) -> SheetsSource:
+    client = SheetsClient("sheet-1", sheets_base=fake.url, drive_base=fake.url, credentials="",
+                          token="tok", api_key="")
+    return SheetsSource(client, RANGE, mirror=str(tmp_path / "mirror.csv"),
+                        state_path=str(tmp_path / "mirror.state.json"), **kw)
+
+
+def mirror_ids(tmp_path):
+    with open(tmp_path / "mirror.csv", newline="", encoding="utf-8") as f:
+        return [r["id"] for r in csv.DictReader(f)]
+
+
+def test_unchanged_version_skips_values(fake, tmp_path):
+    fake.add_rows(3, 0)
+    src = make_source(fake, tmp_path)
+    assert [r["id"] for r in src.sync()] == ["T0", "T1", "T2"]
+    calls = len(fake.batch_calls)
+
+    assert src.sync() == []
+    assert len(fake.batch_calls) == calls  # solo el chequeo de versión
+    assert src.counters["skipped_unchanged"] == 1
+
+
+def test_incremental_batch_get_ranges(fake, tmp_path):
+    fake.add_rows(3, 0)  # filas 2..4
+    src = make_source(fake, tmp_path, batch_rows=2, batch_ranges=2)
+    src.sync()
+    assert fake.batch_calls == [["Tickets!A1:F2", "Tickets!A3:F4"], ["Tickets!A5:F6", "Tickets!A7:F8"]]
+
+    fake.batch_calls.clear()
+    fake.add_rows(2, 3)  # filas 5..6
+    assert [r["id"] for r in src.sync()] == ["T3", "T4"]
+    # fila 4 = sonda de reescritura, después solo lo nuevo
+    assert fake.batch_calls == [["Tickets!A4:F4", "Tickets!A5:F6", "Tickets!A7:F8"]]
+    assert mirror_ids(tmp_path) == ["T0", "T1", "T2", "T3", "T4"]
+
+
+def test_rewritten_sheet_resets_mirror(fake, tmp_path):
+    fake.add_rows(3, 0)
+    src = make_source(fake, tmp_path)
+    src.sync()
+
+    fake.rewrite([make_row(10), make_row(11)])  # la fila 4 ya no es T2
+    assert [r["id"] for r in src.sync()] == ["T10", "T11"]
+    assert src.counters["resets"] == 1
+    assert mirror_ids(tmp_path) == ["T10", "T11"]
+
+
+def test_crash_between_append_and_state_is_recovered(fake, tmp_path, monkeypatch):
+    fake.add_rows(3, 0)
+    src = make_source(fake, tmp_path)
+    src.sync()
+
+    fake.add_rows(2, 3)
+
+    def crash():
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(src, "_save_state", crash)
+    with pytest.raises(RuntimeError):
+        src.sync()
+    assert mirror_ids(tmp_path) == ["T0", "T1", "T2", "T3", "T4"]  # append sin estado
+
+    again = make_source(fake, tmp_path)  # proceso nuevo
+    assert [r["id"] for r in again.sync()] == ["T3", "T4"]
+    assert mirror_ids(tmp_path) == ["T0", "T1", "T2", "T3", "T4"]
+
+
+def test_concurrent_syncs_share_the_mirror(fake, tmp_path):
+    fake.add_rows(50, 0)
+    sources = [make_source(fake, tmp_path, batch_rows=5, batch_ranges=2) for _ in range(4)]
+    threads = [threading.Thread(target=s.sync) for s in sources]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ids = mirror_ids(tmp_path)
+    assert sorted(ids) == sorted(f"T{i}" for i in range(50))
+
+
+def test_mirror_without_matching_state_is_moved_aside(fake, tmp_path):
+    fake.add_rows(3, 0)
+    make_source(fake, tmp_path).sync()
+
+    # Otro rango: el estado guardado no aplica, el espejo viejo no se pisa ni se mezcla
+    other = SheetsSource(make_source(fake, tmp_path)._client, "Tickets!A:E", mirror=str(tmp_path / "mirror.csv"),
+                         state_path=str(tmp_path / "mirror.state.json"))
+    assert [r["id"] for r in other.sync()] == ["T0", "T1", "T2"]
+    assert mirror_ids(tmp_path) == ["T0", "T1", "T2"]
+    orphans = list(tmp_path.glob("mirror.csv.*.orphan"))
+    assert len(orphans) == 1 and "T2" in orphans[0].read_text(encoding="utf-8")
+
+
+def test_state_ahead_of_mirror_does_not_truncate(fake, tmp_path):
+    fake.add_rows(3, 0)
+    src = make_source(fake, tmp_path)
+    src.sync()
+    size = (tmp_path / "mirror.csv").stat().st_size
+    src.state["mirror_bytes"] = size + 100  # estado guardado con más bytes que el archivo
+    src._recover()
+    assert (tmp_path / "mirror.csv").stat().st_size == size
@@ -0,0 +1,39 @@
+import asyncio
+
+from src.utils.stream_parse import iter_line_batches, iter_ndjson
+
+MAX = 32
+ERR = f"line exceeds {MAX} bytes"
+
+
+async def _chunks(chunks):
+    for c in chunks:
+        yield c
+
+
+def lines(chunks, max_line_bytes=MAX):
+    async def collect():
+        return [l async for batch in iter_line_batches(_chunks(chunks), max_line_bytes) for l in batch]
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks():
+    assert lines([b"ab", b"c\r\nde", b"f\n", b"gh"]) == [(b"abc", None), (b"def", None), (b"gh", None)]
+
+
+def test_oversized_line_inside_one_chunk_is_rejected():
+    big = b"x" * (MAX + 1)
+    assert lines([b"ok\n" + big + b"\nok2\n"]) == [(b"ok", None), (b"", ERR), (b"ok2", None)]
+
+
+def test_oversized_buffered_line_is_rejected_once():
+    big = b"y" * (MAX * 2)
+    assert lines([b"ok\n" + big[:MAX + 5], big[MAX + 5:], b"\nok2\n"]) == [(b"ok", None), (b"", ERR), (b"ok2", None)]
+
+
+def test_ndjson_reports_oversized_record():
+    body = b'{"id": "1"}\n{"id": "' + b"z" * MAX + b'"}\n'
+
+    async def collect():
+        return [r async for batch in iter_ndjson(_chunks([body]), MAX) for r in batch]
+    assert asyncio.run(collect()) == [(1, {"id": "1"}, None), (2, None, ERR)]
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from src.metrics import METRICS
+from src.services import notifier, surge
+from src.services.pipeline import Context, Item
+from src.services.surge import SURGE_COOLDOWN_SEC, SURGE_MIN_COUNT, SurgeDetector, SurgeStage
+
+
+def rows(n, topic="billing", created_at=None):
+    return [{"topic": topic, "channel": "web", "subject": "invoice wrong", "description": "charged twice",
+             "created_at": created_at} for _ in range(n)]
+
+
+@pytest.fixture
+def t0():
+    return time.time()
+
+
+@pytest.fixture
+def quiet(t0):
+    """Detector con horas de historia sin tráfico: esperado ~0, el umbral es SURGE_MIN_COUNT."""
+    d = SurgeDetector()
+    d.started = t0 - 3 * d.baseline
+    return d
+
+
+def keys(fired):
+    return sorted(f["key"] for f in fired)
+
+
+def test_min_count_threshold(quiet, t0):
+    assert quiet.observe(rows(SURGE_MIN_COUNT), now=t0) == []
+    fired = quiet.observe(rows(1), now=t0 + 1)
+    assert keys(fired) == ["channel:web", "topic:billing"]
+    assert "invoice" in fired[0]["keywords"]  # heavy hitters del momento
+
+
+def test_cooldown_then_fires_again(quiet, t0):
+    assert quiet.observe(rows(SURGE_MIN_COUNT + 1), now=t0)
+    assert quiet.observe(rows(50), now=t0 + 60) == []  # misma ráfaga: en cooldown
+    later = t0 + SURGE_COOLDOWN_SEC + 1
+    assert keys(quiet.observe(rows(SURGE_MIN_COUNT + 1), now=later)) == ["channel:web", "topic:billing"]
+    assert len(quiet.alerts) == 4
+
+
+def test_threshold_adapts_to_the_key_baseline(t0):
+    d = SurgeDetector()
+    d.started = t0
+    for k in range(72):  # 6 h de tráfico estable: 30 tickets cada 5 min
+        assert d.observe(rows(30), now=t0 + k * 300) == []
+    now = t0 + 72 * 300
+    assert d.observe(rows(60), now=now) == []  # ~3x lo esperado no alcanza (SURGE_MIN_FACTOR)
+    fired = d.observe(rows(200), now=now + 1)
+    assert keys(fired) == ["channel:web", "topic:billing"]
+    assert fired[0]["expected"] > SURGE_MIN_COUNT
+    # otra clave sin historia: su propio umbral (mínimo absoluto)
+    assert d.observe(rows(5, topic="login"), now=now + 2) == []
+
+
+def test_backlog_rows_are_not_counted(quiet, t0):
+    old = "2020-01-01T00:00:00"
+    assert quiet.observe(rows(500, created_at=old), now=t0) == []
+    assert quiet.skipped_stale == 500
+    assert quiet.snapshot()["rates"] == []
+
+
+def test_stage_counts_sent_and_failed(quiet, t0, monkeypatch):
+    results = iter([True, False])
+    sent = []
+    monkeypatch.setattr(notifier, "notify_surge", lambda s: sent.append(s["key"]) or next(results))
+    monkeypatch.setattr(surge, "SURGE_ENABLED", True)
+    before = METRICS["surge_alerts"], METRICS["surge_alerts_failed"]
+    items = [Item(r, out=r) for r in rows(SURGE_MIN_COUNT + 1)]
+    SurgeStage(quiet).process(items, Context(None, "rules", {}))
+    assert len(sent) == 2
+    assert (METRICS["surge_alerts"], METRICS["surge_alerts_failed"]) == (before[0] + 1, before[1] + 1)
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+from src.services import ticket_query
+from src.services.ticket_query import TicketIndex
+from src.utils.schema import OUTPUT_COLUMNS, append_tickets, coerce, write_tickets
+
+
+def frame(ids, priority="P3"):
+    rows = [{"id": i, "created_at": f"2025-08-{10 + n:02d}T10:00:00", "channel": "web", "subject": f"s {i}",
+             "description": "d", "topic": "billing", "priority": priority, "sentiment": "neutral",
+             "owner_suggested": "billing-team", "dup_cluster": i, "is_new": False} for n, i in enumerate(ids)]
+    return coerce(pd.DataFrame(rows)[OUTPUT_COLUMNS], OUTPUT_COLUMNS)
+
+
+@pytest.fixture
+def output(tmp_path, monkeypatch):
+    path = tmp_path / "classified.csv"
+    write_tickets(frame([f"T{i}" for i in range(5)]), path)
+    monkeypatch.setattr(ticket_query, "_INDEX", TicketIndex(str(path)))
+    return path
+
+
+def ids(r):
+    return [t["id"] for t in r.json()["items"]]
+
+
+def test_cursor_pages_then_polls_only_new_rows(client, output):
+    r = client.get("/tickets", params={"limit": 2})
+    assert ids(r) == ["T0", "T1"] and r.json()["has_more"]
+    seen, cursor = ids(r), r.json()["next_cursor"]
+    while r.json()["has_more"]:
+        r = client.get("/tickets", params={"limit": 2, "cursor": cursor})
+        seen += ids(r)
+        cursor = r.json()["next_cursor"]
+    assert seen == [f"T{i}" for i in range(5)]
+
+    r = client.get("/tickets", params={"limit": 2, "cursor": cursor})  # fin de datos: página vacía
+    assert r.json()["count"] == 0 and r.json()["next_cursor"] == cursor
+    etag = r.headers["ETag"]
+    assert client.get("/tickets", params={"limit": 2, "cursor": cursor},
+                      headers={"If-None-Match": etag}).status_code == 304
+
+    append_tickets(frame(["T5", "T6"], priority="P1"), output)  # el job agrega filas
+    r = client.get("/tickets", params={"limit": 2, "cursor": cursor}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+    assert ids(r) == ["T5", "T6"]
+
+
+def test_etag_304_and_weak_match(client, output):
+    r = client.get("/tickets", params={"priority": "P3", "fields": "id,priority"})
+    etag = r.headers["ETag"]
+    assert set(r.json()["items"][0]) == {"id", "priority"}
+    for inm in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        r2 = client.get("/tickets", params={"priority": "P3", "fields": "id,priority"}, headers={"If-None-Match": inm})
+        assert r2.status_code == 304 and r2.headers["ETag"] == etag
+    # otra query, otro ETag
+    assert client.get("/tickets", params={"priority": "P1"}, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_cursor_survives_rewrite(client, output):
+    cursor = client.get("/tickets", params={"limit": 2}).json()["next_cursor"]  # después de T1
+    write_tickets(frame(["T9", "T0", "T1", "T2", "T3", "T4"]), output)  # reescrito: posiciones corridas
+    assert ids(client.get("/tickets", params={"cursor": cursor})) == ["T2", "T3", "T4"]
+
+
+def test_bad_cursor_is_400(client, output):
+    assert client.get("/tickets", params={"cursor": "not-a-cursor"}).status_code == 400
+    cursor = TicketIndex.encode_cursor(0, 1, "GONE")
+    assert client.get("/tickets", params={"cursor": cursor}).status_code == 400
@@ -0,0 +1,75 @@
+import pytest
+
+from src.jobs import process_new_rows as job
+from src.utils.journal import JobJournal
+
+P1 = {"id": "W1", "created_at": "2025-08-30", "channel": "web", "subject": "Security breach",
+      "description": "Someone accessed my account, data breach"}
+
+
+class ScriptedSource:
+    """Each wait() pops the next tick: a list of rows, or None (timeout); then Ctrl-C."""
+    name = "fake"
+
+    def __init__(self, ticks):
+        self.ticks, self._rows = list(ticks), []
+        self.timeouts = []
+
+    def seek_end(self):
+        pass
+
+    def wait(self, debounce, max_delay, timeout=None):
+        self.timeouts.append(timeout)
+        if not self.ticks:
+            raise KeyboardInterrupt
+        tick = self.ticks.pop(0)
+        self._rows = tick or []
+        return tick is not None
+
+    def read_new(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    out = tmp_path / "classified.csv"
+    for attr, value in (("OUTPUT_CSV", str(out)), ("JOB_JOURNAL_PATH", str(out) + ".journal.json"),
+                        ("ALERT_LEDGER_PATH", str(tmp_path / "ledger.tsv")),
+                        ("DEDUP_INDEX_PATH", str(tmp_path / "dedup.npz")),
+                        ("SEARCH_INDEX_DIR", str(tmp_path / "search")), ("WATCH_RETRY_SEC", 0.0)):
+        monkeypatch.setattr(job, attr, value)
+    monkeypatch.setattr(job, "main", lambda **kw: None)  # sin pasada inicial
+    return monkeypatch
+
+
+def test_failed_p1_alert_is_retried_on_later_ticks(env):
+    results = [False, False, True]  # Telegram caído dos veces, después vuelve
+    sent = []
+
+    def notify(ticket, similar=1):
+        ok = results.pop(0)
+        sent.append((ticket["id"], ok))
+        return ok
+
+    env.setattr(job, "notify_p1_ticket", notify)
+    source = ScriptedSource([[P1], None, None])
+    env.setattr(job, "SOURCE", source)
+    job.watch()
+
+    assert sent == [("W1", False), ("W1", False), ("W1", True)]
+    assert source.timeouts[0] is None  # sin pendientes: espera sin límite
+    assert source.timeouts[1] == 0.0  # con pendientes: despierta para reintentar
+    assert JobJournal.load(job.JOB_JOURNAL_PATH).state["pending_alerts"] == {}
+
+
+def test_pending_alerts_from_the_job_are_retried(env):
+    JobJournal(job.JOB_JOURNAL_PATH).finish(0, pending_alerts={"W9": {"ticket": {**P1, "id": "W9"}, "ids": ["W9"]}})
+    sent = []
+    env.setattr(job, "notify_p1_ticket", lambda t, similar=1: sent.append(t["id"]) or True)
+    env.setattr(job, "SOURCE", ScriptedSource([None]))
+    job.watch()
+    assert sent == ["W9"]